@@ -0,0 +1,73 @@
+# Memory and export time of OCR word boxes as a list of Annotations and as
+# an AnnotationBatch.
+# python -m benchmarks.bench_batch [number of annotations]
+import io
+import sys
+import time
+import tracemalloc
+
+from wadm import WADM
+from wadm.bulk import AnnotationBatch
+from wadm.streaming import AnnotationPageWriter
+
+from benchmarks.bench_bulk import make_annotation
+
+
+def make_prototype():
+    anno = WADM.Annotation()
+    anno.add_motivation("commenting")
+    anno.add_TextualBody().set_language("en")
+    target = anno.set_target_specific_resource()
+    target.set_source("http://example.org/canvas1")
+    selector = target.set_selector_as_FragmentSelector()
+    selector.set_conformsTo("http://www.w3.org/TR/media-frags/")
+    return anno
+
+
+def make_batch(size):
+    batch = AnnotationBatch(make_prototype())
+    for n in range(size):
+        batch.append("http://example.org/anno%i" % n, "word %i" % n,
+                     n % 1000, n // 1000, 40, 12)
+    return batch
+
+
+def measure(build, size):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(size)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory, elapsed
+
+
+def write_list(annotations, page):
+    f = io.StringIO()
+    writer = AnnotationPageWriter(f, page)
+    for anno in annotations:
+        writer.write(anno)
+    writer.close()
+    return f.getvalue()
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    page = WADM.AnnotationPage()
+    page.set_id("http://example.org/page1")
+    annotations, list_memory, _ = measure(
+        lambda n: [make_annotation(i) for i in range(n)], size)
+    batch, batch_memory, _ = measure(make_batch, size)
+    start = time.perf_counter()
+    list_json = write_list(annotations, page)
+    list_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch_json = batch.dumps_page(page)
+    batch_time = time.perf_counter() - start
+    assert list_json == batch_json
+    print("annotations: %i" % size)
+    print("memory  list: %7.1f MB  batch: %6.1f MB  (%.0fx less)" % (
+        list_memory / 2**20, batch_memory / 2**20,
+        list_memory / batch_memory))
+    print("export  list: %7.2f s   batch: %6.2f s   (%.1fx faster)" % (
+        list_time, batch_time, list_time / batch_time))
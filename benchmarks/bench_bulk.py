@@ -0,0 +1,37 @@
+# Scaling of bulk_dumps with the number of worker processes.
+# python -m benchmarks.bench_bulk [number of annotations]
+import os
+import sys
+import time
+
+from wadm import WADM
+from wadm.bulk import bulk_dumps
+
+
+def make_annotation(n):
+    anno = WADM.Annotation()
+    anno.set_id("http://example.org/anno%i" % n)
+    anno.add_motivation("commenting")
+    body = anno.add_TextualBody()
+    body.set_value("word %i" % n)
+    body.set_language("en")
+    target = anno.set_target_specific_resource()
+    target.set_source("http://example.org/canvas1")
+    selector = target.set_selector_as_FragmentSelector()
+    selector.set_conformsTo("http://www.w3.org/TR/media-frags/")
+    selector.set_xywh(n % 1000, n // 1000, 40, 12)
+    return anno
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    annotations = [make_annotation(n) for n in range(size)]
+    print("annotations: %i, cpus: %s" % (size, os.cpu_count()))
+    baseline = None
+    for workers in (1, 2, 4, 8, 16):
+        start = time.perf_counter()
+        bulk_dumps(annotations, workers=workers, chunk=5000)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print("workers: %2i  %.2f s  speedup: %.1fx" % (
+            workers, elapsed, baseline / elapsed))
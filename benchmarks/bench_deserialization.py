@@ -0,0 +1,49 @@
+# Loading of a page of 100k annotations with read_API3_json_dict compared
+# with building each object with __init__ and updating its __dict__.
+# python -m benchmarks.bench_deserialization [number of annotations]
+import copy
+import json
+import sys
+import time
+import tracemalloc
+
+from wadm import WADM
+from wadm import utilities
+from benchmarks.bench_bulk import make_annotation
+
+
+def init_and_update(cls, data):
+    newobj = cls()
+    newobj.__dict__.update(data)
+    return newobj
+
+
+def load(jsondict):
+    tracemalloc.start()
+    start = time.perf_counter()
+    utilities.read_API3_json_dict(jsondict)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    page = WADM.AnnotationPage()
+    page.set_id("http://example.org/page1")
+    for n in range(size):
+        page.add_item(make_annotation(n))
+    jsondict = json.loads(page.json_dumps())
+    print("annotations: %i" % size)
+    new = load(copy.deepcopy(jsondict))
+    _new = utilities._new
+    utilities._new = init_and_update
+    try:
+        old = load(copy.deepcopy(jsondict))
+    finally:
+        utilities._new = _new
+    print("__init__ + __dict__.update: %.2f s, peak %.1f MB" % (
+        old[0], old[1] / 2**20))
+    print("registry loader:            %.2f s, peak %.1f MB" % (
+        new[0], new[1] / 2**20))
@@ -0,0 +1,32 @@
+# Writing Annotations that share a frozen creator, generator and stylesheet
+# (see Annotation.template) as JSON Lines, without and with FragmentCache.
+# python -m benchmarks.bench_fragments [number of annotations]
+import json
+import sys
+import time
+
+from wadm.bulk import FragmentCache
+from benchmarks.bench_template import add_shared
+from wadm import WADM
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    template = add_shared(WADM.Annotation()).template("id", "target")
+    annotations = [template.stamp(id="http://example.org/anno%i" % n,
+                                  target="http://example.com/page%i" % n)
+                   for n in range(size)]
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    start = time.perf_counter()
+    plain = [encoder.encode(a._to_jsonld(False, False, False))
+             for a in annotations]
+    uncached = time.perf_counter() - start
+    cache = FragmentCache()
+    start = time.perf_counter()
+    cached = [cache.dumps(a) for a in annotations]
+    fragments = time.perf_counter() - start
+    assert plain == cached
+    print("annotations: %i" % size)
+    print("serialize + encode: %.2f s" % uncached)
+    print("FragmentCache:      %.2f s  (%.1fx faster)" % (
+        fragments, uncached / fragments))
@@ -0,0 +1,54 @@
+# Deleting and replacing Annotations of a page by id: with the utilities
+# walking the page at each call and with indexes.IdIndex.
+# python -m benchmarks.bench_id_index [annotations] [deletions]
+import copy
+import random
+import sys
+import time
+
+from wadm import WADM, utilities
+from wadm.indexes import IdIndex
+
+
+def build(size):
+    page = WADM.AnnotationPage()
+    page.set_id("http://example.org/page1")
+    for n in range(size):
+        anno = page.add_annotation_to_items()
+        anno.set_id("http://example.org/anno%i" % n)
+        anno.add_TextualBody().set_value("Comment %i" % n)
+        anno.set_target("http://example.com/page%i" % n)
+    return page
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    deletions = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    page = build(size)
+    ids = random.Random(0).sample(
+        ["http://example.org/anno%i" % n for n in range(size)], deletions)
+    walked = copy.deepcopy(page)
+    start = time.perf_counter()
+    for objid in ids:
+        utilities.delete_object_byID(walked, objid)
+    walk_time = time.perf_counter() - start
+    indexed = copy.deepcopy(page)
+    start = time.perf_counter()
+    index = IdIndex(indexed)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for objid in ids:
+        index.delete(objid)
+    index_time = time.perf_counter() - start
+    batched = copy.deepcopy(page)
+    start = time.perf_counter()
+    IdIndex(batched).delete_many(ids)
+    batch_time = time.perf_counter() - start
+    assert [a.id for a in walked.items] == [a.id for a in indexed.items] \
+        == [a.id for a in batched.items]
+    print("annotations: %i, deletions: %i" % (size, deletions))
+    print("delete_object_byID:  %.3f s" % walk_time)
+    print("IdIndex build:       %.3f s" % build_time)
+    print("IdIndex.delete:      %.3f s  (%.0fx faster)" % (
+        index_time, walk_time / index_time))
+    print("build + delete_many: %.3f s" % batch_time)
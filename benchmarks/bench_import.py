@@ -0,0 +1,47 @@
+# Import time of wadm.WADM measured with -X importtime in fresh interpreters,
+# and cost of the first validation which loads the language and media types.
+# python -m benchmarks.bench_import [number of runs]
+import subprocess
+import sys
+
+FIRST_USE = """
+import time
+start = time.perf_counter()
+from wadm import WADM
+imported = time.perf_counter()
+body = WADM.TextualBody()
+body.set_language("en")
+body.set_format("text/plain")
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def importtime(module="wadm.WADM"):
+    """Return the cumulative import time in microseconds of module and of
+    the modules it imports."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        capture_output=True, text=True, check=True).stderr
+    modules = {}
+    for line in out.splitlines()[1:]:
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    importtime()  # writes the .pyc files
+    totals = sorted(importtime()["wadm.WADM"] for _ in range(runs))
+    print("runs: %i" % runs)
+    print("import wadm.WADM (median): %.1f ms" % (totals[runs // 2] / 1000))
+    loaded = importtime()
+    for name in ("wadm.BCP47_tags_list", "wadm.dictmediatype",
+                 "wadm.visualization_html"):
+        print("  %s imported: %s" % (name, name in loaded))
+    out = subprocess.run([sys.executable, "-c", FIRST_USE],
+                         capture_output=True, text=True, check=True).stdout
+    imported, first = map(float, out.split())
+    print("from wadm import WADM: %.1f ms" % (imported * 1000))
+    print("first validation:      %.1f ms" % (first * 1000))
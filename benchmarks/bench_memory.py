@@ -0,0 +1,56 @@
+# Memory of 1M selectors and states, with __dict__ and with the compact
+# __slots__ classes (WADM.COMPACT_CLASSES).
+# python -m benchmarks.bench_memory [number of objects]
+import sys
+import tracemalloc
+
+from wadm import WADM
+
+
+def point(cls, i):
+    selector = cls()
+    selector.set_x(i)
+    selector.set_y(i + 1)
+    return selector
+
+
+def fragment(cls, i):
+    selector = cls()
+    selector.set_xywh(i, i, 100, 50)
+    return selector
+
+
+def text_position(cls, i):
+    selector = cls()
+    selector.set_start(i)
+    selector.set_end(i + 10)
+    return selector
+
+
+def time_state(cls, i):
+    state = cls()
+    state.add_sourceDate("2015-07-20T13:30:00Z")
+    return state
+
+
+def measure(build, cls, n):
+    tracemalloc.start()
+    objects = [build(cls, i) for i in range(n)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("objects: %i" % n)
+    for build, cls in ((point, WADM.PointSelector),
+                       (fragment, WADM.FragmentSelector),
+                       (text_position, WADM.TextPositionSelector),
+                       (time_state, WADM.TimeState)):
+        compact = WADM.COMPACT_CLASSES[cls.__name__]
+        full = measure(build, cls, n)
+        slots = measure(build, compact, n)
+        print("%-21s __dict__: %6.1f MB  __slots__: %6.1f MB  (%.0f%%)" % (
+            cls.__name__, full / 2**20, slots / 2**20, 100 * slots / full))
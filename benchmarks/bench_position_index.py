@@ -0,0 +1,71 @@
+# Finding the Annotations on the characters shown by a reader of a long
+# text: scanning the TextPositionSelectors of all the Annotations at each
+# query and with indexes.PositionIndex.
+# python -m benchmarks.bench_position_index [annotations] [queries]
+import random
+import sys
+import time
+
+from wadm import WADM
+from wadm.indexes import PositionIndex
+
+TEXT = "http://example.org/commentary.txt"
+LENGTH = 5000000
+
+
+def build(size):
+    rng = random.Random(0)
+    annotations = []
+    for n in range(size):
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno%i" % n)
+        anno.add_TextualBody().set_value("Note %i" % n)
+        resource = anno.set_target_specific_resource()
+        resource.set_source(TEXT)
+        selector = resource.set_selector_as_TextPositionSelector()
+        start = rng.randrange(LENGTH)
+        selector.set_start(start)
+        # mostly words and lines, some whole cantos.
+        selector.set_end(start + rng.choice((5, 10, 40, 80, 400, 20000)))
+        annotations.append(anno)
+    return annotations
+
+
+def scan(annotations, start, end):
+    return [anno for anno in annotations
+            if anno.target.selector.start < end and
+            anno.target.selector.end > start]
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    annotations = build(size)
+    rng = random.Random(1)
+    pages = [(start, start + 3000) for start in
+             (rng.randrange(LENGTH) for _ in range(queries))]
+    offsets = [rng.randrange(LENGTH) for _ in range(queries)]
+    start = time.perf_counter()
+    scanned = [scan(annotations, *page) for page in pages]
+    scan_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index = PositionIndex(annotations)
+    # builds the tree.
+    index.at(TEXT, 0)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    found = [index.search(TEXT, *page) for page in pages]
+    search_time = time.perf_counter() - start
+    start = time.perf_counter()
+    at = [index.at(TEXT, offset) for offset in offsets]
+    at_time = time.perf_counter() - start
+    assert found == scanned
+    assert at == [scan(annotations, offset, offset + 1) for offset in offsets]
+    print("annotations: %i, queries: %i" % (size, queries))
+    print("scan:                  %.3f s" % scan_time)
+    print("PositionIndex build:   %.3f s" % build_time)
+    print("PositionIndex.search:  %.4f s  (%.0f us per query, %.0fx faster)"
+          % (search_time, search_time / queries * 1e6,
+             scan_time / search_time))
+    print("PositionIndex.at:      %.4f s  (%.0f us per query)" % (
+        at_time, at_time / queries * 1e6))
@@ -0,0 +1,45 @@
+# Cost of validating the language and the format of 1M bodies through the
+# setters (check_language, with the bcp47 parser for the tags that are not
+# registered) and with the lists scanned before.
+# python -m benchmarks.bench_registries [number of bodies]
+import sys
+import time
+
+from wadm import WADM
+from wadm.BCP47_tags_list import lang_tags
+
+REGISTERED = ["en", "it", "de", "fr", "la", "grc"]
+UNREGISTERED = ["de-DE-u-co-phonebk", "sr-Latn-RS", "en-US-x-twain",
+                "zh-yue-Hant-HK", "it-IT", "qab"]
+
+
+def validate(n, languages):
+    body = WADM.TextualBody()
+    start = time.perf_counter()
+    for i in range(n):
+        body.set_language(languages[i % len(languages)])
+        body.set_format("text/plain")
+    return time.perf_counter() - start
+
+
+def validate_lists(n, languages):
+    start = time.perf_counter()
+    for i in range(n):
+        language = languages[i % len(languages)]
+        assert language in lang_tags or language == "none"
+        assert any("text/plain" in sl for sl in WADM.MEDIATYPES.values())
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    # the lists accepted only the registered tags.
+    assert not any(language in lang_tags for language in UNREGISTERED[:-1])
+    mixed = REGISTERED + UNREGISTERED
+    print("bodies: %i" % size)
+    print("lists, registered tags:       %.2f s" % validate_lists(
+        size, REGISTERED))
+    print("setters, registered tags:     %.2f s" % validate(size, REGISTERED))
+    print("setters, unregistered tags:   %.2f s" % validate(
+        size, UNREGISTERED))
+    print("setters, mixed tags:          %.2f s" % validate(size, mixed))
@@ -0,0 +1,49 @@
+# Benchmark of to_json on the examples corpus.
+# The previous implementation (json_dumps + json.loads + @context splicing)
+# is reproduced here for comparison.
+# python -m benchmarks.bench_serialization
+import json
+import os
+import timeit
+import warnings
+
+from wadm import WADM
+
+warnings.simplefilter("ignore")
+example_dir = os.path.join(os.path.dirname(__file__), os.pardir, "examples")
+
+
+def load_examples():
+    annotations = []
+    for example in sorted(os.listdir(example_dir)):
+        if not example.endswith(".py"):
+            continue
+        with open(os.path.join(example_dir, example)) as f:
+            source = f.read().split("import dictdiffer")[0]
+        namespace = {}
+        exec(compile(source, example, "exec"), namespace)
+        annotations.append(namespace["anno"])
+    return annotations
+
+
+def old_to_json(obj, context=WADM.CONTEXT):
+    def serializer(obj):
+        return {k: v for k, v in obj.__dict__.items() if WADM.serializable(v)}
+    res = json.dumps(obj, default=serializer, indent=2, ensure_ascii=False)
+    res = "".join(('{\n  "@context": %s,\n ' % json.dumps(context), res[3:]))
+    return json.loads(res)
+
+
+if __name__ == "__main__":
+    annotations = load_examples()
+    for anno in annotations:
+        assert old_to_json(anno) == anno.to_json()
+    number = 200
+    old = timeit.timeit(
+        lambda: [old_to_json(a) for a in annotations], number=number)
+    new = timeit.timeit(
+        lambda: [a.to_json() for a in annotations], number=number)
+    print("examples: %i, repetitions: %i" % (len(annotations), number))
+    print("json_dumps + json.loads: %.3f s" % old)
+    print("single pass to_json:     %.3f s" % new)
+    print("speedup: %.1fx" % (old / new))
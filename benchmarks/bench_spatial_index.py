@@ -0,0 +1,67 @@
+# Finding the OCR word boxes in the viewport of a tile viewer: scanning the
+# selectors of all the Annotations at each query and with
+# indexes.SpatialIndex.
+# python -m benchmarks.bench_spatial_index [annotations] [canvases] [queries]
+import random
+import sys
+import time
+
+from wadm import WADM
+from wadm.indexes import SpatialIndex, parse_xywh
+
+
+def build(size, canvases):
+    rng = random.Random(0)
+    annotations = []
+    for n in range(size):
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno%i" % n)
+        anno.add_TextualBody().set_value("word%i" % n)
+        resource = anno.set_target_specific_resource()
+        resource.set_source("http://example.com/canvas%i" % (n % canvases))
+        resource.set_selector_as_FragmentSelector().set_xywh(
+            rng.randrange(4000), rng.randrange(6000), rng.randrange(20, 200),
+            rng.randrange(20, 60))
+        annotations.append(anno)
+    return annotations
+
+
+def scan(annotations, source, x, y, w, h):
+    found = []
+    for anno in annotations:
+        if anno.target.source != source:
+            continue
+        _, minx, miny, maxx, maxy = parse_xywh(anno.target.selector.value)
+        if minx <= x + w and maxx >= x and miny <= y + h and maxy >= y:
+            found.append(anno)
+    return found
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    canvases = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    annotations = build(size, canvases)
+    rng = random.Random(1)
+    viewports = [("http://example.com/canvas%i" % rng.randrange(canvases),
+                  rng.randrange(3200), rng.randrange(5400), 800, 600)
+                 for _ in range(queries)]
+    start = time.perf_counter()
+    scanned = [scan(annotations, *viewport) for viewport in viewports]
+    scan_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index = SpatialIndex(annotations)
+    for source in index.sources():
+        # packs the R-tree of each canvas.
+        index.search(source, 0, 0, 0, 0)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    found = [index.search(*viewport) for viewport in viewports]
+    query_time = time.perf_counter() - start
+    assert found == scanned
+    print("annotations: %i, canvases: %i, queries: %i" % (
+        size, canvases, queries))
+    print("scan:                 %.3f s" % scan_time)
+    print("SpatialIndex build:   %.3f s" % build_time)
+    print("SpatialIndex.search:  %.4f s  (%.0f us per query, %.0fx faster)"
+          % (query_time, query_time / queries * 1e6, scan_time / query_time))
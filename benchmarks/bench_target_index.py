@@ -0,0 +1,62 @@
+# Finding the Annotations on a canvas: scanning the targets of all the
+# Annotations at each query and with indexes.TargetIndex.
+# python -m benchmarks.bench_target_index [annotations] [canvases] [queries]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from wadm import WADM
+from wadm.indexes import TargetIndex
+
+
+def build(size, canvases):
+    annotations = []
+    for n in range(size):
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno%i" % n)
+        anno.add_TextualBody().set_value("Comment %i" % n)
+        resource = anno.set_target_specific_resource()
+        resource.set_source("http://example.com/canvas%i" % (n % canvases))
+        resource.set_selector_as_FragmentSelector().set_value(
+            "xywh=%i,0,10,10" % n)
+        annotations.append(anno)
+    return annotations
+
+
+def scan(annotations, iri):
+    return [anno for anno in annotations if anno.target.source == iri]
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    canvases = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    annotations = build(size, canvases)
+    rng = random.Random(0)
+    iris = ["http://example.com/canvas%i" % rng.randrange(canvases)
+            for _ in range(queries)]
+    start = time.perf_counter()
+    scanned = [scan(annotations, iri) for iri in iris]
+    scan_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index = TargetIndex(annotations)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    found = [index.get(iri) for iri in iris]
+    query_time = time.perf_counter() - start
+    assert found == scanned
+    path = os.path.join(tempfile.mkdtemp(), "targets.json")
+    index.save(path)
+    start = time.perf_counter()
+    loaded = TargetIndex.load(path)
+    load_time = time.perf_counter() - start
+    os.remove(path)
+    print("annotations: %i, canvases: %i, queries: %i" % (
+        size, canvases, queries))
+    print("scan:              %.3f s" % scan_time)
+    print("TargetIndex build: %.3f s" % build_time)
+    print("TargetIndex.get:   %.6f s  (%.1f us per query)" % (
+        query_time, query_time / queries * 1e6))
+    print("TargetIndex.load:  %.3f s" % load_time)
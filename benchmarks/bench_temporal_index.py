@@ -0,0 +1,80 @@
+# Finding the Annotations active at each frame of a video player: scanning
+# the FragmentSelectors of all the Annotations at each frame and with
+# indexes.TemporalIndex, by time and with a cursor.
+# python -m benchmarks.bench_temporal_index [annotations] [frames]
+import random
+import sys
+import time
+
+from wadm import WADM
+from wadm.indexes import TemporalIndex, parse_time
+
+VIDEO = "http://example.org/video1"
+DURATION = 7200
+
+
+def build(size):
+    rng = random.Random(0)
+    annotations = []
+    for n in range(size):
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno%i" % n)
+        anno.add_TextualBody().set_value("Subtitle %i" % n)
+        resource = anno.set_target_specific_resource()
+        resource.set_source(VIDEO)
+        start = rng.randrange(DURATION * 10) / 10
+        if n % 10:
+            resource.set_selector_as_FragmentSelector().set_value(
+                "t=%s,%s" % (start, start + rng.choice((1.5, 4, 30, 300))))
+        else:
+            resource.set_selector_as_PointSelector().set_t(start)
+        annotations.append(anno)
+    return annotations
+
+
+def scan(annotations, t):
+    found = []
+    for anno in annotations:
+        selector = anno.target.selector
+        if selector.type == "PointSelector":
+            if selector.t == t:
+                found.append(anno)
+        else:
+            start, end = parse_time(selector.value)
+            if start <= t < end:
+                found.append(anno)
+    return found
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 9000
+    annotations = build(size)
+    times = [1800 + n / 30 for n in range(frames)]
+    scanned_frames = times[::frames // 20 or 1]
+    start = time.perf_counter()
+    scanned = [scan(annotations, t) for t in scanned_frames]
+    scan_time = (time.perf_counter() - start) / len(scanned_frames)
+    start = time.perf_counter()
+    index = TemporalIndex(annotations)
+    # builds the tree.
+    index.at(VIDEO, 0)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    found = [index.at(VIDEO, t) for t in times]
+    at_time = (time.perf_counter() - start) / frames
+    assert found[::frames // 20 or 1] == scanned
+    cursor = index.cursor(VIDEO, times[0])
+    start = time.perf_counter()
+    events = 0
+    for t in times[1:]:
+        events += len(cursor.advance(t))
+    cursor_time = (time.perf_counter() - start) / (frames - 1)
+    assert cursor.active == found[-1]
+    print("annotations: %i, frames: %i (%.0f s at 30 fps)" % (
+        size, frames, frames / 30))
+    print("scan:                   %8.1f us per frame" % (scan_time * 1e6))
+    print("TemporalIndex build:    %8.3f s" % build_time)
+    print("TemporalIndex.at:       %8.1f us per frame" % (at_time * 1e6))
+    print("TemporalCursor.advance: %8.1f us per frame (%i events)" % (
+        cursor_time * 1e6, events))
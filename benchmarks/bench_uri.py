@@ -0,0 +1,46 @@
+# Cost of 10M IRI checks with the compiled validator, with and without the
+# cache, and with the per-character loop used before (on a sample).
+# python -m benchmarks.bench_uri [number of checks]
+import re
+import sys
+import time
+
+from wadm import WADM
+
+IRIS = ["http://example.org/anno%i" % i for i in range(1000)] + \
+    ["https://example.com/image%i.jpg#xywh=10,20,30,40" % i
+     for i in range(100)] + ["http://example.com/page1"] * 900
+
+
+def old_check_valid_URI(URI):
+    isvalid = True
+    URI = URI.replace("https:/", "", 1)
+    URI = URI.replace("http:/", "", 1)
+    URI = re.sub(r'#xywh=\d+?,\d+?,\d+?,\d+?$', '', URI)
+    URI = re.sub(r'#xywh=pct:\d+?,\d+?,\d+?,\d+?$', '', URI)
+    for indx, carat in enumerate(URI):
+        if carat in WADM.INVALID_URI_CHARACTERS:
+            isvalid = False
+    return isvalid
+
+
+def run(n, check):
+    iris = IRIS
+    size = len(iris)
+    start = time.perf_counter()
+    for i in range(n):
+        check(iris[i % size])
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    sample = max(n // 100, len(IRIS))
+    old = run(sample, old_check_valid_URI) * n / sample
+    new = run(n, WADM.check_valid_URI)
+    WADM.set_uri_cache(4096)
+    cached = run(n, WADM.check_valid_URI)
+    print("checks: %i (per-character loop timed on %i)" % (n, sample))
+    print("per-character loop: %.2f s" % old)
+    print("compiled regex:     %.2f s" % new)
+    print("with cache:         %.2f s" % cached)
@@ -0,0 +1,53 @@
+# Building Annotations with the setters checking each value, and with
+# deferred validation followed by validation.validate_many. Counting the
+# missing Required/Recommended attributes from the dumped JSON and with
+# validation.iter_missing.
+# python -m benchmarks.bench_validation [number of annotations]
+import sys
+import time
+
+from wadm import WADM, validation
+
+
+def build(n):
+    anno = WADM.Annotation()
+    anno.set_id("http://example.org/anno%i" % n)
+    anno.set_created("2015-01-28T12:00:00Z")
+    body = anno.add_TextualBody()
+    body.set_value("Comment %i" % n)
+    body.set_language("en")
+    body.set_format("text/plain")
+    target = anno.set_target_specific_resource()
+    target.set_source("http://example.org/page%i" % (n % 100))
+    return anno
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    start = time.perf_counter()
+    eager = [build(n) for n in range(size)]
+    eager_time = time.perf_counter() - start
+    WADM.set_validation("deferred")
+    start = time.perf_counter()
+    deferred = [build(n) for n in range(size)]
+    build_time = time.perf_counter() - start
+    WADM.set_validation()
+    start = time.perf_counter()
+    reports = validation.validate_many(deferred)
+    validate_time = time.perf_counter() - start
+    assert not any(reports)
+    print("annotations: %i" % size)
+    print("eager setters:    %.2f s" % eager_time)
+    print("deferred setters: %.2f s + validate_many %.2f s" % (
+        build_time, validate_time))
+    start = time.perf_counter()
+    counted = [a.json_dumps(dumps_errors=True).count('"Recommended":')
+               for a in eager]
+    dumps_time = time.perf_counter() - start
+    start = time.perf_counter()
+    walked = [len(list(validation.iter_missing(a))) for a in eager]
+    walk_time = time.perf_counter() - start
+    assert counted == walked
+    print("missing fields, json_dumps + count: %.2f s" % dumps_time)
+    print("missing fields, iter_missing:       %.2f s  (%.1fx faster)" % (
+        walk_time, dumps_time / walk_time))
@@ -3,6 +3,7 @@ import unittest
 import json
 import os
 import runpy
+import tempfile
 
 try:
     import dictdiffer
@@ -39,5 +40,644 @@ class TestDemonstrateSubtest(TestCase):
                 output = var['anno'].to_json()
                 self.assertDictEqual(output,reference)
 
+
+from wadm import WADM
+
+
+class TestSerialization(TestCase):
+    def test_context_first(self):
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        anno.set_target("http://example.com/page1")
+        output = anno.to_json()
+        self.assertEqual(list(output)[0], "@context")
+        self.assertEqual(json.loads(anno.json_dumps()), output)
+
+    def test_required_raises(self):
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        self.assertRaises(ValueError, anno.to_json)
+        output = anno.to_json(dumps_errors=True)
+        self.assertIn("Required", output["target"])
+
+    def test_shared_sentinels(self):
+        import copy
+        first, second = WADM.Person(), WADM.Person()
+        self.assertIs(first.id, second.id)
+        self.assertIsNot(first.id, WADM.Software().id)
+        self.assertIs(copy.deepcopy(first).id, first.id)
+        self.assertEqual(first.id.Required,
+                         "A Person must have the ID property.")
+        self.assertEqual(WADM.Annotation().to_json(dumps_errors=True)["id"],
+                         {"Required": "A Annotation must have the ID property."})
+        self.assertRaises(AttributeError, setattr, first.id, "Required", "")
+
+    def test_plan_dynamic_attribute(self):
+        software = WADM.Software()
+        software.set_id("http://example.org/client1")
+        self.assertNotIn("schema:softwareVersion", software.to_json())
+        software.set_softwareVersion("2.1")
+        self.assertEqual(software.to_json()["schema:softwareVersion"], "2.1")
+        self.assertIn("schema:softwareVersion",
+                      WADM._get_plan(WADM.Software).fields)
+
+    def test_template(self):
+        import copy
+        creator = WADM.Person()
+        creator.set_id("http://example.org/user1")
+        anno = WADM.Annotation()
+        anno.add_motivation("commenting")
+        anno.add_creator(creator)
+        template = anno.template("id", "target")
+        first = template.stamp(id="http://example.org/anno1",
+                               target="http://example.com/page1")
+        second = template.stamp(id="http://example.org/anno2")
+        self.assertEqual(first.to_json()["creator"],
+                         [{"id": "http://example.org/user1", "type": "Person"}])
+        self.assertIs(first.creator[0], second.creator[0])
+        self.assertIs(copy.deepcopy(first).creator[0], first.creator[0])
+        self.assertRaises(AttributeError, first.creator[0].set_id,
+                          "http://example.org/user2")
+        self.assertRaises(ValueError, second.to_json)
+        first.add_motivation("tagging")
+        self.assertEqual(second.motivation, "commenting")
+        self.assertRaises(AssertionError, template.stamp, id="not an id")
+        self.assertRaises(ValueError, template.stamp, creator="x")
+        self.assertRaises(ValueError, WADM.Annotation().template, "id")
+
+
+class TestStreaming(TestCase):
+    def annotations(self, n):
+        for i in range(n):
+            anno = WADM.Annotation()
+            anno.set_id("http://example.org/anno%i" % i)
+            anno.set_target("http://example.com/page%i" % i)
+            yield anno
+
+    def test_collection_writer(self):
+        from wadm.streaming import AnnotationCollectionWriter
+        coll = WADM.AnnotationCollection()
+        coll.set_id("http://example.org/collection1")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page{}.json")
+            with AnnotationCollectionWriter(
+                    coll, "http://example.org/page{}", path, 2) as writer:
+                writer.write_all(self.annotations(5))
+            pages = []
+            for n in (1, 2, 3):
+                with open(path.format(n)) as f:
+                    pages.append(json.load(f))
+        self.assertEqual(coll.total, 5)
+        self.assertEqual(coll.last, "http://example.org/page3")
+        self.assertEqual([p["startIndex"] for p in pages], [0, 2, 4])
+        self.assertEqual(pages[0]["next"], pages[1]["id"])
+        self.assertEqual(pages[2]["prev"], pages[1]["id"])
+        self.assertNotIn("next", pages[2])
+        self.assertEqual(pages[2]["items"][0]["id"], "http://example.org/anno4")
+
+    def test_iter_annotations(self):
+        from wadm.streaming import AnnotationCollectionWriter, iter_annotations
+        coll = WADM.AnnotationCollection()
+        coll.set_id("http://example.org/collection1")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page{}.json")
+            with AnnotationCollectionWriter(
+                    coll, "http://example.org/page{}", path, 3) as writer:
+                writer.write_all(self.annotations(7))
+            collpath = os.path.join(tmp, "collection1.json")
+            coll.json_save(collpath)
+            pages = {"http://example.org/page%i" % n: path.format(n)
+                     for n in (1, 2, 3)}
+            read = list(iter_annotations(collpath, pages.get, chunk_size=7))
+        self.assertEqual([anno.id for anno in read],
+                         [anno.id for anno in self.annotations(7)])
+        self.assertIsInstance(read[0], WADM.Annotation)
+
+    def test_jsonl(self):
+        from wadm.streaming import read_jsonl, write_jsonl
+        for filename in ("annotations.jsonl", "annotations.jsonl.gz"):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, filename)
+                count = write_jsonl(self.annotations(5), path, batch_size=2)
+                read = [anno.to_json() for anno in read_jsonl(path)]
+            self.assertEqual(count, 5)
+            self.assertEqual(read,
+                             [anno.to_json() for anno in self.annotations(5)])
+
+    def test_bulk_dumps(self):
+        from wadm.bulk import bulk_dumps
+        annotations = list(self.annotations(7))
+        lines = bulk_dumps(annotations, workers=2, chunk=3)
+        self.assertEqual([json.loads(line) for line in lines],
+                         [anno.to_json(context=False) for anno in annotations])
+
+    def test_annotation_batch(self):
+        import io
+        from wadm.bulk import AnnotationBatch
+        from wadm.streaming import AnnotationPageWriter
+        anno = WADM.Annotation()
+        anno.add_TextualBody().set_language("it")
+        target = anno.set_target_specific_resource()
+        target.set_source("http://example.org/canvas1")
+        target.set_selector_as_FragmentSelector().set_conformsTo(
+            "http://www.w3.org/TR/media-frags/")
+        batch = AnnotationBatch(anno)
+        batch.append("http://example.org/word1", "Perché", 1, 2, 30, 40)
+        batch.append("http://example.org/word2", '"100%"', 5, 6, 70, 80)
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch[1].body[0].value, '"100%"')
+        page = WADM.AnnotationPage()
+        page.set_id("http://example.org/page1")
+        for ensure_ascii in (False, True):
+            output = json.loads(batch.dumps_page(page,
+                                                 ensure_ascii=ensure_ascii))
+            self.assertEqual(output["items"],
+                             [anno.to_json(context=False) for anno in batch])
+        self.assertRaises(ValueError, AnnotationBatch, WADM.Annotation())
+        fileobj = io.StringIO()
+        writer = AnnotationPageWriter(fileobj, page)
+        writer.write(batch[0])
+        writer.write_serialized(list(batch.iter_json()))
+        writer.close()
+        self.assertEqual(writer.count, 3)
+        self.assertEqual(len(json.loads(fileobj.getvalue())["items"]), 3)
+
+    def test_fragment_cache(self):
+        from wadm.bulk import FragmentCache
+        creator = WADM.Person()
+        creator.set_id("http://example.org/user1")
+        creator.set_name("Perché")
+        anno = WADM.Annotation()
+        anno.add_creator(creator)
+        template = anno.template("id", "target")
+        annotations = [template.stamp(id="http://example.org/anno%i" % i,
+                                      target="http://example.com/page%i" % i)
+                       for i in range(3)]
+        for ensure_ascii in (False, True):
+            cache = FragmentCache(maxsize=1, ensure_ascii=ensure_ascii)
+            self.assertEqual([json.loads(cache.dumps(a, None))
+                              for a in annotations],
+                             [a.to_json() for a in annotations])
+            self.assertEqual(len(cache), 1)
+        shared = WADM.thaw(annotations[0].creator[0])
+        shared.set_id("http://example.org/user2")
+        self.assertEqual(json.loads(cache.dumps(annotations[2]))["creator"],
+                         [{"id": "http://example.org/user2",
+                           "type": "Person", "name": "Perché"}])
+
+
+class TestDeserialization(TestCase):
+    def test_typed_round_trip(self):
+        from wadm import utilities
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        choice = anno.add_ChoiceBody()
+        choice.add_TextualBody_to_items().set_value("Hello")
+        target = anno.set_target_specific_resource()
+        target.set_source("http://example.org/page1")
+        selector = target.set_selector_as_TextPositionSelector()
+        selector.set_start(10)
+        selector.set_end(20)
+        target.add_TimeState().add_sourceDate("2015-07-20T13:30:00Z")
+        output = anno.to_json()
+        read = utilities.read_API3_json_dict(json.loads(json.dumps(output)))
+        self.assertIsInstance(read.body, WADM.Choice)
+        self.assertIsInstance(read.body.items, WADM.TextualBody)
+        self.assertIsInstance(read.target.selector, WADM.TextPositionSelector)
+        self.assertIsInstance(read.target.state, WADM.TimeState)
+        self.assertEqual(read.to_json(), output)
+        # attributes missing in the file are still there.
+        read.add_motivation("commenting")
+
+    def test_lazy(self):
+        from wadm import utilities
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        anno.add_TextualBody().set_value("Hello")
+        target = anno.set_target_specific_resource()
+        target.set_source("http://example.org/page1")
+        target.set_selector_as_FragmentSelector().set_xywh(1, 2, 3, 4)
+        output = anno.to_json()
+        read = utilities.read_API3_json_dict(
+            json.loads(json.dumps(output)), lazy=True)
+        self.assertIsInstance(read.__dict__["target"], dict)
+        self.assertEqual(read.to_json(), output)
+        read.set_id("http://example.org/anno2")
+        read.add_TextualBody().set_value("World")
+        self.assertIsInstance(read.body[0], WADM.TextualBody)
+        self.assertIsInstance(read.target.selector, WADM.FragmentSelector)
+        output["id"] = "http://example.org/anno2"
+        output["body"].append({"type": "TextualBody", "value": "World"})
+        self.assertEqual(read.to_json(), output)
+
+    def test_lazy_pickle(self):
+        import pickle
+        from wadm import utilities
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        target = anno.set_target_specific_resource()
+        target.set_source("http://example.org/page1")
+        target.set_selector_as_FragmentSelector().set_xywh(1, 2, 3, 4)
+        output = anno.to_json()
+        read = utilities.read_API3_json_dict(
+            json.loads(json.dumps(output)), lazy=True)
+        copied = pickle.loads(pickle.dumps(read))
+        self.assertIsInstance(copied, WADM.Annotation)
+        self.assertEqual(copied.to_json(), output)
+        self.assertIsInstance(copied.target.selector, WADM.FragmentSelector)
+        target = pickle.loads(pickle.dumps(read.target))
+        self.assertEqual(target.selector.value, "xywh=1,2,3,4")
+
+    def test_compact(self):
+        from wadm import utilities
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        target = anno.set_target_specific_resource()
+        target.set_source("http://example.org/page1")
+        selector = WADM.CompactFragmentSelector()
+        selector.set_xywh(1, 2, 3, 4)
+        target.set_selector(selector)
+        target.add_TimeState(WADM.compact(WADM.TimeState())).add_sourceDate(
+            "2015-07-20T13:30:00Z")
+        self.assertFalse(hasattr(selector, "__weakref__"))
+        self.assertRaises(AttributeError, setattr, selector, "foo", 1)
+        output = anno.to_json()
+        self.assertEqual(output["target"]["selector"],
+                         {"type": "FragmentSelector", "value": "xywh=1,2,3,4"})
+        for lazy in (False, True):
+            read = utilities.read_API3_json_dict(
+                json.loads(json.dumps(output)), compact=True, lazy=lazy)
+            self.assertIsInstance(read.target.selector,
+                                  WADM.CompactFragmentSelector)
+            self.assertEqual(read.to_json(), output)
+        # attributes unknown to the compact class are kept by the full one.
+        output["target"]["selector"]["extra"] = "value"
+        read = utilities.read_API3_json_dict(output, compact=True)
+        self.assertIsInstance(read.target.selector, WADM.FragmentSelector)
+
+
+class TestValidation(TestCase):
+    def test_registries(self):
+        # the test registers on copies, the registries are global.
+        self.addCleanup(setattr, WADM, "LANGUAGES", WADM.LANGUAGES)
+        self.addCleanup(setattr, WADM, "MEDIATYPES", WADM.MEDIATYPES)
+        WADM.LANGUAGES = WADM.Registry(WADM.LANGUAGES)
+        WADM.MEDIATYPES = {key: list(values)
+                           for key, values in WADM.MEDIATYPES.items()}
+        body = WADM.TextualBody()
+        self.assertRaises(AssertionError, body.set_language, "xx-unknown")
+        WADM.LANGUAGES.append("xx-unknown")
+        body.set_language("xx-unknown")
+        self.assertRaises(AssertionError, body.set_format, "text/x-unknown")
+        WADM.register_mediatype("text/x-unknown")
+        body.set_format("text/x-unknown")
+        self.assertIn("text/x-unknown", WADM.MEDIATYPES["text"])
+
+    def test_bcp47(self):
+        from wadm import bcp47
+        body = WADM.TextualBody()
+        for tag in ("de-DE-u-co-phonebk", "zh-yue-Hant-HK", "sr-Latn-RS",
+                    "en-US-x-twain", "x-private", "qab", "i-klingon"):
+            body.set_language(tag)
+        for tag in ("zz-DE", "de--DE", "de-DE-DE", "en-1996-1996",
+                    "en-u-co-u-ca"):
+            self.assertRaises(AssertionError, body.set_language, tag)
+        tag = bcp47.parse_tag("zh-yue-Hant-HK")
+        self.assertEqual(tag.extlang, ("yue",))
+        self.assertEqual(tag.script, "hant")
+        self.assertRaises(ValueError, bcp47.parse_tag, "en-a-b")
+
+    def test_bcp47_private_use(self):
+        from wadm import bcp47
+        self.assertTrue(bcp47.is_valid_tag("qab", WADM.LANGUAGES))
+        self.assertFalse(bcp47.is_valid_tag("qb", WADM.LANGUAGES))
+        self.assertFalse(bcp47.is_valid_tag("qtaaaa", WADM.LANGUAGES))
+
+    def test_language_type(self):
+        body = WADM.TextualBody()
+        self.assertFalse(WADM.check_language(["en"]))
+        self.assertRaises(AssertionError, body.set_language, ["en"])
+
+    def test_uri_errors(self):
+        self.assertTrue(WADM.check_valid_URI(
+            "https://example.org/image.jpg#xywh=pct:1,2,3,4"))
+        errors = WADM.uri_errors("http://example.org/a b?c")
+        self.assertEqual([(e.position, e.character) for e in errors],
+                         [(20, " "), (22, "?")])
+        WADM.set_uri_cache(10)
+        try:
+            self.assertFalse(WADM.check_valid_URI("http://example.org/a?b"))
+            characters = WADM.INVALID_URI_CHARACTERS
+            WADM.INVALID_URI_CHARACTERS = characters.replace("?", "")
+            self.assertTrue(WADM.check_valid_URI("http://example.org/a?b"))
+        finally:
+            WADM.INVALID_URI_CHARACTERS = characters
+            WADM.set_uri_cache(None)
+
+    def test_setter_uri_errors(self):
+        anno = WADM.Annotation()
+        page = WADM.AnnotationPage()
+        for setter in (anno.set_target, anno.set_body, anno.add_via,
+                       anno.add_rights, page.set_next, page.set_partOf):
+            with self.assertRaises(AssertionError) as raised:
+                setter("http://example.org/a b")
+            self.assertIn(str(WADM.uri_errors("http://example.org/a b")[0]),
+                          str(raised.exception))
+
+    def test_datetime(self):
+        from datetime import datetime, timedelta, timezone
+        anno = WADM.Annotation()
+        anno.set_created("2015-01-28T12:00:00Z")
+        anno.set_modified(datetime(2015, 1, 29, 10, 30,
+                                   tzinfo=timezone(timedelta(hours=2))))
+        self.assertEqual(anno.modified, "2015-01-29T08:30:00Z")
+        for value in ("2015-13-28T12:00:00Z", "2015-01-28T12:00:00",
+                      "2015-01-28T12:00:00Zx", datetime(2015, 1, 29)):
+            self.assertRaises(ValueError, anno.set_generated, value)
+
+    def test_deferred(self):
+        from wadm import validation
+        WADM.set_validation("deferred")
+        try:
+            anno = WADM.Annotation()
+            anno.set_id("http://example.org/anno 1")
+            anno.set_created("yesterday")
+            body = anno.add_TextualBody()
+            body.set_value("Hello")
+            body.set_language("not a tag")
+            body.set_format("image/jpg")
+        finally:
+            WADM.set_validation()
+        self.assertRaises(AssertionError, anno.set_id, "not an id")
+        issues = validation.validate(anno)
+        self.assertEqual([(i.path, i.rule) for i in issues],
+                         [("/body/0/format", "format"),
+                          ("/body/0/language", "language"),
+                          ("/created", "datetime"), ("/id", "id")])
+        other = WADM.Annotation()
+        other.set_id("http://example.org/anno2")
+        self.assertEqual(validation.validate_many([other, anno])[1], issues)
+        self.assertEqual(validation.validate(other), [])
+        self.assertRaises(ValueError, WADM.set_validation, "lazy")
+
+    def test_collection_id(self):
+        import warnings
+        from wadm import validation
+        coll = WADM.AnnotationCollection()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            coll.set_id("urn:uuid:collection1")
+        self.assertEqual(len(caught), 1)
+        self.assertEqual([(i.path, i.rule, i.severity)
+                          for i in validation.validate(coll)],
+                         [("/id", "id", "warning")])
+
+    def test_iter_missing(self):
+        from wadm import validation
+        anno = WADM.Annotation()
+        anno.set_id("http://example.org/anno1")
+        anno.set_target_specific_resource().set_selector_as_FragmentSelector()
+        issues = list(validation.iter_missing(anno))
+        self.assertEqual([(i.path, i.severity) for i in issues],
+                         [("/body", "warning"), ("/target/id", "warning"),
+                          ("/target/selector/value", "error"),
+                          ("/target/selector/conformsTo", "warning")])
+        self.assertEqual(issues[2].message,
+                         "A fragment selector must have a value!")
+        anno.body = [WADM.TextualBody(), WADM.Required("A body is required.")]
+        self.assertIn(("/body/1", "required", "error", "A body is required."),
+                      list(validation.iter_missing(anno)))
+
+    def test_lazy_registries(self):
+        import subprocess
+        import sys
+        code = ("import sys; from wadm import WADM; "
+                "print('wadm.BCP47_tags_list' in sys.modules, "
+                "'wadm.dictmediatype' in sys.modules); "
+                "WADM.TextualBody().set_language('en'); "
+                "print('text' in WADM.MEDIATYPES)")
+        out = subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True).stdout
+        self.assertEqual(out.split(), ["False", "False", "True"])
+
+class TestIndexes(TestCase):
+    def page(self, n):
+        page = WADM.AnnotationPage()
+        page.set_id("http://example.org/page1")
+        for i in range(n):
+            anno = page.add_annotation_to_items()
+            anno.set_id("http://example.org/anno%i" % i)
+            anno.set_target("http://example.com/page%i" % i)
+        return page
+
+    def test_id_index(self):
+        from wadm.indexes import IdIndex
+        page = self.page(6)
+        index = IdIndex(page)
+        anno = page.add_annotation_to_items()
+        anno.set_id("http://example.org/anno6")
+        body = anno.add_TextualBody()
+        body.set_id("http://example.org/body6")
+        self.assertIs(index.get("http://example.org/anno6"), anno)
+        self.assertIs(index.get("http://example.org/body6"), body)
+        index.delete("http://example.org/anno1")
+        index.delete("http://example.org/anno3")
+        removed = index.delete_many(["http://example.org/anno6",
+                                     "http://example.org/anno0"])
+        self.assertEqual(len(removed), 2)
+        self.assertNotIn("http://example.org/body6", index)
+        new = WADM.Annotation()
+        new.set_id("http://example.org/new")
+        index.replace_in_place("http://example.org/anno4", new)
+        self.assertEqual([a.id for a in page.items],
+                         ["http://example.org/anno2", "http://example.org/new",
+                          "http://example.org/anno5"])
+        new.set_id("http://example.org/renamed")
+        self.assertIs(index.get("http://example.org/renamed"), new)
+        self.assertRaises(KeyError, index.delete, "http://example.org/anno1")
+
+    def test_id_index_iri_added(self):
+        from wadm.indexes import IdIndex
+        page = self.page(3)
+        index = IdIndex(page)
+        anno = page.add_annotation_to_items()
+        anno.set_id("http://example.org/anno3")
+        page.items[0].add_target("http://example.com/page9")
+        page.items[1].add_body("http://example.net/comment1")
+        self.assertIs(index.get("http://example.org/anno3"), anno)
+        self.assertIn("http://example.org/anno0", index)
+        index.delete("http://example.org/anno1")
+        self.assertEqual(len(index), 4)
+
+    def test_id_index_lazy(self):
+        from wadm import utilities, validation
+        from wadm.indexes import IdIndex
+        page = self.page(3)
+        page.items[1].add_TextualBody().set_value("Comment")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page1.json")
+            page.json_save(path)
+            lazy = utilities.modify_WADM_json(path)
+            index = IdIndex(lazy)
+            self.assertEqual(len(index), 4)
+            index.delete("http://example.org/anno1")
+            self.assertEqual([a.id for a in lazy.items],
+                             ["http://example.org/anno0",
+                              "http://example.org/anno2"])
+            lazy = utilities.read_WADM_json(path, lazy=True)
+            self.assertIn("/items/0/body",
+                          [i.path for i in validation.iter_missing(lazy)])
+            with open(path) as f:
+                data = json.load(f)
+            data["items"][2]["id"] = "http://example.org/anno 2"
+            with open(path, "w") as f:
+                json.dump(data, f)
+            lazy = utilities.read_WADM_json(path, lazy=True)
+            self.assertEqual([i.path for i in validation.validate(lazy)],
+                             ["/items/2/id"])
+
+    def test_utilities_in_place(self):
+        from wadm import utilities
+        page = self.page(4)
+        new = WADM.Annotation()
+        new.set_id("http://example.org/new")
+        utilities.remove_and_insert_new(page, "http://example.org/anno1", new)
+        utilities.delete_object_byID(page, "http://example.org/anno2")
+        utilities.delete_object_byID(page, "http://example.org/anno3")
+        self.assertEqual([a.id for a in page.items],
+                         ["http://example.org/anno0", "http://example.org/new"])
+
+    def test_target_index(self):
+        from wadm.indexes import IdIndex, TargetIndex
+        page = self.page(4)
+        anno = page.items[3]
+        resource = anno.set_target_specific_resource()
+        resource.set_source("http://example.com/page1")
+        index = TargetIndex(page.items)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.get("http://example.com/page1#part"),
+                         [page.items[1], anno])
+        resource.set_source("http://example.com/page0")
+        page.items[2].add_target("http://example.com/page0")
+        self.assertEqual(index.get("http://example.com/page0"),
+                         [page.items[0], anno, page.items[2]])
+        self.assertEqual(index.get("http://example.com/page3"), [])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "targets.json")
+            index.save(path)
+            self.assertEqual(
+                TargetIndex.load(path).get("http://example.com/page0"),
+                ["http://example.org/anno0", "http://example.org/anno3",
+                 "http://example.org/anno2"])
+            loaded = TargetIndex.load(path, IdIndex(page).get)
+        self.assertEqual(loaded.get("http://example.com/page1"),
+                         [page.items[1]])
+
+    def test_spatial_index(self):
+        from wadm.indexes import SpatialIndex, parse_xywh
+        self.assertEqual(parse_xywh("http://example.com/c1#xywh=pct:5,5,10,20"),
+                         (True, 5.0, 5.0, 15.0, 25.0))
+        self.assertIsNone(parse_xywh("http://example.com/c1#t=10,20"))
+        page = self.page(0)
+        for i in range(40):
+            anno = page.add_annotation_to_items()
+            resource = anno.set_target_specific_resource()
+            resource.set_source("http://example.com/canvas1")
+            resource.set_selector_as_FragmentSelector().set_xywh(
+                i * 100, 0, 50, 50)
+        point = page.add_annotation_to_items()
+        selector = point.set_target_specific_resource()
+        selector.set_source("http://example.com/canvas1")
+        selector = selector.set_selector_as_PointSelector()
+        selector.set_x(120)
+        selector.set_y(10)
+        percent = page.add_annotation_to_items()
+        percent.set_target("http://example.com/canvas1#xywh=pct:0,0,50,50")
+        index = SpatialIndex(page.items, node_size=4)
+        self.assertEqual(index.search("http://example.com/canvas1",
+                                      90, 0, 120, 100),
+                         [page.items[1], page.items[2], point])
+        self.assertEqual(index.at("http://example.com/canvas1", 120, 10),
+                         [page.items[1], point])
+        self.assertEqual(index.at("http://example.com/canvas1", 10, 10,
+                                  percent=True), [percent])
+        index.discard(page.items[1])
+        selector.set_x(3025)
+        index.add(point)
+        self.assertEqual(index.search("http://example.com/canvas1",
+                                      90, 0, 120, 100), [page.items[2]])
+        self.assertEqual(index.at("http://example.com/canvas1", 3025, 10),
+                         [page.items[30], point])
+
+    def test_position_index(self):
+        from wadm.indexes import PositionIndex
+        page = self.page(0)
+        for start, end in ((0, 10), (5, 8), (10, 20), (100, 100), (0, 500)):
+            anno = page.add_annotation_to_items()
+            resource = anno.set_target_specific_resource()
+            resource.set_source("http://example.org/text1")
+            selector = resource.set_selector_as_TextPositionSelector()
+            selector.set_start(start)
+            selector.set_end(end)
+        data = page.add_annotation_to_items()
+        resource = data.set_target_specific_resource()
+        resource.set_source("http://example.org/text1")
+        selector = resource.set_selector_as_DataPositionSelector()
+        selector.set_start(0)
+        selector.set_end(4)
+        index = PositionIndex(page.items, node_size=2)
+        items = page.items
+        self.assertEqual(index.search("http://example.org/text1", 8, 10),
+                         [items[0], items[4]])
+        self.assertEqual(index.at("http://example.org/text1", 10),
+                         [items[2], items[4]])
+        self.assertEqual(index.search("http://example.org/text1", 99, 101),
+                         [items[3], items[4]])
+        self.assertEqual(index.at("http://example.org/text1", 3, data=True),
+                         [data])
+        index.discard(items[4])
+        items[1].target.selector.set_end(12)
+        index.add(items[1])
+        self.assertEqual(index.search("http://example.org/text1", 8, 12),
+                         [items[0], items[2], items[1]])
+
+    def test_temporal_index(self):
+        from wadm.indexes import TemporalIndex, parse_time
+        self.assertEqual(parse_time("http://example.org/v1#t=npt:1:05,1:10.5"),
+                         (65.0, 70.5))
+        self.assertEqual(parse_time("t=7"), (7.0, float("inf")))
+        self.assertIsNone(parse_time("t=20,10"))
+        page = self.page(0)
+        for value in ("t=0,10", "t=10,20", "t=5,12.5"):
+            resource = page.add_annotation_to_items() \
+                .set_target_specific_resource()
+            resource.set_source("http://example.org/video1")
+            resource.set_selector_as_FragmentSelector().set_value(value)
+        point = page.add_annotation_to_items()
+        resource = point.set_target_specific_resource()
+        resource.set_source("http://example.org/video1")
+        resource.set_selector_as_PointSelector().set_t(15)
+        first, second, third = page.items[:3]
+        index = TemporalIndex(page.items)
+        self.assertEqual(index.at("http://example.org/video1", 10),
+                         [second, third])
+        self.assertEqual(index.at("http://example.org/video1", 15),
+                         [second, point])
+        self.assertEqual(index.search("http://example.org/video1", 12.5, 15),
+                         [second])
+        cursor = index.cursor("http://example.org/video1", 9.5)
+        self.assertEqual(cursor.active, [first, third])
+        self.assertEqual([(e.time, e.kind, e.annotation)
+                          for e in cursor.advance(10)],
+                         [(10, "exit", first), (10, "enter", second)])
+        self.assertEqual([(e.time, e.kind, e.annotation)
+                          for e in cursor.advance(16)],
+                         [(12.5, "exit", third), (15, "enter", point),
+                          (15, "exit", point)])
+        self.assertEqual([e.kind for e in cursor.advance(1)],
+                         ["exit", "enter"])
+        self.assertEqual(cursor.active, [first])
+
+
 if __name__ == "__main__":
     unittest.main()
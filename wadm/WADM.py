@@ -15,23 +15,28 @@ Attributes:
     BASE_URL (str): Module level variable containing the URL to be preappend
         to iiifpapi3._CoreAttributes.set_id extend_baseurl
 
-    LANGUAGES (list[str]): Module level variable containing a list of accepted
+    LANGUAGES (Registry): Module level variable containing the accepted
         languages. This variable is used for checking accepted languages, using
         the `IANA sub tag registry`_
 
+    MEDIATYPES (dict): Module level variable containing the IANA media types
+        grouped by top level type. Use register_mediatype for adding one.
+        LANGUAGES and MEDIATYPES are loaded on first use.
+
     CONTEXT (str,list): Module level variable containing the context of the
         JSONLD file. Can be set to a list in case of multiple contexts.
 
     INVALID_URI_CHARACTERS (str): A list of characters that are not accepted
-        in the URL.
+        in the URL. See uri_errors and set_uri_cache.
 
 
 Warning:
-    only language subtags are checked not variants or composite strings.
-    You can manually add a language if you need to use subtags:
+    language tags are parsed following BCP47 (see wadm.bcp47), only the
+    language subtags are checked against LANGUAGES, scripts, regions,
+    variants and extensions only for their syntax. You can manually add a
+    language subtag or a full tag if needed:
 
 Example:
-    >>> from WADM import BCP47lang
     >>> WADM.LANGUAGES.append("de-DE-u-co-phonebk")
 
 Todo:
@@ -44,19 +49,108 @@ Todo:
 .. _IANA sub tag registry:
     https://www.iana.org/assignments/language-subtag-registry/language-subtag-registry
 """
-from . import visualization_html
-from .BCP47_tags_list import lang_tags
-from .dictmediatype import mediatypedict
+from . import bcp47
+from collections import namedtuple
+from datetime import datetime as Datetime, timezone
+from functools import lru_cache
 import json
 import warnings
 import copy
 import re
+import weakref
 global BASE_URL
 BASE_URL = "https://"
+
+
+class Registry(object):
+    """HELPER CLASS
+
+    Note:
+        A set of accepted values (e.g. the language tags) with O(1) lookup.
+        The index is a frozenset built once, `register` (or `append` as for
+        the lists used before) rebuilds it with the new values.
+        If a loader is given the values are loaded on the first lookup, so
+        that the large tables are not imported with the module.
+    """
+
+    def __init__(self, values=(), loader=None):
+        self._loader = loader
+        self._index = None if loader else frozenset(values)
+
+    def _load(self):
+        if self._index is None:
+            self._index = frozenset(self._loader())
+        return self._index
+
+    def __contains__(self, value):
+        index = self._index
+        if index is None:
+            index = self._load()
+        return value in index
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return "Registry of %i values" % len(self._load())
+
+    def register(self, *values):
+        """Add one or more values to the registry.
+
+        Args:
+            *values (str): The values to accept.
+        """
+        self._index = self._load().union(values)
+
+    def append(self, value):
+        """Add a value to the registry, same as `register`.
+
+        Args:
+            value (str): The value to accept.
+        """
+        self.register(value)
+
+    def extend(self, values):
+        """Add the values of an iterable to the registry.
+
+        Args:
+            values (iterable): The values to accept.
+        """
+        self.register(*values)
+
+
+
+
+def _load_languages():
+    from .BCP47_tags_list import lang_tags
+    return lang_tags
+
+
+def _load_mediatypes():
+    """Return MEDIATYPES, importing the IANA table on first use."""
+    global MEDIATYPES
+    try:
+        return MEDIATYPES
+    except NameError:
+        from .dictmediatype import mediatypedict
+        MEDIATYPES = mediatypedict
+        return MEDIATYPES
+
+
+def __getattr__(name):
+    # MEDIATYPES is loaded on first access, see _load_mediatypes.
+    if name == "MEDIATYPES":
+        return _load_mediatypes()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 global LANGUAGES
-LANGUAGES = lang_tags
-global MEDIATYPES
-MEDIATYPES = mediatypedict
+LANGUAGES = Registry(loader=_load_languages)
+# the index of all the MEDIATYPES, see _mediatypes_index.
+_MEDIATYPES_INDEX = (None, None)
 global CONTEXT
 CONTEXT = "http://www.w3.org/ns/anno.jsonld"
 global INVALID_URI_CHARACTERS
@@ -64,26 +158,70 @@ global INVALID_URI_CHARACTERS
 INVALID_URI_CHARACTERS = r"""!"$%&'()*+ :;<=>?@[\]^`{|}~ """
 TYPES = ["Text","Video","Sound","Image","Dataset"]
 
-class Required(object):
+class _Sentinel(object):
     """HELPER CLASS
 
     Note:
-        This is not an WADM object but a class used by this software to
-        identify required fields. This is equivalent to MUST statement in the
-        guideline with the meaning of https://tools.ietf.org/html/rfc2119 .
+        Base of Required and Recommended. The sentinels are immutable and
+        shared: the WADM classes keep one per attribute (see _missing_id)
+        and copying them returns the same object. If owner is given the
+        description is formatted with it only when it is read.
     """
+    __slots__ = ("_description", "_owner")
+
+    def __init__(self, description=None, owner=None):
+        object.__setattr__(self, "_description", description)
+        object.__setattr__(self, "_owner", owner)
+
+    def _message(self):
+        if self._owner is None or self._description is None:
+            return self._description
+        return self._description % self._owner
+
+    @property
+    def __dict__(self):
+        return {self.__class__.__name__: self._message()}
 
-    def __init__(self, description=None):
-        self.Required = description
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is shared, it cannot be modified."
+                             % self.__class__.__name__)
+
+    __delattr__ = __setattr__
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return self.__class__, (self._description, self._owner)
 
     def __eq__(self, o):
         return True if isinstance(o, self.__class__) else False
 
+    __hash__ = None
+
     def __repr__(self):
-        return 'Required attribute:%s' % self.Required
+        return '%s attribute:%s' % (self.__class__.__name__, self._message())
 
 
-class Recommended(object):
+class Required(_Sentinel):
+    """HELPER CLASS
+
+    Note:
+        This is not an WADM object but a class used by this software to
+        identify required fields. This is equivalent to MUST statement in the
+        guideline with the meaning of https://tools.ietf.org/html/rfc2119 .
+    """
+    __slots__ = ()
+
+    @property
+    def Required(self):
+        return self._message()
+
+
+class Recommended(_Sentinel):
     """HELPER CLASS
 
     Note:
@@ -91,15 +229,52 @@ class Recommended(object):
         identify recommended fields. This is equivalent to SHOULD statement in
         the guideline with the meaning of https://tools.ietf.org/html/rfc2119.
     """
+    __slots__ = ()
 
-    def __init__(self, description=None):
-        self.Recommended = description
+    @property
+    def Recommended(self):
+        return self._message()
 
-    def __eq__(self, o):
-        return True if isinstance(o, self.__class__) else False
 
-    def __repr__(self):
-        return 'Recommended attribute:%s' % self.Recommended
+# The Required id of each class, see _missing_id.
+_MISSING_IDS = {}
+
+
+def _missing_id(cls):
+    """Return the Required id shared by the instances of a class."""
+    try:
+        return _MISSING_IDS[cls]
+    except KeyError:
+        sentinel = _MISSING_IDS[cls] = Required(
+            "A %s must have the ID property.", cls.__name__)
+        return sentinel
+
+
+class _Frozen(object):
+    """HELPER CLASS
+
+    Note:
+        Mixin of the frozen WADM objects, see freeze. These are shared by
+        many Annotations (e.g. the parts of an AnnotationTemplate) so they
+        cannot be modified, and copying them returns the same object.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is frozen, it cannot be modified."
+                             % self.__class__.__name__)
+
+    __delattr__ = __setattr__
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return _unpickle_frozen, (self.__class__.__bases__[0],
+                                  dict(self.__dict__))
 
 
 # Note: we use None for OPTIONAL with the meaning of
@@ -116,18 +291,6 @@ def unused(attr):
         return False
 
 
-# For performance optimization we can reduce the instantiation of Classes
-if not __debug__:
-    def Recommended(msg=None):
-        return None
-
-    def Required(msg=None):
-        return None
-
-    def unused(attr):
-        return True if attr is None else False
-
-
 def serializable(attr):
     """Check if attribute is Required and if so rise Value error.
 
@@ -142,6 +305,173 @@ def serializable(attr):
         return True
 
 
+def serialize(obj, dumps_errors=False, sort_keys=False):
+    """Convert a WADM object to a dict of plain JSON types.
+
+    The object graph is walked only once: unused attributes are dropped and
+    Required attributes raise a ValueError in the same pass, as the
+    `json_dumps` serializer does.
+
+    Args:
+        obj (object): The WADM object to convert.
+        dumps_errors (bool, optional): If True the Required and Recommended
+            attributes are kept in the output. Defaults to False.
+        sort_keys (bool, optional): Sort the keys. Defaults to False.
+
+    Raises:
+        ValueError: If a Required attribute is found and dumps_errors is False.
+
+    Returns:
+        dict: The object as a dict.
+    """
+    return _serialize_value(obj, dumps_errors, sort_keys)
+
+
+# Serialization plans: for each class we cache the attributes set by its
+# __init__ and what kind of value they hold there, so that known scalar
+# fields can be copied without probing them.
+_SCALAR = 0
+_SENTINEL = 1
+_NESTED = 2
+
+_PLANS = {}
+_DYNAMIC_FIELDS = {}
+
+
+class _SerializationPlan(object):
+    """HELPER CLASS
+
+    Note:
+        The ordered attribute names of a WADM class and, for each of them,
+        if it holds a scalar, a Required/Recommended sentinel or something
+        that can nest.
+    """
+    __slots__ = ("fields", "kinds")
+
+    def __init__(self, kinds):
+        self.fields = tuple(kinds)
+        self.kinds = kinds
+
+
+def _get_plan(cls):
+    """Return the serialization plan of a class, building it at first use."""
+    try:
+        return _PLANS[cls]
+    except KeyError:
+        pass
+    if issubclass(cls, _Frozen):
+        # frozen classes cannot be built, they have the fields of their base.
+        plan = _PLANS[cls] = _get_plan(cls.__bases__[0])
+        return plan
+    try:
+        attrs = cls().__dict__
+    except Exception:
+        # classes that cannot be built without arguments use the slow path.
+        attrs = {}
+    kinds = {}
+    for name, value in attrs.items():
+        if isinstance(value, (str, int, float)):
+            kinds[name] = _SCALAR
+        elif isinstance(value, (Required, Recommended)):
+            kinds[name] = _SENTINEL
+        else:
+            kinds[name] = _NESTED
+    for name in _DYNAMIC_FIELDS.get(cls, ()):
+        kinds.setdefault(name, _NESTED)
+    plan = _PLANS[cls] = _SerializationPlan(kinds)
+    return plan
+
+
+def set_dynamic_attribute(selfx, name, value):
+    """Set an attribute that is not created by the __init__ of the class.
+
+    The serialization plan of the class is invalidated, so the attribute is
+    included the next time the plan is built.
+
+    Args:
+        selfx (object): The WADM object.
+        name (str): The name of the attribute e.g. schema:softwareVersion.
+        value (any): The value of the attribute.
+    """
+    cls = selfx.__class__
+    setattr(selfx, name, value)
+    fields = _DYNAMIC_FIELDS.setdefault(cls, set())
+    if name not in fields:
+        fields.add(name)
+        _PLANS.pop(cls, None)
+
+
+def _serialize_value(value, dumps_errors, sort_keys, fragments=None):
+    """Walk a value, see serialize. If fragments (a bulk.FragmentCache) is
+    given the frozen objects are replaced by the markers of their JSON."""
+    cls = value.__class__
+    # identity checks first, these are by far the most common values.
+    if cls is str or value is None or cls is int or cls is float or cls is bool:
+        return value
+    if cls is list or cls is tuple:
+        return [_serialize_value(i, dumps_errors, sort_keys, fragments)
+                for i in value]
+    if cls is dict:
+        res = {k: _serialize_value(v, dumps_errors, sort_keys, fragments)
+               for k, v in value.items()}
+    elif fragments is not None and isinstance(value, _Frozen):
+        return fragments.marker(value)
+    elif isinstance(value, (str, int, float)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return [_serialize_value(i, dumps_errors, sort_keys, fragments)
+                for i in value]
+    elif isinstance(value, dict):
+        res = {k: _serialize_value(v, dumps_errors, sort_keys, fragments)
+               for k, v in value.items()}
+    else:
+        return _serialize_object(value, dumps_errors, sort_keys, fragments)
+    if sort_keys:
+        res = dict(sorted(res.items()))
+    return res
+
+
+def _serialize_object(value, dumps_errors, sort_keys, fragments=None):
+    """Walk the attributes of a WADM object, see _serialize_value."""
+    cls = value.__class__
+    try:
+        kinds = _PLANS[cls].kinds
+    except KeyError:
+        kinds = _get_plan(cls).kinds
+    res = {}
+    for k, v in value.__dict__.items():
+        kind = kinds.get(k, _NESTED)
+        if kind == _SCALAR:
+            vcls = v.__class__
+            if vcls is str or vcls is int or vcls is float or vcls is bool:
+                res[k] = v
+                continue
+        if v is None:
+            continue
+        if not dumps_errors and (kind == _SENTINEL or
+                                 not isinstance(v, (str, list))):
+            if isinstance(v, Required):
+                raise ValueError(v)
+            if isinstance(v, Recommended):
+                continue
+        res[k] = _serialize_value(v, dumps_errors, sort_keys, fragments)
+    if sort_keys:
+        res = dict(sorted(res.items()))
+    return res
+
+
+# The indexes notified when an object is added to another, an attribute
+# holding an object is set or an id is set, see indexes.
+_OBSERVERS = weakref.WeakSet()
+
+
+def _notify(event, *args):
+    """Call a method of the indexes: _added(parent, destination, obj),
+    _set(obj, attribute) or _id_set(obj)."""
+    for observer in list(_OBSERVERS):
+        getattr(observer, event)(*args)
+
+
 def add_to(selfx, destination, classx, obj, acceptedclasses=None, target=None):
     """Helper function used for adding WADM object to to WADM lists.
 
@@ -160,8 +490,12 @@ def add_to(selfx, destination, classx, obj, acceptedclasses=None, target=None):
     Returns:
         WADM object: A reference to an instance of the WADM object.
     """
-    # if the argument is none we create a list.
-    if unused(selfx.__dict__[destination]):
+    if isinstance(selfx, _Frozen):
+        raise AttributeError("%s is frozen, it cannot be modified."
+                             % selfx.__class__.__name__)
+    # if the argument is none we create a list (getattr maps the values of
+    # lazily read objects).
+    if unused(getattr(selfx, destination)):
         selfx.__dict__[destination] = []
     # if there is already a valid string we insert it on the list.
     elif not isinstance(selfx.__dict__[destination],list):
@@ -170,11 +504,15 @@ def add_to(selfx, destination, classx, obj, acceptedclasses=None, target=None):
     if obj is None and target is None:
         obj = classx()
         selfx.__dict__[destination].append(obj)
+        if _OBSERVERS:
+            _notify("_added", selfx, destination, obj)
         return obj
     elif obj is None:
         # used for annotation.
         obj = classx(target=target)
         selfx.__dict__[destination].append(obj)
+        if _OBSERVERS:
+            _notify("_added", selfx, destination, obj)
         return obj
     # otherwise we check that the object that we provide has the right type.
     else:
@@ -182,6 +520,8 @@ def add_to(selfx, destination, classx, obj, acceptedclasses=None, target=None):
             acceptedclasses = classx
         if isinstance(obj, acceptedclasses):
             selfx.__dict__[destination].append(obj)
+            if _OBSERVERS:
+                _notify("_added", selfx, destination, obj)
         else:
             obj_name = obj.__class__.__name__
             class_name = selfx.__class__.__name__
@@ -216,8 +556,11 @@ def addOrSet_to(selfx, destination, classx, obj, acceptedclasses=None, target=No
     else:
         if acceptedclasses is not None:
             assert isinstance(obj,acceptedclasses)
+    if isinstance(selfx, _Frozen):
+        raise AttributeError("%s is frozen, it cannot be modified."
+                             % selfx.__class__.__name__)
     # we check where to put the object.
-    if unused(selfx.__dict__[destination]):
+    if unused(getattr(selfx, destination)):
         selfx.__dict__[destination] = obj
     # if there is already something we insert it on the list.
     elif not isinstance(selfx.__dict__[destination],list):
@@ -226,25 +569,114 @@ def addOrSet_to(selfx, destination, classx, obj, acceptedclasses=None, target=No
     # otherwise we just inserted in the list.
     else:
         selfx.__dict__[destination].append(obj)
+    if _OBSERVERS:
+        _notify("_added", selfx, destination, obj)
     return obj
 
 def setOrAppendStr(selfx,destination,value,acceptedObj):
-    if unused(selfx.__dict__[destination]):
-        selfx.__dict__[destination] = value
+    # getattr/setattr work also with the compact (__slots__) classes.
+    current = getattr(selfx, destination)
+    if unused(current):
+        setattr(selfx, destination, value)
     # if there is already a valid string we insert it on the list.
-    elif isinstance(selfx.__dict__[destination],str):
-        selfx.__dict__[destination] = [selfx.__dict__[destination]]
-        selfx.__dict__[destination].append(value)
+    elif isinstance(current,str):
+        setattr(selfx, destination, [current, value])
     # if there is already a valid object we insert it on the list
-    elif isinstance(selfx.__dict__[destination],acceptedObj):
-        selfx.__dict__[destination] = [selfx.__dict__[destination]]
-        selfx.__dict__[destination].append(value)
+    elif isinstance(current,acceptedObj):
+        setattr(selfx, destination, [current, value])
     # if there is already a list we just append
-    elif isinstance(selfx.__dict__[destination],list):
-        selfx.__dict__[destination].append(value)
+    elif isinstance(current,list):
+        current.append(value)
     else:
         raise ValueError(f"Could not add {value} to {destination}.")
 
+class InvalidCharacter(namedtuple("InvalidCharacter",
+                                  "uri position character")):
+    """HELPER CLASS
+
+    Note:
+        A character of INVALID_URI_CHARACTERS found in an IRI, see
+        uri_errors. str() gives the IRI with a caret under the character.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        carat = "a space" if self.character == " " else self.character
+        return "I found: %s here. \n%s\n%s^" % (
+            carat, self.uri, " " * self.position)
+
+
+_URI_SCHEME = re.compile(r"https?:/")
+# the selector is not checked.
+_XYWH_FRAGMENT = r"#xywh=(?:pct:)?\d+,\d+,\d+,\d+"
+# INVALID_URI_CHARACTERS and the compiled patterns, see _uri_validator.
+_URI_VALIDATOR = (None, None)
+
+
+def _uri_validator():
+    """Return the patterns matching a valid IRI and an invalid character,
+    they are rebuilt only if INVALID_URI_CHARACTERS was replaced."""
+    global _URI_VALIDATOR
+    characters, patterns = _URI_VALIDATOR
+    if characters is not INVALID_URI_CHARACTERS:
+        invalid = re.escape(INVALID_URI_CHARACTERS)
+        patterns = (
+            re.compile(r"(?:https?:/)?[^%s]*(?:%s)?" % (invalid, _XYWH_FRAGMENT)),
+            re.compile("[%s]" % invalid))
+        _URI_VALIDATOR = INVALID_URI_CHARACTERS, patterns
+    return patterns
+
+
+def _find_uri_errors(URI, patterns):
+    valid, invalid = patterns
+    if valid.fullmatch(URI):
+        return ()
+    match = _URI_SCHEME.match(URI)
+    start = match.end() if match else 0
+    match = re.search(_XYWH_FRAGMENT + "$", URI)
+    end = match.start() if match else len(URI)
+    return tuple(InvalidCharacter(URI, m.start(), m.group())
+                 for m in invalid.finditer(URI, start, end))
+
+
+_uri_errors = _find_uri_errors
+
+
+def set_uri_cache(maxsize=4096):
+    """Keep the result of the last IRIs checked, useful when the same
+    source or target is used by many annotations.
+
+    Args:
+        maxsize (int, optional): The number of IRIs in the cache, 0 or None
+            disables the cache. Defaults to 4096.
+    """
+    global _uri_errors
+    if maxsize:
+        _uri_errors = lru_cache(maxsize)(_find_uri_errors)
+    else:
+        _uri_errors = _find_uri_errors
+
+
+def uri_errors(URI):
+    """Return the invalid characters of an IRI.
+
+    The scheme and a final xywh fragment are not checked.
+
+    Example:
+        >>> [(e.position, e.character) for e in WADM.uri_errors(
+        ...     "http://example.org/a b")]
+        [(20, ' ')]
+
+    Args:
+        URI (str): The URI to check.
+
+    Returns:
+        tuple: The InvalidCharacter found, empty if the IRI is valid.
+    """
+    return _uri_errors(URI, _uri_validator())
+
+
 def check_valid_URI(URI):
     """Check if it is a valid URI.
 
@@ -254,20 +686,51 @@ def check_valid_URI(URI):
     Returns:
         Bool: True if it is valid.
     """
-    isvalid = True
-    URI = URI.replace("https:/", "", 1)
-    URI = URI.replace("http:/", "", 1)
-    # we remove the selector.
-    URI = re.sub(r'#xywh=\d+?,\d+?,\d+?,\d+?$', '', URI)
-    URI = re.sub(r'#xywh=pct:\d+?,\d+?,\d+?,\d+?$', '', URI)
-    for indx, carat in enumerate(URI):
-        if carat in INVALID_URI_CHARACTERS:
-            if carat == " ":
-                carat = "a space"
-            arrow = " "*(indx) + "^"
-            isvalid = False
-            print("I found: %s here. \n%s\n%s" % (carat, URI, arrow))
-    return isvalid
+    return not _uri_errors(URI, _uri_validator())
+
+
+def _assert_URI(URI, message="Special characters must be encoded:"):
+    """Assert that URI is valid, the message of the AssertionError lists the
+    invalid characters. Nothing is checked in "deferred" validation mode.
+
+    Args:
+        URI (str): The URI to check.
+        message (str, optional): The first line of the message.
+    """
+    if not _DEFERRED:
+        errors = _uri_errors(URI, _uri_validator())
+        assert not errors, "%s\n%s" % (message,
+                                       "\n".join(map(str, errors)))
+
+
+# If True the setters do not check the values, see set_validation.
+_DEFERRED = False
+
+
+def set_validation(mode="eager"):
+    """Choose when the values passed to the setters are checked.
+
+    In "eager" mode (the default) each setter checks its value and raises
+    an AssertionError. In "deferred" mode the setters only store the values
+    (IRIs, languages, datetimes, formats, types and textDirection), which
+    are checked at once by validation.validate or validation.validate_many.
+    Checks on the classes of the objects are always eager.
+
+    Example:
+        >>> WADM.set_validation("deferred")
+        >>> anno = build_annotation()
+        >>> issues = validation.validate(anno)
+
+    Args:
+        mode (str, optional): "eager" or "deferred". Defaults to "eager".
+
+    Raises:
+        ValueError: If the mode is not known.
+    """
+    global _DEFERRED
+    if mode not in ("eager", "deferred"):
+        raise ValueError("The validation mode must be eager or deferred.")
+    _DEFERRED = mode == "deferred"
 
 
 def check_ID(extendbase_url, objid):
@@ -289,17 +752,100 @@ def check_ID(extendbase_url, objid):
         assert BASE_URL.endswith("/") or extendbase_url.startswith("/"), \
             "Add / to extandbase_url or BASE_URL"
         joined = "".join((BASE_URL, extendbase_url))
+        if _DEFERRED:
+            return joined
         assert joined.startswith("http"), "ID must start with http or https"
-        assert check_valid_URI(joined), "Special characters must be encoded"
+        _assert_URI(joined)
         return joined
     else:
+        if _DEFERRED:
+            return objid
         assert objid.startswith("http"), "ID must start with http or https"
-        assert check_valid_URI(objid), "Special characters must be encoded"
+        _assert_URI(objid)
         return objid
 
+def check_language(language):
+    """Check a language tag, "none" or a BCP47 tag whose language subtag
+    is in LANGUAGES.
+
+    Args:
+        language (str): The language tag e.g. de-DE-u-co-phonebk.
+
+    Returns:
+        bool: True if the tag is valid.
+    """
+    if not isinstance(language, str):
+        return False
+    if language in LANGUAGES or language == "none":
+        return True
+    return bcp47.is_valid_tag(language, LANGUAGES)
+
+
+def register_language(*languages):
+    """Add one or more language tags to the accepted LANGUAGES.
+
+    Example:
+        >>> WADM.register_language("de-DE-u-co-phonebk")
+
+    Args:
+        *languages (str): The language tags.
+    """
+    LANGUAGES.register(*languages)
+
+
+def _mediatypes_index():
+    """Return the Registry of all the MEDIATYPES, it is rebuilt only if
+    MEDIATYPES was replaced."""
+    global _MEDIATYPES_INDEX
+    mediatypes = _load_mediatypes()
+    source, index = _MEDIATYPES_INDEX
+    if source is not mediatypes:
+        index = Registry(mtype for sl in mediatypes.values() for mtype in sl)
+        _MEDIATYPES_INDEX = mediatypes, index
+    return index
+
+
+def register_mediatype(mediatype):
+    """Add a media type to MEDIATYPES and to the index used for checking
+    the formats.
+
+    Example:
+        >>> WADM.register_mediatype("application/x-my-annotations")
+
+    Args:
+        mediatype (str): The media type in the form type/subtype.
+    """
+    assert "/" in mediatype, "Format should be in the form type/format e.g. image/jpeg"
+    mediatypes = _load_mediatypes()
+    mediatypes.setdefault(mediatype.split("/")[0], []).append(mediatype)
+    _mediatypes_index().register(mediatype)
+
+
+def _format_error(format):
+    """Return why format is not a valid IANA media type, None if it is."""
+    if "/" not in format or not format.split("/")[0].isalpha():
+        return "Format should be in the form type/format e.g. image/jpeg"
+    if format == 'image/jpg':
+        return "Correct media type for jpeg should be image/jpeg not image/jpg"
+    if format == 'image/tif':
+        return "Correct media type  for tiff should be image/tiff"
+    if format not in _mediatypes_index():
+        return "Not a IANA valid media type."
+    return None
+
+
+def _check_format(format):
+    """Check that format is a valid IANA media type."""
+    if not _DEFERRED:
+        error = _format_error(format)
+        assert error is None, error
+
+
 class _Format(object):
     """HELPER CLASS for setting the Format.
     """
+    __slots__ = ()
+
     def set_format(self, format):
         """Set the format of the resource.
 
@@ -313,12 +859,7 @@ class _Format(object):
         Args:
             format (str): Usually  is the MIME e.g. image/jpeg.
         """
-
-        assert "/" in format, "Format should be in the form type/format e.g. image/jpeg"
-        assert format.split("/")[0].isalpha(), "Format should be in the form type/format e.g. image/jpeg"
-        assert not format == 'image/jpg', "Correct media type for jpeg should be image/jpeg not image/jpg"
-        assert not format == 'image/tif', "Correct media type  for tiff should be image/tiff"
-        assert any(format in sl for sl in MEDIATYPES.values()), "Not a IANA valid media type."
+        _check_format(format)
         self.format = format
 
     def add_format(self, format):
@@ -338,27 +879,65 @@ class _Format(object):
             self.format = []
         elif isinstance(self.format,str):
             self.format = [self.format]
-        assert "/" in format, "Format should be in the form type/format e.g. image/jpeg"
-        assert format.split("/")[0].isalpha(), "Format should be in the form type/format e.g. image/jpeg"
-        assert not format == 'image/jpg', "Correct media type for jpeg should be image/jpeg not image/jpg"
-        assert not format == 'image/tif', "Correct media type  for tiff should be image/tiff"
-        assert any(format in sl for sl in MEDIATYPES.values()), "Not a IANA valid media type."
+        _check_format(format)
         self.format.append(format)
 
+# modified regex from www.w3.org https://www.w3.org/TR/xmlschema11-2/#dateTime
+_XSD_DATETIME = re.compile(
+    r"-?([1-9][0-9]{3,}|0[0-9]{3})"
+    r"-(0[1-9]|1[0-2])"
+    r"-(0[1-9]|[12][0-9]|3[01])"
+    r"T(([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9](\.[0-9]+)?|(24:00:00(\.0+)?))"
+    r"(Z|(\+|-)((0[0-9]|1[0-3]):[0-5][0-9]|14:00))")
+# fast path of checkDatetime for the common YYYY-MM-DDTHH:MM:SSZ literals.
+_UTC_TIMESTAMP = re.compile(
+    r"[0-9]{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12][0-9]|3[01])"
+    r"T(?:[01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]Z")
+
+
+def _format_datetime(value):
+    if value.tzinfo is None or value.utcoffset() is None:
+        raise ValueError("The datetime must have a timezone. It was: %s"
+                         % value.isoformat())
+    value = value.astimezone(timezone.utc)
+    if value.microsecond:
+        return "%04d-%02d-%02dT%02d:%02d:%02d.%06dZ" % (
+            value.year, value.month, value.day, value.hour, value.minute,
+            value.second, value.microsecond)
+    return "%04d-%02d-%02dT%02d:%02d:%02dZ" % (
+        value.year, value.month, value.day, value.hour, value.minute,
+        value.second)
+
+
 def checkDatetime(datetime):
-    # check using a modified regex from www.w3.org
-        # https://www.w3.org/TR/xmlschema11-2/#dateTime
-    r = (r"-?([1-9][0-9]{3,}|0[0-9]{3})"
-        r"-(0[1-9]|1[0-2])"
-        r"-(0[1-9]|[12][0-9]|3[01])"
-        r"T(([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9](\.[0-9]+)?|(24:00:00(\.0+)?))"
-        r"(Z|(\+|-)((0[0-9]|1[0-3]):[0-5][0-9]|14:00))")
-    assert re.match(r, datetime), "The value must be an XSD dateTime"\
-        "literal with a timezone. It was: %s" % datetime
+    """Check a XSD dateTime literal.
+
+    Args:
+        datetime (str, datetime.datetime): The literal, or a datetime with a
+            timezone that is converted to UTC.
+
+    Raises:
+        ValueError: If it is not a XSD dateTime literal with a timezone.
+
+    Returns:
+        str: The XSD dateTime literal.
+    """
+    if isinstance(datetime, str):
+        if _DEFERRED or _UTC_TIMESTAMP.fullmatch(datetime):
+            return datetime
+        if _XSD_DATETIME.fullmatch(datetime) is None:
+            raise ValueError("The value must be an XSD dateTime literal with "
+                             "a timezone. It was: %s" % datetime)
+    elif isinstance(datetime, Datetime):
+        return _format_datetime(datetime)
+    else:
+        raise ValueError("The value must be an XSD dateTime literal with "
+                         "a timezone. It was: %r" % (datetime,))
     if datetime[-1] != "Z":
         warnings.warn(f"The value should be given in UTC with the Z was {datetime}")
     return datetime
 
+
 # Let's group all the common arguments across the different types of collection
 class _CoreAttributes(object):
     """HELPER CLASS
@@ -370,9 +949,7 @@ class _CoreAttributes(object):
 
     def __init__(self):
         super(_CoreAttributes, self).__init__()
-        self.id = Required(
-            "A %s must have the ID property." %
-            self.__class__.__name__)
+        self.id = _missing_id(self.__class__)
         self.type = self.__class__.__name__
         # These might be suggested or may be used if needed.
 
@@ -394,6 +971,8 @@ class _CoreAttributes(object):
                 `id = iiifpapi3.BASE_URL + extendbase_url`. Defaults to None.
         """
         self.id = check_ID(extendbase_url, objid)
+        if _OBSERVERS:
+            _notify("_id_set", self)
 
     def json_dumps(
             self,
@@ -416,36 +995,10 @@ class _CoreAttributes(object):
         Returns:
             str: The JSON object as a string.
         """
-        if context is None:
-            context = CONTEXT
-
-        if not __debug__:
-            # in debug Required and Recommend are None hence we use a faster
-            # serializer
-            print("Debug False")
-            dumps_errors = True
-
-        def serializerwitherrors(obj):
-            return {k: v for k, v in obj.__dict__.items() if v is not None}
-
-        def serializer(obj):
-            return {k: v for k, v in obj.__dict__.items() if serializable(v)}
-        if dumps_errors:
-            res = json.dumps(
-                self,
-                default=serializerwitherrors,
-                indent=2,
-                ensure_ascii=ensure_ascii,
-                sort_keys=sort_keys)
-        else:
-            res = json.dumps(
-                self,
-                default=serializer,
-                indent=2,
-                ensure_ascii=ensure_ascii,
-                sort_keys=sort_keys)
-        # little hack for fixing context first 3 chrs "{\n"
-        res = "".join(('{\n  "@context": %s,\n ' % json.dumps(context), res[3:]))
+        res = json.dumps(
+            self._to_jsonld(dumps_errors, sort_keys, context),
+            indent=2,
+            ensure_ascii=ensure_ascii)
         return res
 
     def orjson_dumps(
@@ -467,35 +1020,10 @@ class _CoreAttributes(object):
             str: The JSON object as a string.
         """
         import orjson
-        if context is None:
-            context = CONTEXT
-
-        if not __debug__:
-            # in debug Required and Recommend are None hence we use a faster
-            # serializer
-            print("Debug False")
-            dumps_errors = True
-
-        def serializerwitherrors(obj):
-            return {k: v for k, v in obj.__dict__.items() if v is not None}
-
-        def serializer(obj):
-            return {k: v for k, v in obj.__dict__.items() if serializable(v)}
-
-        if dumps_errors:
-            res = orjson.dumps(
-                self,
-                default=serializerwitherrors,
-                option=orjson.OPT_INDENT_2)
-        else:
-            res = orjson.dumps(
-                self,
-                default=serializer,
-                option=orjson.OPT_INDENT_2)
-        # little hack for fixing context first 3 chrs "{\n"
-        res = "".join(('{\n  "@context": %s,\n ' % json.dumps(context),
-                      res[3:].decode("utf-8")))
-        return res
+        res = orjson.dumps(
+            self._to_jsonld(dumps_errors, False, context),
+            option=orjson.OPT_INDENT_2)
+        return res.decode("utf-8")
 
     def to_json(
             self,
@@ -516,11 +1044,19 @@ class _CoreAttributes(object):
         Return:
             dict: a JSON dump of the object as dict.
         """
-        res = json.loads(self.json_dumps(
-            dumps_errors=dumps_errors,
-            ensure_ascii=ensure_ascii,
-            sort_keys=sort_keys,
-            context=context))
+        return self._to_jsonld(dumps_errors, sort_keys, context)
+
+    def _to_jsonld(self, dumps_errors, sort_keys, context):
+        """Serialize the object with the @context as the first key, if
+        context is False the @context is left out."""
+        if context is False:
+            return serialize(
+                self, dumps_errors=dumps_errors, sort_keys=sort_keys)
+        if context is None:
+            context = CONTEXT
+        res = {"@context": context}
+        res.update(serialize(
+            self, dumps_errors=dumps_errors, sort_keys=sort_keys))
         return res
 
     def json_save(self, filename, save_errors=False, ensure_ascii=False, context=None):
@@ -562,10 +1098,15 @@ class _CoreAttributes(object):
         Returns:
             bool: True.
         """
-        jdump = self.json_dumps(dumps_errors=True)
-        print(jdump)
-        print("Missing required field: %s." % jdump.count('"Required":'))
-        print("Missing recommended field: %s." % jdump.count('"Recommended":'))
+        from . import validation
+        print(self.json_dumps(dumps_errors=True))
+        missing = {"required": [], "recommended": []}
+        for issue in validation.iter_missing(self):
+            missing[issue.rule].append(issue.path)
+        print("Missing required field: %s. %s" % (
+            len(missing["required"]), " ".join(missing["required"])))
+        print("Missing recommended field: %s. %s" % (
+            len(missing["recommended"]), " ".join(missing["recommended"])))
         return True
 
     def show_errors_in_browser(self, getHTML=False):
@@ -580,6 +1121,7 @@ class _CoreAttributes(object):
             str: If getHTML is set to true returns the HTML as str.
         """
         jsonf = self.json_dumps(dumps_errors=True)
+        from . import visualization_html
         HTML = visualization_html.show_error_in_browser(jsonf, getHTML=getHTML)
         return HTML
 
@@ -598,6 +1140,8 @@ class _CoreAttributes(object):
 class _ImmutableType(object):
     """HELPER CLASS In some WADM objects the type cannot be changed.
     """
+    __slots__ = ()
+
     def set_type(self, mtype=None):
         """In case of WADM objects with predefined type this function won't
         change the type but will rise an error if you try to change it.
@@ -640,7 +1184,7 @@ class _Agent(_CoreAttributes):
         Args:
             type (str): The Agent type (Person,Organization,Software)
         """
-        assert type in ["Person","Organization","Software"], "Type must be Person, Organization or Software."
+        assert _DEFERRED or type in ["Person","Organization","Software"], "Type must be Person, Organization or Software."
         self.type = type
 
     def set_name(self,name):
@@ -687,10 +1231,12 @@ class _Agent(_CoreAttributes):
         self.email_sha1 = email_sha1
 
     def set_homepage(self,homepageUrl):
-        assert check_valid_URI(homepageUrl),f"Invalid URI for homepage: {homepageUrl}"
+        _assert_URI(homepageUrl, f"Invalid URI for homepage: {homepageUrl}")
         self.homepage = homepageUrl
 
 class _Selector(_ImmutableType):
+    __slots__ = ()
+
     def __init__(self):
         self.type = self.__class__.__name__
         self.refinedBy = None
@@ -724,12 +1270,12 @@ class ImageApiSelector(_Format,_Selector):
     representation.
     """
     def __init__(self):
-        self.type = "ImageApiSelector"
+        super(ImageApiSelector, self).__init__()
         self.region = None
         self.size = None
         self.rotation = None
         self.quality = None
-        self.fromat = None
+        self.format = None
 
     def set_region(self, region):
         """Set the region of the image API selector.
@@ -794,7 +1340,7 @@ class PointSelector(_Selector):
     """
 
     def __init__(self):
-        self.type = self.__class__.__name__
+        super(PointSelector, self).__init__()
         self.x = None
         self.y = None
         self.t = None
@@ -833,10 +1379,13 @@ class FragmentSelector(_Selector):
     https://www.w3.org/TR/annotation-model/#fragment-selector
 
     """
+    _MISSING_VALUE = Required("A fragment selector must have a value!")
+    _MISSING_CONFORMSTO = Recommended("The Fragment Selector should have exactly 1 conformsTo link to the specification that defines the syntax of the fragment")
+
     def __init__(self):
         super(FragmentSelector,self).__init__()
-        self.value = Required("A fragment selector must have a value!")
-        self.conformsTo = Recommended("The Fragment Selector should have exactly 1 conformsTo link to the specification that defines the syntax of the fragment")
+        self.value = self._MISSING_VALUE
+        self.conformsTo = self._MISSING_CONFORMSTO
 
     def set_value(self, value):
         """Set the value of the FragmentSelector
@@ -1013,7 +1562,7 @@ class _RightsInformationIdentities(object):
         self.via = None
 
     def add_rights(self,rights):
-        assert check_valid_URI(rights),"The value must be an IRI."
+        _assert_URI(rights, "The value must be an IRI.")
         if unused(self.rights):
             self.rights = rights
         elif isinstance(self.rights,str):
@@ -1024,7 +1573,7 @@ class _RightsInformationIdentities(object):
         self.canonical = canonical
 
     def add_via(self,via):
-        assert check_valid_URI(via),"The value must be an IRI."
+        _assert_URI(via, "The value must be an IRI.")
         setOrAppendStr(self,"via",via,str)
 
 class Person(_Agent,_ImmutableType):
@@ -1046,7 +1595,7 @@ class Software(_Agent,_CoreAttributes,_ImmutableType):
         super(Software, self).__init__()
 
     def set_softwareVersion(self,softwareVersione):
-        setattr(self,"schema:softwareVersion",softwareVersione)
+        set_dynamic_attribute(self,"schema:softwareVersion",softwareVersione)
 
 class _LifeCycleInformation(object):
 
@@ -1082,7 +1631,7 @@ class _LifeCycleInformation(object):
         """Set the time at which the Annotation serialization was generated.
 
         Args:
-            datetime (str): The time at which the Annotation serialization was 
+            datetime (str, datetime.datetime): The time at which the Annotation serialization was 
             generated.
         """
         self.generated = checkDatetime(datetime=datetime)
@@ -1091,7 +1640,7 @@ class _LifeCycleInformation(object):
         """Set the time at which the resource was modified, after creation.
 
         Args:
-            datetime (str): The time at which the resource was modified, after
+            datetime (str, datetime.datetime): The time at which the resource was modified, after
             creation.
         """
         self.modified = checkDatetime(datetime=datetime)
@@ -1100,21 +1649,23 @@ class _LifeCycleInformation(object):
         """Set the time at which the resource was created.
 
         Args:
-            datetime (str): The time at which the resource was created.
+            datetime (str, datetime.datetime): The time at which the resource was created.
         """
         self.created = checkDatetime(datetime=datetime)
 
 class _IntendedAudience(_CoreAttributes):
+    _MISSING_TYPE = Recommended("The Audience should have 1 or more types and they should come from the schema.org class structure.")
+
     def __init__(self):
         super(_IntendedAudience,self).__init__()
-        self.type = Recommended("The Audience should have 1 or more types and they should come from the schema.org class structure.")
+        self.type = self._MISSING_TYPE
 
     def set_type(self,mtype):
-        assert mtype.startswith("schema:"), "First part should start with schema: prefix"
+        assert _DEFERRED or mtype.startswith("schema:"), "First part should start with schema: prefix"
         self.type = mtype
 
     def add_type(self,mtype):
-        assert mtype.startswith("schema:"), "First part should start with schema: prefix"
+        assert _DEFERRED or mtype.startswith("schema:"), "First part should start with schema: prefix"
         if unused(self.type):
             self.type = []
         elif isinstance(self.type,str):
@@ -1123,7 +1674,7 @@ class _IntendedAudience(_CoreAttributes):
 
     def add_schemaProperty(self,property,value):
         assert property.startswith("schema:"), "First part should start with schema: prefix"
-        setattr(self,property,value)
+        set_dynamic_attribute(self,property,value)
 
 # Common helpers methods that will be used for constructing the WADM objects.
 
@@ -1139,21 +1690,21 @@ class _AddLanguage(object):
             >>> manifest.add_language('en')
 
         Note:
-            pyWADM accept only single tag, in case you need subtags you
-            need to add them to iiifpapi3.LANGUAGES::
+            The tag is parsed following BCP47, in case you need a language
+            subtag not in the registry you need to add it to WADM.LANGUAGES::
 
-            >>> from WADM import BCP47lang
             >>> WADM.LANGUAGES.append("de-DE-u-co-phonebk")
 
         Args:
             language (str): A BCP 47 language tag e.g. en, it, es.
         """
-        assert language in LANGUAGES or language == "none", \
+        assert _DEFERRED or check_language(language), \
             "Language must be a valid BCP47 language tag or none."\
             "Please read https://git.io/JoQty."
         setOrAppendStr(self,'language',language,str)
 
 class _Source(object):
+    _MISSING_SOURCE_ID = Recommended("In case of Source we set it recommend. not sure.")
 
     def set_source(self, source=None, extendbase_url=None):
         """Set the source of the SpecificResource
@@ -1170,29 +1721,34 @@ class _Source(object):
             self.source = source
         elif source is None:
             self.source = _BodiesAndTargets()
-        self.id = Recommended("In case of Source we set it recommend. not sure.")
+        self.id = self._MISSING_SOURCE_ID
+        if _OBSERVERS:
+            _notify("_set", self, "source")
         return self.source
 class _BodiesAndTargets(_CoreAttributes,_Format,_AddLanguage,
                         _LifeCycleInformation,_RightsInformationIdentities,
                         _Source,_SetSelector):
+    _MISSING_FORMAT = Recommended("It should have at least one format")
+    _MISSING_LANGUAGE = Recommended("It should have one language")
+
     def __init__(self, target=Required()):
         super(_BodiesAndTargets, self).__init__()
         self.type = None
-        self.format = Recommended("It should have at least one format")
-        self.processingLanguage = Recommended("It should have one language")
-        self.language = Recommended("It should have one language")
+        self.format = self._MISSING_FORMAT
+        self.processingLanguage = self._MISSING_LANGUAGE
+        self.language = self._MISSING_LANGUAGE
         self.textDirection = None
         self.accessibility = None
         self.source = None
 
     def set_processingLanguage(self,language):
-        assert language in LANGUAGES or language == "none",\
+        assert _DEFERRED or check_language(language),\
             "Language must be a valid BCP47 language tag or none."\
             "Please read https://git.io/JoQty."
         self.processingLanguage = language
 
     def set_language    (self,language):
-        assert language in LANGUAGES or language == "none",\
+        assert _DEFERRED or check_language(language),\
             "Language must be a valid BCP47 language tag or none."\
             "Please read https://git.io/JoQty."
         self.language = language
@@ -1211,7 +1767,7 @@ class _BodiesAndTargets(_CoreAttributes,_Format,_AddLanguage,
         Args:
             textDirection (str): _description_
         """
-        assert textDirection in ["ltr","rtl","auto"], "textDirection must be: ltr, rtl or auto"
+        assert _DEFERRED or textDirection in ["ltr","rtl","auto"], "textDirection must be: ltr, rtl or auto"
         self.textDirection = textDirection
 
     def set_type(self,type):
@@ -1230,7 +1786,7 @@ class _BodiesAndTargets(_CoreAttributes,_Format,_AddLanguage,
         Args:
             type (str): The type of the resource.
         """
-        assert type in TYPES, f"{type} is a non standard type add it to TYPES global variable"
+        assert _DEFERRED or type in TYPES, f"{type} is a non standard type add it to TYPES global variable"
         self.type = type
 
     def add_accessibility(self,accessibility):
@@ -1260,11 +1816,13 @@ class _Purpose(object):
         setOrAppendStr(self,'purpose',purpose,str)
 
 class TextualBody(_ImmutableType,_BodiesAndTargets,_Purpose):
+    _MISSING_VALUE = Required("There must be exactly 1 value property associated with the TextualBody.")
+
     def __init__(self, target=Required()):
         super(TextualBody, self).__init__()
         self.id = None
         self.type = "TextualBody"
-        self.value = Required("There must be exactly 1 value property associated with the TextualBody.")
+        self.value = self._MISSING_VALUE
         self.purpose = None
 
 
@@ -1277,10 +1835,13 @@ class TextualBody(_ImmutableType,_BodiesAndTargets,_Purpose):
         self.value = value
 
 class Choice(_CoreAttributes,_ImmutableType):
+    _MISSING_ID = Recommended("The Choice may have exactly 1 IRI that identifies it.")
+    _MISSING_ITEMS = Required()
+
     def __init__(self):
         super(Choice, self).__init__()
-        self.id = Recommended("The Choice may have exactly 1 IRI that identifies it.")
-        self.items = Required()
+        self.id = self._MISSING_ID
+        self.items = self._MISSING_ITEMS
 
     def add_resourceToItems(self,resource=None):
         """Add a resource to the items of the choice.
@@ -1311,22 +1872,48 @@ class Annotation(_CoreAttributes,_LifeCycleInformation,
                  _RightsInformationIdentities,_Source):
     """WADM resource
     """
+    _MISSING_BODY = Recommended("There should be 1 or more body relationships associated with an Annotation but there may be 0.")
+    _MISSING_TARGET = Required("There must be 1 or more target relationships associated with an Annotation.")
 
     def __init__(self):
         super(Annotation, self).__init__()
         self.motivation = None
-        self.body = Recommended("There should be 1 or more body relationships associated with an Annotation but there may be 0.")
-        self.target = Required("There must be 1 or more target relationships associated with an Annotation.")
+        self.body = self._MISSING_BODY
+        self.target = self._MISSING_TARGET
         self.bodyValue = None
         self.audience = None
         self.stylesheet = None
 
+    def template(self, *slots):
+        """Return a template stamping Annotations like this one, that differ
+        only in the given attributes (slots).
+
+        The Annotation is validated once, the other attributes (e.g. creator,
+        generator, motivation, stylesheet, audience) are frozen and shared by
+        all the stamped Annotations, see AnnotationTemplate.
+
+        Example:
+            >>> anno = WADM.Annotation()
+            >>> anno.add_motivation("commenting")
+            >>> anno.add_creator(person)
+            >>> template = anno.template("id", "target", "body")
+            >>> template.stamp(id="http://example.org/anno1",
+            ...                target="http://example.com/page1")
+
+        Args:
+            *slots (str): The attributes set by each stamp.
+
+        Returns:
+            AnnotationTemplate: The template.
+        """
+        return AnnotationTemplate(self, slots)
+
     def set_body(self,body=None):
         if body is None:
             self.body = _BodiesAndTargets()
             return self.body
         else:
-            assert check_valid_URI(body), "Must be a valid URI"
+            _assert_URI(body, "Must be a valid URI")
             self.body = body
 
     def add_body(self,body=None):
@@ -1357,17 +1944,20 @@ class Annotation(_CoreAttributes,_LifeCycleInformation,
     def set_target(self,target=None):
         if target is None:
             self.target = _BodiesAndTargets()
-            return self.target
         else:
-            assert check_valid_URI(target)
+            _assert_URI(target, "Must be a valid URI")
             self.target = target
+        if _OBSERVERS:
+            _notify("_set", self, "target")
+        if target is None:
+            return self.target
 
     def set_audience(self,audience=None):
         if audience is None:
             self.audience = _IntendedAudience()
             return self.audience
         else:
-            assert check_valid_URI(audience), "Must be a valid URI"
+            _assert_URI(audience, "Must be a valid URI")
             self.audience = audience
 
     def add_audience(self,audience=None):
@@ -1443,14 +2033,15 @@ class Annotation(_CoreAttributes,_LifeCycleInformation,
         if specificresource is None:
             specificresource = SpecificResource()
             self.target = specificresource
-            return specificresource
+        elif isinstance(specificresource, SpecificResource):
+            self.target = specificresource
         else:
-            if isinstance(specificresource, SpecificResource):
-                self.target = specificresource
-            else:
-                raise ValueError(
-                    "Trying to add wrong object to target in %s" %
-                    self.__class__.__name__)
+            raise ValueError(
+                "Trying to add wrong object to target in %s" %
+                self.__class__.__name__)
+        if _OBSERVERS:
+            _notify("_set", self, "target")
+        return specificresource
 
     def set_body_specific_resource(self, specificresource=None):
         """Set a specific resource as the target of the annotation.
@@ -1498,30 +2089,44 @@ class Annotation(_CoreAttributes,_LifeCycleInformation,
         if unused(self.target):
             if independentsTarget is None:
                 self.target = Independents()
+                if _OBSERVERS:
+                    _notify("_set", self, "target")
                 return self.target
             else:
                 assert isinstance(independentsTarget,Independents), "Must be Independets objects."
                 self.target = independentsTarget
+                if _OBSERVERS:
+                    _notify("_set", self, "target")
 
     def set_List_target(self,listTarget=None):
         if unused(self.target):
             if listTarget is None:
                 self.target = List()
+                if _OBSERVERS:
+                    _notify("_set", self, "target")
                 return self.target
             else:
                 assert isinstance(listTarget,List), "Must be Independets objects."
                 self.target = listTarget
+                if _OBSERVERS:
+                    _notify("_set", self, "target")
 
     def set_Composite_target(self,compositeTarget=None):
         if unused(self.target):
             if compositeTarget is None:
                 self.target = Composite()
+                if _OBSERVERS:
+                    _notify("_set", self, "target")
                 return self.target
             else:
                 assert isinstance(compositeTarget,Composite), "Must be Independets objects."
                 self.target = compositeTarget
+                if _OBSERVERS:
+                    _notify("_set", self, "target")
 
 class _State(_ImmutableType):
+    __slots__ = ()
+
     def __init__(self):
         self.type = self.__class__.__name__
         self.refinedBy = None
@@ -1541,10 +2146,14 @@ class _State(_ImmutableType):
 
 
 class TimeState(_State):
+    _MISSING_SOURCEDATESTART = Required("If sourceDateEnd is provided then sourceDateStart must also be provided.")
+    _MISSING_SOURCEDATEEND = Required("If sourceDateStart is provided then sourceDateEnd must also be provided.")
+
     def __init__(self):
         super(TimeState, self).__init__()
         self.sourceDate = None
         self.sourceDateStart = None
+        self.sourceDateEnd = None
         self.cached = None
 
     def add_sourceDate(self,sourceDate):
@@ -1559,10 +2168,10 @@ class TimeState(_State):
         not be provided.
 
         Args:
-            sourceDate (date): the timestamp at which the Source resource should
+            sourceDate (str, datetime.datetime): the timestamp at which the Source resource should
             be interpreted for the Annotation.
         """
-        setOrAppendStr(self,'sourceDate',sourceDate,str)
+        setOrAppendStr(self,'sourceDate',checkDatetime(sourceDate),str)
 
     def set_sourceDateStart(self,sourceDateStart):
         """	The timestamp that begins the interval over which the Source
@@ -1574,11 +2183,12 @@ class TimeState(_State):
         then sourceDateEnd must also be provided.
 
         Args:
-            sourceDateStart (_type_): _description_
+            sourceDateStart (str, datetime.datetime): The timestamp that
+            begins the interval.
         """
-        self.sourceDateStart = sourceDateStart
+        self.sourceDateStart = checkDatetime(sourceDateStart)
         if self.sourceDateEnd is None:
-            self.sourceDateEnd = Required("If sourceDateStart is provided then sourceDateEnd must also be provided.")
+            self.sourceDateEnd = self._MISSING_SOURCEDATEEND
 
     def set_sourceDateEnd(self,sourceDateEnd):
         """The timestamp that ends the interval over which the Source resource 
@@ -1590,12 +2200,12 @@ class TimeState(_State):
         If sourceDateEnd is provided then sourceDateStart must also be provided.
 
         Args:
-            sourceDateEnd (str): The timestamp that ends the interval over
+            sourceDateEnd (str, datetime.datetime): The timestamp that ends the interval over
             which the Source resource should be interpreted for the Annotation.
         """
-        self.sourceDateEnd = sourceDateEnd
-        if self.set_sourceDateStart is None:
-            self.sourceDateStart = Required("If sourceDateEnd is provided then sourceDateStart must also be provided.")
+        self.sourceDateEnd = checkDatetime(sourceDateEnd)
+        if self.sourceDateStart is None:
+            self.sourceDateStart = self._MISSING_SOURCEDATESTART
 
     def add_cached(self,cached):
         """A link to a copy of the Source resource's representation,
@@ -1647,9 +2257,11 @@ class SpecificResource(_CoreAttributes,_Purpose,_Source,_SetSelector):
     """WADM Web Annotation Data Model resource
 
     """
+    _MISSING_ID = Recommended("An ID is recommended.")
+
     def __init__(self):
         super(SpecificResource, self).__init__()
-        self.id = Recommended("An ID is recommended.")
+        self.id = self._MISSING_ID
         self.source = None
         self.purpose = None
         self.scope = None
@@ -1759,10 +2371,12 @@ class AnnotationPage(_CoreAttributes,_LifeCycleInformation):
     """WADM resource.
     """
     # TODO: AnnotationPage type MUST be AnnotationPage?
+    _MISSING_ITEMS = Recommended(
+        "The annotation page should incude at least one item.")
+
     def __init__(self):
         super(AnnotationPage, self).__init__()
-        self.items = Recommended(
-            "The annotation page should incude at least one item.")
+        self.items = self._MISSING_ITEMS
 
     def add_item(self, item):
         """Add an item (Annotation) to the AnnotationPage.
@@ -1794,7 +2408,8 @@ class AnnotationPage(_CoreAttributes,_LifeCycleInformation):
         if partOf is None:
             self.partOf = AnnotationCollection()
             return self.partOf
-        assert check_valid_URI(partOf) or isinstance(partOf,AnnotationCollection), "Should be string or URI"
+        if not isinstance(partOf,AnnotationCollection):
+            _assert_URI(partOf, "Should be string or URI")
         self.partOf = partOf
 
     def add_annotation_to_items(self,annotation=None):
@@ -1821,7 +2436,7 @@ class AnnotationPage(_CoreAttributes,_LifeCycleInformation):
             next (str): A reference to the next Page in the sequence of pages
             that make up the Collection.
         """
-        assert check_valid_URI(next), "Next should be a valid URI"
+        _assert_URI(next, "Next should be a valid URI")
         self.next = next
 
     def set_prev(self,prev):
@@ -1865,10 +2480,12 @@ class AnnotationCollection(_CoreAttributes,_LifeCycleInformation):
     to the user’s preference.
 
     """
+    _MISSING_LABEL = Recommended("An Annotation Collection should have the"
+                                 "label property with at least one entry.")
+
     def __init__(self):
         super(AnnotationCollection, self).__init__()
-        self.label = Recommended("An Annotation Collection should have the"
-                                 "label property with at least one entry.")
+        self.label = self._MISSING_LABEL
         self.first = None
         self.last = None
 
@@ -1894,8 +2511,10 @@ class AnnotationCollection(_CoreAttributes,_LifeCycleInformation):
         try:
             return super().set_id(objid=objid, extendbase_url=extendbase_url)
         except AssertionError:
-            warnings.warn("%s is not an http, AnnotationCollections should use HTTP(S) URI")
+            warnings.warn("%s is not an http, AnnotationCollections should use HTTP(S) URI" % objid)
             self.id = objid
+            if _OBSERVERS:
+                _notify("_id_set", self)
 
     def set_total(self,total):
         """The total number of Annotations in the Collection.
@@ -1926,6 +2545,8 @@ class AnnotationCollection(_CoreAttributes,_LifeCycleInformation):
             self.first = AnnotationPage()
         else:
             self.first = first
+        if _OBSERVERS:
+            _notify("_set", self, "first")
         return self.first
     
     def set_last(self,last=None):
@@ -1943,6 +2564,8 @@ class AnnotationCollection(_CoreAttributes,_LifeCycleInformation):
             self.last = AnnotationPage()
         else:
             self.last = last
+        if _OBSERVERS:
+            _notify("_set", self, "last")
         return self.last
 
     def add_label(self,label):
@@ -1971,4 +2594,270 @@ class Composite(_SetsOfBodiesAndTargets):
 
 class Independents(_SetsOfBodiesAndTargets):
     def __init__(self):
-        super(Independents, self).__init__()
\ No newline at end of file
+        super(Independents, self).__init__()
+
+
+# Compact variants of the selectors and states: the same methods with the
+# attributes stored in __slots__ instead of a __dict__.
+def _slots_dict(self):
+    """The attributes of a compact object as a new dict, read only."""
+    return {name: getattr(self, name) for name in self._fields}
+
+
+def _compact_class(cls):
+    """Return a class with the methods of cls that stores the attributes
+    set by cls.__init__ in __slots__.
+
+    The class has the same name (so the same type) and bases of cls, it is
+    not a subclass of cls since cls instances have a __dict__.
+    """
+    defaults = cls().__dict__
+    mutables = tuple(k for k, v in defaults.items()
+                     if isinstance(v, (list, dict)))
+    defaults = tuple(defaults.items())
+
+    def __init__(self):
+        for name, value in defaults:
+            setattr(self, name, value)
+        for name in mutables:
+            setattr(self, name, copy.copy(getattr(self, name)))
+
+    namespace = {k: v for k, v in cls.__dict__.items()
+                 if k not in ("__dict__", "__weakref__", "__init__")}
+    fields = tuple(name for name, _ in defaults)
+    namespace.update({
+        "__slots__": fields,
+        "_fields": fields,
+        "__init__": __init__,
+        "__dict__": property(_slots_dict),
+        "__qualname__": "Compact" + cls.__name__,
+        "_field_set": frozenset(fields),
+        "_full_class": cls})
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+CompactPointSelector = _compact_class(PointSelector)
+CompactFragmentSelector = _compact_class(FragmentSelector)
+CompactSvgSelector = _compact_class(SvgSelector)
+CompactCssSelector = _compact_class(CssSelector)
+CompactXPathSelector = _compact_class(XPathSelector)
+CompactTextPositionSelector = _compact_class(TextPositionSelector)
+CompactDataPositionSelector = _compact_class(DataPositionSelector)
+CompactTextQuoteSelector = _compact_class(TextQuoteSelector)
+CompactRangeSelector = _compact_class(RangeSelector)
+CompactImageApiSelector = _compact_class(ImageApiSelector)
+CompactTimeState = _compact_class(TimeState)
+CompactHttpRequestState = _compact_class(HttpRequestState)
+
+# The compact classes by type, e.g. for utilities.map_to_class(compact=True).
+COMPACT_CLASSES = {cls.__name__: cls for cls in (
+    CompactPointSelector, CompactFragmentSelector, CompactSvgSelector,
+    CompactCssSelector, CompactXPathSelector, CompactTextPositionSelector,
+    CompactDataPositionSelector, CompactTextQuoteSelector,
+    CompactRangeSelector, CompactImageApiSelector, CompactTimeState,
+    CompactHttpRequestState)}
+
+
+def compact(obj):
+    """Return a compact copy of a selector or state, see COMPACT_CLASSES.
+
+    The compact classes store the attributes in __slots__, for keeping
+    millions of selectors in memory. They have the same methods and type
+    and are serialized in the same way, but only accept the attributes
+    set by their __init__.
+
+    Example:
+        >>> selector = WADM.CompactFragmentSelector()
+        >>> selector.set_xywh(10, 20, 30, 40)
+        >>> target.set_selector(selector)
+
+    Args:
+        obj (_Selector, _State): The selector or state.
+
+    Returns:
+        _Selector, _State: The compact object.
+    """
+    cls = COMPACT_CLASSES[obj.__class__.__name__]
+    newobj = cls()
+    for name, value in obj.__dict__.items():
+        setattr(newobj, name, value)
+    return newobj
+
+
+# Frozen objects: shared by many Annotations, they cannot be modified.
+_FROZEN_CLASSES = {}
+# incremented by thaw, the caches of encoded frozen objects are dropped
+# when it changes.
+_thaw_count = 0
+
+
+def _frozen_class(cls):
+    """Return the frozen subclass of a WADM class."""
+    try:
+        return _FROZEN_CLASSES[cls]
+    except KeyError:
+        # _Frozen comes second: with it first CPython refuses to assign the
+        # class to the instances of cls. No WADM class defines __setattr__.
+        frozencls = type(cls.__name__, (cls, _Frozen), {
+            "__slots__": (),
+            "__module__": cls.__module__,
+            "__doc__": cls.__doc__})
+        _FROZEN_CLASSES[cls] = frozencls
+        return frozencls
+
+
+def _unpickle_frozen(cls, attrs):
+    obj = cls.__new__(cls)
+    for name, value in attrs.items():
+        setattr(obj, name, value)
+    obj.__class__ = _frozen_class(cls)
+    return obj
+
+
+def _freeze_value(value):
+    vcls = value.__class__
+    if vcls is list or vcls is tuple:
+        return tuple(_freeze_value(item) for item in value)
+    if vcls is dict:
+        return {k: _freeze_value(v) for k, v in value.items()}
+    if isinstance(value, (str, int, float, Required, Recommended, _Frozen)) \
+            or not hasattr(value, "__dict__"):
+        return value
+    for name, item in value.__dict__.items():
+        object.__setattr__(value, name, _freeze_value(item))
+    value.__class__ = _frozen_class(vcls)
+    return value
+
+
+def _thaw_value(value):
+    vcls = value.__class__
+    if vcls is tuple:
+        return [_thaw_value(item) for item in value]
+    if vcls is dict:
+        return {k: _thaw_value(v) for k, v in value.items()}
+    if isinstance(value, _Frozen):
+        object.__setattr__(value, "__class__", vcls.__bases__[0])
+        for name, item in list(value.__dict__.items()):
+            setattr(value, name, _thaw_value(item))
+    return value
+
+
+def thaw(obj):
+    """Make a frozen object, and the ones nested in it, modifiable again.
+
+    The object is changed in place, so the change is seen by all the
+    Annotations sharing it, and the encoded fragments of the frozen objects
+    (see bulk.FragmentCache) are invalidated.
+
+    Args:
+        obj (object): A frozen WADM object, see freeze.
+
+    Returns:
+        object: The same object.
+    """
+    global _thaw_count
+    _thaw_count += 1
+    return _thaw_value(obj)
+
+
+def freeze(obj):
+    """Return a frozen deep copy of a WADM object.
+
+    The frozen objects and the ones nested in them cannot be modified, their
+    lists become tuples, and copy.copy or copy.deepcopy return the object
+    itself, so they can be shared by many Annotations.
+
+    Args:
+        obj (object): The WADM object.
+
+    Returns:
+        object: The frozen copy, of a subclass of the class of obj.
+    """
+    return _freeze_value(copy.deepcopy(obj))
+
+
+class AnnotationTemplate(object):
+    """Stamp Annotations that differ only in some attributes (slots) from a
+    prototype, see Annotation.template.
+
+    The prototype is validated when the template is created (the attributes
+    that are not slots must be serializable) and those attributes are frozen
+    once (see freeze). A stamp is a shallow copy of them: no __init__, no
+    deepcopy and no validation of the shared parts. The lists of the
+    Annotation (e.g. motivation) are copied so that add_* methods still work.
+
+    The slots are set with the set_<slot> method of the class (e.g. set_id,
+    set_target, set_created) so their values are validated, objects with
+    attributes are assigned as they are. Slots that are not given get the
+    value set by the __init__ of the class.
+
+    Args:
+        prototype (Annotation): The Annotation to stamp.
+        slots (iterable): The names of the attributes set by each stamp.
+
+    Raises:
+        ValueError: If a slot is not an attribute of the prototype or a
+            shared attribute is Required.
+    """
+
+    def __init__(self, prototype, slots):
+        self.cls = prototype.__class__
+        self.slots = tuple(slots)
+        for name in self.slots:
+            if name not in prototype.__dict__:
+                raise ValueError("%s is not an attribute of %s." % (
+                    name, self.cls.__name__))
+        defaults = self.cls().__dict__
+        shared = {}
+        for name, value in prototype.__dict__.items():
+            if name in self.slots:
+                shared[name] = defaults[name]
+            elif isinstance(value, Required):
+                raise ValueError("%s is Required, make it a slot or set it: "
+                                 "%s" % (name, value))
+            elif isinstance(value, Recommended):
+                shared[name] = value
+            else:
+                # raises ValueError if a nested attribute is Required.
+                _serialize_value(value, False, False)
+                shared[name] = freeze(value)
+                if value.__class__ is list:
+                    # the Annotation own lists stay lists (copied per stamp).
+                    shared[name] = list(shared[name])
+        self._shared = shared
+        self._copied = tuple(name for name, value in shared.items()
+                             if isinstance(value, (list, dict)))
+        self._setters = {name: getattr(self.cls, "set_" + name, None)
+                         for name in self.slots}
+
+    def stamp(self, **values):
+        """Return a new Annotation with the given slots.
+
+        Args:
+            **values: The values of the slots, e.g. id="http://...".
+
+        Raises:
+            ValueError: If a value is given for an attribute that is not a
+                slot.
+
+        Returns:
+            Annotation: The new Annotation.
+        """
+        cls = self.cls
+        anno = cls.__new__(cls)
+        attrs = self._shared.copy()
+        for name in self._copied:
+            attrs[name] = attrs[name].copy()
+        anno.__dict__ = attrs
+        setters = self._setters
+        for name, value in values.items():
+            try:
+                setter = setters[name]
+            except KeyError:
+                raise ValueError("%s is not a slot of the template." % name)
+            if setter is not None and (value.__class__ is str or
+                                       not hasattr(value, "__dict__")):
+                setter(anno, value)
+            else:
+                attrs[name] = value
+        return anno
@@ -0,0 +1,169 @@
+"""Parser of BCP47 language tags.
+
+The tags are parsed following the grammar of RFC 5646
+https://www.rfc-editor.org/rfc/rfc5646#section-2.1 :
+
+    langtag = language ["-" script] ["-" region] *("-" variant)
+              *("-" extension) ["-" privateuse]
+
+The language (and extlang) subtags are checked against a registry of
+language subtags, the other subtags only for their syntax.
+
+Example:
+    >>> from wadm import bcp47
+    >>> bcp47.parse_tag("de-DE-u-co-phonebk")
+    LanguageTag(language='de', extlang=(), script=None, region='de',
+    variants=(), extensions=(('u', ('co', 'phonebk')),), privateuse=())
+    >>> bcp47.is_valid_tag("de-DE-u-co-phonebk", {"de", "en"})
+    True
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+LanguageTag = namedtuple(
+    "LanguageTag",
+    "language extlang script region variants extensions privateuse")
+LanguageTag.__doc__ = """A parsed language tag, subtags are lowercase.
+
+Args:
+    language (str): The primary language subtag, None for private use tags.
+    extlang (tuple): The extended language subtags.
+    script (str): The script subtag or None.
+    region (str): The region subtag or None.
+    variants (tuple): The variant subtags.
+    extensions (tuple): Pairs of singleton and tuple of extension subtags.
+    privateuse (tuple): The private use subtags.
+"""
+
+# Tags registered before RFC 4646 that do not follow the grammar.
+GRANDFATHERED = frozenset([
+    "en-gb-oed", "i-ami", "i-bnn", "i-default", "i-enochian", "i-hak",
+    "i-klingon", "i-lux", "i-mingo", "i-navajo", "i-pwn", "i-tao", "i-tay",
+    "i-tsu", "sgn-be-fr", "sgn-be-nl", "sgn-ch-de", "art-lojban",
+    "cel-gaulish", "no-bok", "no-nyn", "zh-guoyu", "zh-hakka", "zh-min",
+    "zh-min-nan", "zh-xiang"])
+
+# The number of parsed tags kept in memory, see parse_tag.
+TAG_CACHE_SIZE = 4096
+
+
+def _is_alphanum(subtag):
+    return subtag.isascii() and subtag.isalnum()
+
+
+def _parse_privateuse(subtags):
+    if not subtags:
+        return None
+    return tuple(subtags)
+
+
+@lru_cache(maxsize=TAG_CACHE_SIZE)
+def _parse(tag):
+    """Parse a tag, return None if its syntax is not valid."""
+    subtags = tag.lower().split("-")
+    for subtag in subtags:
+        if not subtag or len(subtag) > 8 or not _is_alphanum(subtag):
+            return None
+    if subtags[0] == "x":
+        privateuse = _parse_privateuse(subtags[1:])
+        if privateuse is None:
+            return None
+        return LanguageTag(None, (), None, None, (), (), privateuse)
+    n = len(subtags)
+    language = subtags[0]
+    if not language.isalpha() or len(language) < 2:
+        return None
+    i = 1
+    extlang = []
+    if len(language) <= 3:
+        while (i < n and len(extlang) < 3 and len(subtags[i]) == 3
+               and subtags[i].isalpha()):
+            extlang.append(subtags[i])
+            i += 1
+    script = None
+    if i < n and len(subtags[i]) == 4 and subtags[i].isalpha():
+        script = subtags[i]
+        i += 1
+    region = None
+    if i < n and ((len(subtags[i]) == 2 and subtags[i].isalpha()) or
+                  (len(subtags[i]) == 3 and subtags[i].isdigit())):
+        region = subtags[i]
+        i += 1
+    variants = []
+    while i < n and (len(subtags[i]) >= 5 or
+                     (len(subtags[i]) == 4 and subtags[i][0].isdigit())):
+        if subtags[i] in variants:
+            return None
+        variants.append(subtags[i])
+        i += 1
+    extensions = []
+    singletons = set()
+    while i < n and len(subtags[i]) == 1 and subtags[i] != "x":
+        singleton = subtags[i]
+        if singleton in singletons:
+            return None
+        singletons.add(singleton)
+        i += 1
+        parts = []
+        while i < n and len(subtags[i]) >= 2:
+            parts.append(subtags[i])
+            i += 1
+        if not parts:
+            return None
+        extensions.append((singleton, tuple(parts)))
+    privateuse = ()
+    if i < n and subtags[i] == "x":
+        privateuse = _parse_privateuse(subtags[i + 1:])
+        if privateuse is None:
+            return None
+        i = n
+    if i != n:
+        return None
+    return LanguageTag(language, tuple(extlang), script, region,
+                       tuple(variants), tuple(extensions), privateuse)
+
+
+def parse_tag(tag):
+    """Parse a BCP47 language tag.
+
+    The results are kept in a LRU cache of TAG_CACHE_SIZE tags, since real
+    corpora reuse a small set of tags.
+
+    Args:
+        tag (str): The language tag e.g. de-DE-u-co-phonebk.
+
+    Raises:
+        ValueError: If the syntax of the tag is not valid.
+
+    Returns:
+        LanguageTag: The parsed tag.
+    """
+    parsed = _parse(tag)
+    if parsed is None:
+        raise ValueError("%s is not a valid BCP47 language tag." % tag)
+    return parsed
+
+
+def is_valid_tag(tag, languages=None):
+    """Check a BCP47 language tag.
+
+    Args:
+        tag (str): The language tag.
+        languages (container, optional): The accepted language subtags, e.g.
+            WADM.LANGUAGES. If None only the syntax is checked.
+            Defaults to None.
+
+    Returns:
+        bool: True if the tag is valid.
+    """
+    parsed = _parse(tag)
+    if parsed is None:
+        return tag.lower() in GRANDFATHERED
+    if parsed.language is None or languages is None:
+        return True
+    for language in (parsed.language,) + parsed.extlang:
+        # qaa..qtz is reserved for private use.
+        if language not in languages and \
+                not (len(language) == 3 and "qaa" <= language <= "qtz"):
+            return False
+    return True
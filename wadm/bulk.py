@@ -0,0 +1,414 @@
+"""Bulk serialization of large lists of Annotations.
+
+Example:
+    >>> from wadm.bulk import bulk_dumps
+    >>> lines = bulk_dumps(annotations, workers=8, chunk=5000)
+"""
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from json.encoder import encode_basestring, encode_basestring_ascii
+import copy
+import io
+import json
+import multiprocessing
+import os
+
+from . import WADM
+
+# The annotations shared with the forked workers, see bulk_dumps.
+_SHARED = None
+# The placeholder of a frozen object in the JSON, see FragmentCache.
+_MARKER = "\x00wadm:%i"
+
+
+class FragmentCache(object):
+    """Encoder of WADM objects that keeps the JSON of the frozen objects
+    (see WADM.freeze), e.g. the creator or the generator shared by the
+    Annotations of a template.
+
+    A frozen object is serialized once and its JSON, keyed by the identity
+    of the object, is copied into the JSON of every Annotation referencing
+    it. The cache keeps the last `maxsize` objects (and a reference to them,
+    so that their identity is not reused). WADM.thaw, the only way of
+    modifying a frozen object, invalidates the cache.
+
+    Example:
+        >>> cache = FragmentCache()
+        >>> lines = [cache.dumps(anno) for anno in annotations]
+
+    Args:
+        maxsize (int, optional): The number of frozen objects kept.
+            Defaults to 10000.
+        ensure_ascii (bool, optional): If True only ASCI character will be
+            used. Defaults to False.
+        separators (tuple, optional): The item and key separators of the
+            JSON. Defaults to (",", ":").
+    """
+
+    def __init__(self, maxsize=10000, ensure_ascii=False,
+                 separators=(",", ":")):
+        self.maxsize = maxsize
+        self._encoder = json.JSONEncoder(
+            ensure_ascii=ensure_ascii, separators=separators)
+        self._fragments = OrderedDict()
+        self._used = {}
+        self._thaw_count = WADM._thaw_count
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def clear(self):
+        """Drop all the encoded objects."""
+        self._fragments.clear()
+
+    def marker(self, obj):
+        """Return the marker replaced by the JSON of a frozen object, used
+        by WADM._serialize_value."""
+        key = id(obj)
+        try:
+            entry = self._fragments[key]
+            self._fragments.move_to_end(key)
+        except KeyError:
+            text = self._encode(WADM._serialize_object(
+                obj, False, False, self))
+            marker = _MARKER % key
+            # the marker as written by the encoder.
+            entry = obj, marker, self._encoder.encode(marker), text
+            self._fragments[key] = entry
+            if len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+        self._used[entry[2]] = entry[3]
+        return entry[1]
+
+    def _encode(self, value):
+        text = self._encoder.encode(value)
+        for marker, fragment in self._used.items():
+            text = text.replace(marker, fragment)
+        return text
+
+    def dumps(self, obj, context=False):
+        """Encode a WADM object.
+
+        Args:
+            obj (object): The WADM object, e.g. an Annotation.
+            context (bool,str,list, optional): If False the @context is left
+                out, if None the CONTEXT is added, otherwise the given
+                context is. Defaults to False.
+
+        Raises:
+            ValueError: If a Required attribute is found.
+
+        Returns:
+            str: The JSON.
+        """
+        if self._thaw_count != WADM._thaw_count:
+            self._thaw_count = WADM._thaw_count
+            self.clear()
+        self._used = {}
+        res = WADM._serialize_value(obj, False, False, self)
+        if context is not False:
+            res = dict({"@context": WADM.CONTEXT if context is None
+                        else context}, **res)
+        return self._encode(res)
+
+
+def _dumps_chunk(annotations, context, ensure_ascii):
+    cache = FragmentCache(ensure_ascii=ensure_ascii)
+    return [cache.dumps(annotation, context) for annotation in annotations]
+
+
+def _dumps_range(start, stop, context, ensure_ascii):
+    return _dumps_chunk(_SHARED[start:stop], context, ensure_ascii)
+
+
+def bulk_dumps(annotations, workers=None, chunk=1000, context=False,
+               ensure_ascii=False):
+    """Serialize a list of Annotations to compact JSON strings using a pool
+    of processes.
+
+    Where processes can be forked (Linux) the workers inherit the
+    Annotations and receive only the boundaries of their chunk, so that the
+    objects are never pickled. Otherwise each chunk is pickled and sent to
+    the workers.
+
+    Args:
+        annotations (list): A list of Annotations.
+        workers (int, optional): The number of processes. Defaults to the
+            number of CPUs.
+        chunk (int, optional): The number of Annotations serialized by a
+            worker at once. Defaults to 1000.
+        context (bool,str,list, optional): If False the @context is left out,
+            if True the CONTEXT is added to each Annotation, otherwise the
+            given context is. Defaults to False.
+        ensure_ascii (bool, optional): If True only ASCI character will be
+            used. Defaults to False.
+
+    Returns:
+        list: The JSON strings in the same order of the Annotations.
+    """
+    global _SHARED
+    if context is True:
+        context = None
+    if not isinstance(annotations, list):
+        annotations = list(annotations)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    n = len(annotations)
+    if workers <= 1 or n <= chunk:
+        return _dumps_chunk(annotations, context, ensure_ascii)
+    starts = range(0, n, chunk)
+    stops = [min(start + chunk, n) for start in starts]
+    res = []
+    if "fork" in multiprocessing.get_all_start_methods():
+        _SHARED = annotations
+        try:
+            with ProcessPoolExecutor(
+                    workers,
+                    mp_context=multiprocessing.get_context("fork")) as pool:
+                for lines in pool.map(_dumps_range, starts, stops,
+                                      repeat(context), repeat(ensure_ascii)):
+                    res.extend(lines)
+        finally:
+            _SHARED = None
+    else:
+        chunks = (annotations[start:stop] for start, stop in zip(starts, stops))
+        with ProcessPoolExecutor(workers) as pool:
+            for lines in pool.map(_dumps_chunk, chunks,
+                                  repeat(context), repeat(ensure_ascii)):
+                res.extend(lines)
+    return res
+
+
+class AnnotationBatch(object):
+    """Annotations that differ only by their id, the value of their
+    TextualBody and the xywh of their FragmentSelector, e.g. the words of an
+    OCR, stored as columns.
+
+    The ids and the values are kept UTF-8 encoded in a bytearray with an
+    array of offsets, the coordinates in arrays of integers. Everything else
+    comes from a prototype Annotation, so no Annotation is created per row:
+    the pages are written from a JSON template of the prototype and the
+    Annotations are built only when a row is accessed.
+
+    Example:
+        >>> anno = WADM.Annotation()
+        >>> anno.add_motivation("describing")
+        >>> anno.add_TextualBody().set_language("en")
+        >>> target = anno.set_target_specific_resource()
+        >>> target.set_source("http://example.org/canvas1")
+        >>> target.set_selector_as_FragmentSelector()
+        >>> batch = AnnotationBatch(anno)
+        >>> batch.append("http://example.org/word1", "Hello", 10, 20, 40, 12)
+        >>> page = WADM.AnnotationPage()
+        >>> page.set_id("http://example.org/page1")
+        >>> with open("page1.json", "w") as f:
+        ...     batch.write_page(f, page)
+
+    Args:
+        prototype (Annotation): An Annotation whose body is a TextualBody and
+            whose target is a SpecificResource with a FragmentSelector (or
+            lists with only these). Its id, body value and selector value are
+            replaced by each row.
+
+    Raises:
+        ValueError: If the prototype has not this structure.
+    """
+
+    # placeholders of the columns in the JSON template.
+    _ID = "\x00id"
+    _VALUE = "\x00value"
+    _XYWH = "\x00xywh"
+
+    def __init__(self, prototype):
+        self._parts(prototype)
+        self.prototype = prototype
+        self._ids = bytearray()
+        self._id_offsets = array("Q", [0])
+        self._values = bytearray()
+        self._value_offsets = array("Q", [0])
+        self.x = array("q")
+        self.y = array("q")
+        self.w = array("q")
+        self.h = array("q")
+        self._templates = {}
+
+    def __len__(self):
+        return len(self.x)
+
+    @staticmethod
+    def _parts(anno):
+        """Return the TextualBody and the FragmentSelector of an Annotation.
+        """
+        body = getattr(anno, "body", None)
+        target = getattr(anno, "target", None)
+        if isinstance(body, list) and len(body) == 1:
+            body = body[0]
+        if isinstance(target, list) and len(target) == 1:
+            target = target[0]
+        if not isinstance(body, WADM.TextualBody) or \
+                not isinstance(target, WADM.SpecificResource) or \
+                not isinstance(getattr(target, "selector", None),
+                               WADM.FragmentSelector):
+            raise ValueError(
+                "The prototype must have a TextualBody as body and a "
+                "SpecificResource with a FragmentSelector as target.")
+        return body, target.selector
+
+    def append(self, id, value, x, y, w, h):
+        """Add a row.
+
+        Args:
+            id (str): The id of the Annotation.
+            value (str): The value of the TextualBody.
+            x (int): The x coordinate of the FragmentSelector.
+            y (int): The y coordinate.
+            w (int): The width.
+            h (int): The height.
+        """
+        assert WADM.check_valid_URI(id), "Special characters must be " \
+            "encoded:\n%s" % "\n".join(map(str, WADM.uri_errors(id)))
+        self._ids += id.encode("utf-8")
+        self._id_offsets.append(len(self._ids))
+        self._values += value.encode("utf-8")
+        self._value_offsets.append(len(self._values))
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.h.append(h)
+
+    def extend(self, rows):
+        """Add the rows of an iterable of (id, value, x, y, w, h)."""
+        for row in rows:
+            self.append(*row)
+
+    def id(self, index):
+        """Return the id of a row."""
+        offsets = self._id_offsets
+        return self._ids[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    def value(self, index):
+        """Return the value of the TextualBody of a row."""
+        offsets = self._value_offsets
+        return self._values[
+            offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    def __getitem__(self, index):
+        """Build the Annotation of a row.
+
+        Args:
+            index (int): The row.
+
+        Returns:
+            Annotation: A new Annotation.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("AnnotationBatch index out of range")
+        anno = copy.deepcopy(self.prototype)
+        body, selector = self._parts(anno)
+        anno.set_id(self.id(index))
+        body.set_value(self.value(index))
+        selector.set_xywh(
+            self.x[index], self.y[index], self.w[index], self.h[index])
+        return anno
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _template(self, ensure_ascii):
+        """Return the JSON of a row split at the id, the value and the xywh,
+        and the order in which these columns appear."""
+        try:
+            return self._templates[ensure_ascii]
+        except KeyError:
+            pass
+        anno = copy.deepcopy(self.prototype)
+        body, selector = self._parts(anno)
+        anno.id = self._ID
+        body.value = self._VALUE
+        selector.value = self._XYWH
+        encoder = json.JSONEncoder(ensure_ascii=ensure_ascii)
+        template = encoder.encode(WADM.serialize(anno))
+        marks = []
+        for column, mark in enumerate((self._ID, self._VALUE, self._XYWH)):
+            encoded = encoder.encode(mark)
+            if template.count(encoded) != 1:
+                raise ValueError("The prototype must not contain %r." % mark)
+            marks.append((template.index(encoded), len(encoded), column))
+        marks.sort()
+        pieces = []
+        start = 0
+        for position, length, _ in marks:
+            pieces.append(template[start:position])
+            start = position + length
+        pieces.append(template[start:])
+        order = tuple(column for _, _, column in marks)
+        self._templates[ensure_ascii] = pieces, order
+        return pieces, order
+
+    def iter_json(self, ensure_ascii=False):
+        """Yield the JSON of each row, without building the Annotations.
+
+        Args:
+            ensure_ascii (bool, optional): If True only ASCI character will
+                be used. Defaults to False.
+        """
+        (p0, p1, p2, p3), (c0, c1, c2) = self._template(ensure_ascii)
+        encode = encode_basestring_ascii if ensure_ascii else \
+            encode_basestring
+        join = "".join
+        # ASCII columns are decoded at once and sliced as str.
+        ids, id_offsets = self._ids, self._id_offsets
+        ids = ids.decode("ascii") if ids.isascii() else ids
+        values, value_offsets = self._values, self._value_offsets
+        values = values.decode("ascii") if values.isascii() else values
+        xs, ys, ws, hs = self.x, self.y, self.w, self.h
+        for i in range(len(xs)):
+            id = ids[id_offsets[i]:id_offsets[i + 1]]
+            value = values[value_offsets[i]:value_offsets[i + 1]]
+            columns = (
+                encode(id if id.__class__ is str else id.decode("utf-8")),
+                encode(value if value.__class__ is str
+                       else value.decode("utf-8")),
+                '"xywh=%d,%d,%d,%d"' % (xs[i], ys[i], ws[i], hs[i]))
+            yield join((p0, columns[c0], p1, columns[c1], p2, columns[c2],
+                        p3))
+
+    def write_page(self, fileobj, page, context=None, ensure_ascii=False,
+                   chunk=1000):
+        """Write the rows as the items of an AnnotationPage.
+
+        The output is the same of streaming.AnnotationPageWriter.
+
+        Args:
+            fileobj (file): A file opened in text mode.
+            page (AnnotationPage): The page used for the envelope, its items
+                are ignored.
+            context (str,list, optional): Add additional contexts to the
+                JSON. Defaults to None.
+            ensure_ascii (bool, optional): If True only ASCI character will
+                be used. Defaults to False.
+            chunk (int, optional): The number of rows written at once.
+                Defaults to 1000.
+        """
+        from .streaming import AnnotationPageWriter
+        writer = AnnotationPageWriter(fileobj, page, context, ensure_ascii)
+        block = []
+        for item in self.iter_json(ensure_ascii):
+            block.append(item)
+            if len(block) == chunk:
+                writer.write_serialized(block)
+                block = []
+        writer.write_serialized(block)
+        writer.close()
+
+    def dumps_page(self, page, context=None, ensure_ascii=False):
+        """Return the rows as the JSON of an AnnotationPage, see write_page.
+        """
+        fileobj = io.StringIO()
+        self.write_page(fileobj, page, context, ensure_ascii)
+        return fileobj.getvalue()
@@ -0,0 +1,1340 @@
+"""Indexes over a graph of WADM objects, e.g. an AnnotationCollection or an
+AnnotationPage.
+
+The indexes are kept up to date by WADM.add_to and WADM.addOrSet_to (all
+the add_ methods), by set_id and by the setters of targets, sources, first
+and last. Objects attached by other setters are seen when their parent is
+added; if an indexed object is changed afterwards call `refresh`.
+
+Example:
+    >>> from wadm.indexes import IdIndex
+    >>> index = IdIndex(page)
+    >>> index.get("http://example.org/anno1")
+    >>> index.delete_many(["http://example.org/anno2",
+    ...                    "http://example.org/anno3"])
+
+TargetIndex finds the Annotations on a resource, SpatialIndex those on a
+region of an image or canvas, PositionIndex those on a segment of a text
+and TemporalIndex those active at a time of an audio or video.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+import json
+import math
+import re
+
+from . import WADM
+from .utilities import _UnmappedDict, _UnmappedList
+
+# The attributes set by the __init__ of each class, see _default.
+_DEFAULTS = {}
+
+
+def _default(cls, key):
+    """Return the value of an attribute of a new instance of cls."""
+    try:
+        defaults = _DEFAULTS[cls]
+    except KeyError:
+        defaults = _DEFAULTS[cls] = cls().__dict__
+    return defaults.get(key)
+
+
+def _children(obj):
+    """Yield the (child, key, position) of the WADM objects in obj."""
+    for key, value in obj.__dict__.items():
+        cls = value.__class__
+        if cls is _UnmappedDict or cls is _UnmappedList:
+            # maps the values of a lazily read object.
+            value = getattr(obj, key)
+            cls = value.__class__
+        if cls is list or cls is tuple:
+            for position, item in enumerate(value):
+                if hasattr(item, "__dict__") and \
+                        not isinstance(item, WADM._Sentinel):
+                    yield item, key, position
+        elif hasattr(value, "__dict__") and \
+                not isinstance(value, WADM._Sentinel):
+            yield value, key, None
+
+
+class _Observer(object):
+    """HELPER CLASS
+
+    Note:
+        Base of the indexes notified by WADM._notify, the events not used
+        by an index are ignored.
+    """
+
+    def _added(self, parent, key, obj):
+        pass
+
+    def _set(self, obj, key):
+        pass
+
+    def _id_set(self, obj):
+        pass
+
+    def close(self):
+        """Stop following the changes of the objects."""
+        WADM._OBSERVERS.discard(self)
+
+
+class IdIndex(_Observer):
+    """Map the ids of the objects nested in a WADM object to where they are,
+    for getting, deleting and replacing them without walking the object.
+
+    The position of an object in its list is stored when it is indexed, the
+    positions deleted afterwards from the same list are kept sorted, so that
+    the current position is found by bisection.
+
+    If the same id is used by many objects the first one found is indexed.
+    Frozen objects shared by many parents are indexed at their first parent.
+
+    Args:
+        root (object): The WADM object, e.g. an AnnotationCollection.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # id string -> object
+        self._ids = {}
+        # id(object) -> [object, parent, key, position, id string]
+        self._where = {}
+        # id(parent) -> {key: sorted positions deleted from the list}
+        self._deleted = {}
+        self._pending = []
+        self._index(root, None, None, None)
+        WADM._OBSERVERS.add(self)
+
+    def _added(self, parent, key, obj):
+        # called by WADM.add_to and WADM.addOrSet_to, also for IRIs.
+        if id(parent) in self._where and hasattr(obj, "__dict__") and \
+                not isinstance(obj, WADM._Sentinel):
+            value = getattr(parent, key)
+            position = len(value) - 1 if value.__class__ is list else None
+            self._pending.append((obj, parent, key, position))
+
+    def _set(self, obj, key):
+        # called by the setters of an attribute holding an object.
+        if id(obj) in self._where:
+            value = getattr(obj, key)
+            if hasattr(value, "__dict__") and \
+                    not isinstance(value, WADM._Sentinel):
+                self._pending.append((value, obj, key, None))
+
+    def _id_set(self, obj):
+        # called by set_id.
+        if id(obj) in self._where:
+            self._pending.append((obj, None, None, None))
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        for obj, parent, key, position in pending:
+            entry = self._where.get(id(obj))
+            if parent is None:
+                if entry is not None:
+                    self._set_id(entry, getattr(obj, "id", None))
+            elif entry is None and id(parent) in self._where:
+                if position is not None:
+                    position += len(self._deleted_from(parent, key))
+                self._index(obj, parent, key, position)
+
+    def _set_id(self, entry, objid):
+        old = entry[4]
+        if old is not None and self._ids.get(old) is entry[0]:
+            del self._ids[old]
+        if isinstance(objid, str):
+            entry[4] = objid
+            self._ids.setdefault(objid, entry[0])
+        else:
+            entry[4] = None
+
+    def _index(self, obj, parent, key, position):
+        stack = [(obj, key, position, parent)]
+        where = self._where
+        while stack:
+            obj, key, position, parent = stack.pop()
+            if id(obj) in where:
+                continue
+            entry = where[id(obj)] = [obj, parent, key, position, None]
+            self._set_id(entry, getattr(obj, "id", None))
+            for child, childkey, childposition in _children(obj):
+                stack.append((child, childkey, childposition, obj))
+
+    def _unindex(self, obj):
+        stack = [obj]
+        while stack:
+            obj = stack.pop()
+            entry = self._where.get(id(obj))
+            if entry is None or entry[0] is not obj:
+                continue
+            self._set_id(entry, None)
+            del self._where[id(obj)]
+            self._deleted.pop(id(obj), None)
+            for child, _, _ in _children(obj):
+                stack.append(child)
+
+    def _deleted_from(self, parent, key):
+        return self._deleted.get(id(parent), {}).get(key, ())
+
+    def _renumber(self, parent, key):
+        """Store the current positions of the items of a list."""
+        self._deleted.get(id(parent), {}).pop(key, None)
+        for position, item in enumerate(getattr(parent, key)):
+            entry = self._where.get(id(item))
+            if entry is not None and entry[1] is parent:
+                entry[3] = position
+
+    def _locate(self, entry, retry=True):
+        """Return the container of an object and its position in it, None if
+        it is an attribute."""
+        obj, parent, key, position = entry[:4]
+        if parent is None:
+            raise ValueError("The root of the index cannot be removed.")
+        value = getattr(parent, key)
+        if value.__class__ is list or value.__class__ is tuple:
+            if position is not None:
+                deleted = self._deleted_from(parent, key)
+                if deleted:
+                    position -= bisect_left(deleted, position)
+                if position < len(value) and value[position] is obj:
+                    return value, position
+        elif value is obj:
+            return value, None
+        else:
+            retry = False
+        if retry:
+            # the list was changed without the index.
+            self._renumber(parent, key)
+            return self._locate(entry, False)
+        raise KeyError("%s is no longer in the indexed object." % entry[4])
+
+    def _entry(self, objid):
+        if self._pending:
+            self._flush()
+        return self._where[id(self._ids[objid])]
+
+    def __contains__(self, objid):
+        if self._pending:
+            self._flush()
+        return objid in self._ids
+
+    def __len__(self):
+        if self._pending:
+            self._flush()
+        return len(self._ids)
+
+    def get(self, objid, default=None):
+        """Return the object with an id.
+
+        Args:
+            objid (str): The id.
+            default (object, optional): Returned if the id is not found.
+                Defaults to None.
+
+        Returns:
+            object: The WADM object.
+        """
+        if self._pending:
+            self._flush()
+        return self._ids.get(objid, default)
+
+    def delete(self, objid):
+        """Remove the object with an id from its parent.
+
+        If the object is in a list it is removed from it, otherwise the
+        attribute gets the value of a new instance (e.g. Required).
+
+        Args:
+            objid (str): The id.
+
+        Raises:
+            KeyError: If the id is not found.
+
+        Returns:
+            object: The removed object.
+        """
+        entry = self._entry(objid)
+        obj, parent, key = entry[:3]
+        value, position = self._locate(entry)
+        if position is None:
+            setattr(parent, key, _default(parent.__class__, key))
+        else:
+            del value[position]
+            insort(self._deleted.setdefault(id(parent), {}).setdefault(key, []),
+                   entry[3])
+        self._unindex(obj)
+        return obj
+
+    def replace_in_place(self, objid, newobj):
+        """Put a new object in the place of the object with an id.
+
+        Args:
+            objid (str): The id.
+            newobj (object): The new WADM object.
+
+        Raises:
+            KeyError: If the id is not found.
+
+        Returns:
+            object: The replaced object.
+        """
+        entry = self._entry(objid)
+        obj, parent, key, hint = entry[:4]
+        value, position = self._locate(entry)
+        if position is None:
+            setattr(parent, key, newobj)
+        else:
+            value[position] = newobj
+        self._unindex(obj)
+        self._index(newobj, parent, key, hint)
+        return obj
+
+    def delete_many(self, objids):
+        """Remove the objects with the given ids, each list is rebuilt once.
+
+        Args:
+            objids (iterable): The ids, the ones not found are ignored.
+
+        Returns:
+            list: The removed objects.
+        """
+        if self._pending:
+            self._flush()
+        lists = {}
+        removed = []
+        for objid in objids:
+            obj = self._ids.get(objid)
+            if obj is None:
+                continue
+            entry = self._where[id(obj)]
+            if entry[1] is None:
+                raise ValueError("The root of the index cannot be removed.")
+            parent, key = entry[1], entry[2]
+            value = getattr(parent, key)
+            if value.__class__ is list:
+                lists.setdefault((id(parent), key), (parent, key, set()))[2]\
+                    .add(id(obj))
+            elif value is obj:
+                setattr(parent, key, _default(parent.__class__, key))
+            else:
+                continue
+            self._unindex(obj)
+            removed.append(obj)
+        for parent, key, drop in lists.values():
+            value = getattr(parent, key)
+            value[:] = [item for item in value if id(item) not in drop]
+            self._renumber(parent, key)
+        return removed
+
+    def replace_many(self, replacements):
+        """Put new objects in the place of the objects with the given ids.
+
+        Args:
+            replacements (dict): The new objects by the id of the old ones.
+
+        Returns:
+            list: The replaced objects.
+        """
+        return [self.replace_in_place(objid, newobj)
+                for objid, newobj in replacements.items()]
+
+    def refresh(self, obj):
+        """Index again an object and the objects nested in it, after they
+        were changed without the add_ methods.
+
+        Args:
+            obj (object): An indexed WADM object.
+        """
+        if self._pending:
+            self._flush()
+        entry = self._where[id(obj)]
+        self._unindex(obj)
+        self._index(obj, entry[1], entry[2], entry[3])
+
+
+def _strip_fragment(iri):
+    return iri.split("#", 1)[0]
+
+
+def _target_parts(target, parts, sources):
+    """Add to parts the objects of a target and to sources its IRIs."""
+    if target.__class__ is str:
+        sources.append(_strip_fragment(target))
+    elif target.__class__ is list or target.__class__ is tuple:
+        for item in target:
+            _target_parts(item, parts, sources)
+    elif isinstance(target, WADM._SetsOfBodiesAndTargets):
+        parts.append(target)
+        _target_parts(target.items, parts, sources)
+    elif isinstance(target, (WADM.SpecificResource, WADM._BodiesAndTargets)):
+        parts.append(target)
+        source = getattr(target, "source", None)
+        if source is not None and not isinstance(source, WADM._Sentinel):
+            _target_parts(source, parts, sources)
+        elif isinstance(target.id, str):
+            sources.append(_strip_fragment(target.id))
+
+
+class TargetIndex(_Observer):
+    """Map the IRIs of the resources targeted by Annotations to the
+    Annotations, e.g. for finding the Annotations of a canvas.
+
+    The IRI of a target is the target itself if it is a string, the source
+    of a SpecificResource, or the id of a resource without a source. Lists,
+    Composites and Independents are followed. Fragments are removed, so
+    http://example.org/canvas1#xywh=0,0,10,10 is indexed as
+    http://example.org/canvas1.
+
+    The targets of the indexed Annotations are read again at the next query
+    after set_target, add_target, set_source or set_id are called on them.
+
+    Example:
+        >>> index = TargetIndex(page.items)
+        >>> index.get("http://example.org/canvas1")
+
+    Args:
+        annotations (iterable, optional): The Annotations. Defaults to ().
+    """
+
+    def __init__(self, annotations=()):
+        # IRI -> {key of the Annotation: Annotation}
+        self._sources = {}
+        # id(Annotation) -> (Annotation, IRIs, ids of the target parts)
+        self._annotations = {}
+        # id(target part or Annotation) -> Annotation
+        self._owners = {}
+        self._dirty = {}
+        for annotation in annotations:
+            self._index(annotation)
+        WADM._OBSERVERS.add(self)
+
+    def _changed(self, obj):
+        annotation = self._owners.get(id(obj))
+        if annotation is not None:
+            self._dirty[id(annotation)] = annotation
+
+    def _added(self, parent, key, obj):
+        self._changed(parent)
+
+    def _set(self, obj, key):
+        self._changed(obj)
+
+    def _id_set(self, obj):
+        self._changed(obj)
+
+    def _flush(self):
+        dirty, self._dirty = self._dirty, {}
+        for annotation in dirty.values():
+            if id(annotation) in self._annotations:
+                self._unindex(annotation)
+                self._index(annotation)
+
+    def _index(self, annotation):
+        parts = []
+        sources = []
+        _target_parts(annotation.target, parts, sources)
+        sources = tuple(dict.fromkeys(sources))
+        key = id(annotation)
+        for iri in sources:
+            self._sources.setdefault(iri, {})[key] = annotation
+        self._owners[key] = annotation
+        for part in parts:
+            self._owners[id(part)] = annotation
+        self._annotations[key] = (
+            annotation, sources, tuple(id(part) for part in parts))
+
+    def _unindex(self, annotation):
+        key = id(annotation)
+        _, sources, parts = self._annotations.pop(key)
+        for iri in sources:
+            annotations = self._sources[iri]
+            del annotations[key]
+            if not annotations:
+                del self._sources[iri]
+        for part in (key,) + parts:
+            if self._owners.get(part) is annotation:
+                del self._owners[part]
+
+    def add(self, annotation):
+        """Index an Annotation, if it is already indexed its targets are
+        read again.
+
+        Args:
+            annotation (Annotation): The Annotation.
+        """
+        if id(annotation) in self._annotations:
+            self._unindex(annotation)
+        self._index(annotation)
+
+    def discard(self, annotation):
+        """Remove an Annotation from the index, if it is there.
+
+        Args:
+            annotation (Annotation): The Annotation.
+        """
+        self._dirty.pop(id(annotation), None)
+        if id(annotation) in self._annotations:
+            self._unindex(annotation)
+
+    def get(self, iri):
+        """Return the Annotations targeting a resource.
+
+        Args:
+            iri (str): The IRI of the resource, a fragment is ignored.
+
+        Returns:
+            list: The Annotations, in the order they were indexed, an
+                Annotation whose targets changed is moved to the end.
+        """
+        if self._dirty:
+            self._flush()
+        annotations = self._sources.get(_strip_fragment(iri))
+        return list(annotations.values()) if annotations else []
+
+    def __contains__(self, iri):
+        if self._dirty:
+            self._flush()
+        return _strip_fragment(iri) in self._sources
+
+    def __len__(self):
+        if self._dirty:
+            self._flush()
+        return len(self._sources)
+
+    def sources(self):
+        """Return the IRIs of the targeted resources.
+
+        Returns:
+            list: The IRIs.
+        """
+        if self._dirty:
+            self._flush()
+        return list(self._sources)
+
+    def save(self, path):
+        """Save the index as JSON, the Annotations are stored by id.
+
+        Args:
+            path (str): The path of the file, if it ends with .gz or .zst the
+                file is compressed.
+
+        Raises:
+            ValueError: If an Annotation has no id.
+        """
+        from .streaming import _open_text
+        if self._dirty:
+            self._flush()
+        sources = {}
+        for iri, annotations in self._sources.items():
+            ids = []
+            for annotation in annotations.values():
+                annotation_id = annotation if isinstance(annotation, str) \
+                    else annotation.id
+                if not isinstance(annotation_id, str):
+                    raise ValueError("Only Annotations with an id can be "
+                                     "saved.")
+                ids.append(annotation_id)
+            sources[iri] = ids
+        with _open_text(path, "w") as f:
+            json.dump({"sources": sources}, f, ensure_ascii=False,
+                      separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path, resolve=None):
+        """Load an index saved by `save`.
+
+        Args:
+            path (str): The path of the file.
+            resolve (callable, optional): Returns the Annotation of an id,
+                e.g. IdIndex(page).get. If None the index holds the ids of
+                the Annotations. Defaults to None.
+
+        The targets of the resolved Annotations are not read: set_target and
+        add_target are followed but for changes inside a target (e.g.
+        set_source) `add` must be called again.
+
+        Returns:
+            TargetIndex: The index.
+        """
+        from .streaming import _open_text
+        with _open_text(path, "r") as f:
+            sources = json.load(f)["sources"]
+        index = cls()
+        resolved = {}
+        for iri, ids in sources.items():
+            annotations = index._sources[iri] = {}
+            for annotation_id in ids:
+                if resolve is None:
+                    annotations[annotation_id] = annotation_id
+                    continue
+                try:
+                    annotation = resolved[annotation_id]
+                except KeyError:
+                    annotation = resolved[annotation_id] = \
+                        resolve(annotation_id)
+                annotations[id(annotation)] = annotation
+        for annotation in resolved.values():
+            key = id(annotation)
+            index._owners[key] = annotation
+            sources = tuple(iri for iri, annotations in index._sources.items()
+                            if key in annotations)
+            index._annotations[key] = (annotation, sources, ())
+        return index
+
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_XYWH = re.compile(r"(?:^|[#&])xywh=(?:(pixel|percent|pct):)?%s,%s,%s,%s(?:&|$)"
+                   % (_NUMBER, _NUMBER, _NUMBER, _NUMBER))
+
+
+def parse_xywh(value):
+    """Parse a media fragment xywh=x,y,w,h e.g. the value of a
+    FragmentSelector or the fragment of a target IRI.
+
+    Example:
+        >>> parse_xywh("http://example.org/canvas1#xywh=pct:10,10,50,50")
+        (True, 10.0, 10.0, 60.0, 60.0)
+
+    Args:
+        value (str): The fragment or an IRI with the fragment.
+
+    Returns:
+        tuple: (percent, minx, miny, maxx, maxy) or None if there is no
+            xywh fragment, percent is True for xywh=percent: and xywh=pct:.
+    """
+    match = _XYWH.search(value)
+    if match is None:
+        return None
+    unit, x, y, w, h = match.groups()
+    x = float(x)
+    y = float(y)
+    return (unit == "percent" or unit == "pct", x, y, x + float(w),
+            y + float(h))
+
+
+def _target_regions(target, regions, iri_regions, selector_regions):
+    """Add to regions the (key, bounds) of the regions of a target.
+
+    iri_regions(iri, regions) adds the regions of the fragment of an IRI
+    target, selector_regions(source, selector, regions) those of a selector
+    of a SpecificResource, source is the IRI without the fragment.
+    """
+    if target.__class__ is str:
+        iri_regions(target, regions)
+    elif target.__class__ is list or target.__class__ is tuple:
+        for item in target:
+            _target_regions(item, regions, iri_regions, selector_regions)
+    elif isinstance(target, WADM._SetsOfBodiesAndTargets):
+        _target_regions(target.items, regions, iri_regions, selector_regions)
+    elif isinstance(target, WADM.SpecificResource):
+        source = target.source
+        if not isinstance(source, str):
+            source = getattr(source, "id", None)
+            if not isinstance(source, str):
+                return
+        source = _strip_fragment(source)
+        selector = getattr(target, "selector", None)
+        if selector.__class__ is list or selector.__class__ is tuple:
+            for item in selector:
+                selector_regions(source, item, regions)
+        elif selector is not None:
+            selector_regions(source, selector, regions)
+
+
+def _xywh_regions(iri, regions):
+    box = parse_xywh(iri)
+    if box is not None:
+        regions.append(((_strip_fragment(iri), box[0]), box[1:]))
+
+
+def _spatial_regions(source, selector, regions):
+    if isinstance(selector, (WADM.FragmentSelector,
+                             WADM.CompactFragmentSelector)):
+        if isinstance(selector.value, str):
+            box = parse_xywh(selector.value)
+            if box is not None:
+                regions.append(((source, box[0]), box[1:]))
+    elif isinstance(selector, (WADM.PointSelector, WADM.CompactPointSelector)):
+        if selector.x is not None and selector.y is not None:
+            regions.append(((source, False), (selector.x, selector.y,
+                                              selector.x, selector.y)))
+
+
+def _center_x(entry):
+    return entry[0] + entry[2]
+
+
+def _center_y(entry):
+    return entry[1] + entry[3]
+
+
+def _str_pack(entries, size, leaf):
+    """Group the entries in nodes of size entries with the Sort-Tile-
+    Recursive algorithm, entries and nodes start with minx, miny, maxx,
+    maxy."""
+    count = -(-len(entries) // size)
+    slab = size * int(math.ceil(math.sqrt(count)))
+    entries = sorted(entries, key=_center_x)
+    nodes = []
+    for i in range(0, len(entries), slab):
+        part = sorted(entries[i:i + slab], key=_center_y)
+        for j in range(0, len(part), size):
+            group = part[j:j + size]
+            nodes.append((min(entry[0] for entry in group),
+                          min(entry[1] for entry in group),
+                          max(entry[2] for entry in group),
+                          max(entry[3] for entry in group),
+                          group, leaf))
+    return nodes
+
+
+class _Tree(object):
+    """The entries of a tree, tuples ending with a record [annotation,
+    number]: the entries added after the tree was built are scanned until
+    they are a quarter of the tree, the discarded ones until they are half.
+
+    HELPER CLASS
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = []
+        self.pending = []
+        self.dead = 0
+        self.build()
+
+    def stale(self):
+        pending = len(self.pending)
+        return pending > self.size and pending * 4 > len(self.entries) or \
+            self.dead * 2 > len(self.entries) + pending
+
+    def pack(self):
+        self.entries = [entry for entry in self.entries + self.pending
+                        if entry[-1][0] is not None]
+        self.pending = []
+        self.dead = 0
+        self.build()
+
+
+class _RTree(_Tree):
+    """An R-tree of (minx, miny, maxx, maxy, record) entries packed with the
+    Sort-Tile-Recursive algorithm.
+
+    HELPER CLASS
+    """
+
+    def build(self):
+        nodes = _str_pack(self.entries, self.size, True) \
+            if self.entries else []
+        while len(nodes) > self.size:
+            nodes = _str_pack(nodes, self.size, False)
+        self.nodes = nodes
+
+    def search(self, minx, miny, maxx, maxy, found):
+        """Add to found the records of the entries intersecting the box."""
+        if self.stale():
+            self.pack()
+        stack = list(self.nodes)
+        while stack:
+            node = stack.pop()
+            if node[0] <= maxx and node[2] >= minx and \
+                    node[1] <= maxy and node[3] >= miny:
+                if node[5]:
+                    found.extend(entry[4] for entry in node[4]
+                                 if entry[0] <= maxx and entry[2] >= minx and
+                                 entry[1] <= maxy and entry[3] >= miny)
+                else:
+                    stack.extend(node[4])
+        found.extend(entry[4] for entry in self.pending
+                     if entry[0] <= maxx and entry[2] >= minx and
+                     entry[1] <= maxy and entry[3] >= miny)
+
+
+class _IntervalTree(_Tree):
+    """An interval tree of (start, end, record) entries, both ends
+    included: the entries sorted by start are the nodes of an implicit
+    binary tree (the node of level k has the k lowest bits set) storing the
+    maximum end of each subtree.
+
+    HELPER CLASS
+    """
+
+    def build(self):
+        entries = self.entries
+        entries.sort(key=_start)
+        n = len(entries)
+        self.starts = starts = [entry[0] for entry in entries]
+        self.ends = ends = [entry[1] for entry in entries]
+        self.maxs = maxs = list(ends)
+        self.level = 0
+        if not n:
+            return
+        # last is the maximum end of the subtree of last_i, the rightmost
+        # node of the level.
+        last_i = (n - 1) & ~1
+        last = ends[last_i]
+        k = 1
+        while 1 << k <= n:
+            x = 1 << (k - 1)
+            for i in range((x << 1) - 1, n, x << 2):
+                right = maxs[i + x] if i + x < n else last
+                maxs[i] = max(ends[i], maxs[i - x], right)
+            last_i = last_i - x if last_i >> k & 1 else last_i + x
+            if last_i < n and maxs[last_i] > last:
+                last = maxs[last_i]
+            k += 1
+        self.level = k - 1
+
+    def search(self, lo, hi, found):
+        """Add to found the records of the entries intersecting [lo, hi]."""
+        if self.stale():
+            self.pack()
+        entries = self.entries
+        starts = self.starts
+        ends = self.ends
+        maxs = self.maxs
+        n = len(entries)
+        stack = [(self.level, (1 << self.level) - 1, False)] if n else []
+        while stack:
+            k, x, left = stack.pop()
+            if k <= 3:
+                # a small subtree is scanned.
+                i = x >> k << k
+                end = min(i + (1 << (k + 1)) - 1, n)
+                while i < end and starts[i] <= hi:
+                    if ends[i] >= lo:
+                        found.append(entries[i][2])
+                    i += 1
+            elif not left:
+                child = x - (1 << (k - 1))
+                stack.append((k, x, True))
+                if child >= n or maxs[child] >= lo:
+                    stack.append((k - 1, child, False))
+            elif x < n and starts[x] <= hi:
+                if ends[x] >= lo:
+                    found.append(entries[x][2])
+                stack.append((k - 1, x + (1 << (k - 1)), False))
+        found.extend(entry[2] for entry in self.pending
+                     if entry[0] <= hi and entry[1] >= lo)
+
+
+def _start(entry):
+    return entry[0]
+
+
+class _RegionIndex(object):
+    """The Annotations with their regions in a tree for each (source,
+    kind), see _regions.
+
+    HELPER CLASS
+    """
+    _tree = None
+
+    def __init__(self, annotations=(), node_size=16):
+        self._size = node_size
+        # (source, kind) -> tree
+        self._trees = {}
+        # id(Annotation) -> (record, keys of the trees)
+        self._annotations = {}
+        self._count = 0
+        for annotation in annotations:
+            self.add(annotation)
+
+    def _regions(self, annotation):
+        """Return the (key, bounds) of the regions of an Annotation."""
+        raise NotImplementedError
+
+    def add(self, annotation):
+        """Index the regions of the targets of an Annotation, if it is
+        already indexed the regions are read again.
+
+        Args:
+            annotation (Annotation): The Annotation.
+
+        Returns:
+            int: The number of regions found.
+        """
+        self.discard(annotation)
+        regions = self._regions(annotation)
+        if not regions:
+            return 0
+        # the record is shared by the entries of the Annotation, discard
+        # empties it instead of removing them.
+        record = [annotation, self._count]
+        self._count += 1
+        keys = set()
+        for key, bounds in regions:
+            tree = self._trees.get(key)
+            if tree is None:
+                tree = self._trees[key] = self._tree(self._size)
+            tree.pending.append(bounds + (record,))
+            keys.add(key)
+        self._annotations[id(annotation)] = (record, keys)
+        return len(regions)
+
+    def discard(self, annotation):
+        """Remove an Annotation from the index, if it is there.
+
+        Args:
+            annotation (Annotation): The Annotation.
+        """
+        indexed = self._annotations.pop(id(annotation), None)
+        if indexed is not None:
+            record, keys = indexed
+            record[0] = None
+            for key in keys:
+                self._trees[key].dead += 1
+
+    def _search(self, key, *bounds):
+        tree = self._trees.get(key)
+        if tree is None:
+            return []
+        found = []
+        tree.search(*bounds, found)
+        records = {}
+        for record in found:
+            if record[0] is not None:
+                records[record[1]] = record[0]
+        return [records[n] for n in sorted(records)]
+
+    def sources(self):
+        """Return the IRIs of the resources with regions.
+
+        Returns:
+            list: The IRIs.
+        """
+        return list(dict.fromkeys(source for source, _ in self._trees))
+
+    def __len__(self):
+        return len(self._annotations)
+
+
+class SpatialIndex(_RegionIndex):
+    """Find the Annotations on a region of an image or canvas, e.g. the
+    Annotations in the viewport of a tile viewer.
+
+    The regions are the xywh= fragments of the target IRIs and of the
+    FragmentSelectors and the x and y of the PointSelectors of the targets,
+    they are parsed once and stored in an R-tree for each target source.
+    The R-trees are packed with the Sort-Tile-Recursive algorithm at the
+    first query, the Annotations added afterwards are scanned until they are
+    a quarter of the tree, then the tree is packed again.
+
+    Regions given in percent (xywh=percent: or xywh=pct:) are kept apart and
+    are queried with percent=True.
+
+    The index does not follow the setters: call `add` again after changing
+    the selectors of an indexed Annotation.
+
+    Example:
+        >>> index = SpatialIndex(page.items)
+        >>> index.search("http://example.org/canvas1", 0, 0, 1000, 800)
+
+    Args:
+        annotations (iterable, optional): The Annotations. Defaults to ().
+        node_size (int, optional): The number of entries of the nodes of the
+            R-trees. Defaults to 16.
+    """
+    _tree = _RTree
+
+    def _regions(self, annotation):
+        regions = []
+        _target_regions(annotation.target, regions, _xywh_regions,
+                        _spatial_regions)
+        return regions
+
+    def search(self, source, x, y, w, h, percent=False):
+        """Return the Annotations whose regions intersect a rectangle.
+
+        Args:
+            source (str): The IRI of the image or canvas, a fragment is
+                ignored.
+            x (float): The x coordinate of the rectangle.
+            y (float): The y coordinate of the rectangle.
+            w (float): The width of the rectangle.
+            h (float): The height of the rectangle.
+            percent (bool, optional): Search the regions given in percent.
+                Defaults to False.
+
+        Returns:
+            list: The Annotations, in the order they were indexed.
+        """
+        return self._search((_strip_fragment(source), percent),
+                            x, y, x + w, y + h)
+
+    def at(self, source, x, y, percent=False):
+        """Return the Annotations whose regions contain a point.
+
+        Args:
+            source (str): The IRI of the image or canvas, a fragment is
+                ignored.
+            x (float): The x coordinate of the point.
+            y (float): The y coordinate of the point.
+            percent (bool, optional): Search the regions given in percent.
+                Defaults to False.
+
+        Returns:
+            list: The Annotations, in the order they were indexed.
+        """
+        return self.search(source, x, y, 0, 0, percent)
+
+
+def _no_regions(iri, regions):
+    pass
+
+
+def _position_regions(source, selector, regions):
+    if isinstance(selector, (WADM.TextPositionSelector,
+                             WADM.CompactTextPositionSelector)):
+        data = False
+    elif isinstance(selector, (WADM.DataPositionSelector,
+                               WADM.CompactDataPositionSelector)):
+        data = True
+    else:
+        return
+    if selector.start is not None and selector.end is not None:
+        # the end is not included.
+        regions.append(((source, data), (selector.start, selector.end - 1)))
+
+
+class PositionIndex(_RegionIndex):
+    """Find the Annotations on a segment of a text or of a file, e.g. the
+    Annotations on the characters shown by a reader.
+
+    The segments are the start and end of the TextPositionSelectors and
+    DataPositionSelectors of the targets, stored in an interval tree for
+    each target source. The trees are built at the first query, the
+    Annotations added afterwards are scanned until they are a quarter of the
+    tree, then the tree is built again.
+
+    The segments of DataPositionSelectors are kept apart and are queried
+    with data=True.
+
+    The index does not follow the setters: call `add` again after changing
+    the selectors of an indexed Annotation.
+
+    Example:
+        >>> index = PositionIndex(page.items)
+        >>> index.search("http://example.org/inferno.txt", 1200, 1800)
+
+    Args:
+        annotations (iterable, optional): The Annotations. Defaults to ().
+        node_size (int, optional): The number of entries scanned before the
+            trees are built again. Defaults to 16.
+    """
+    _tree = _IntervalTree
+
+    def _regions(self, annotation):
+        regions = []
+        _target_regions(annotation.target, regions, _no_regions,
+                        _position_regions)
+        return regions
+
+    def search(self, source, start, end, data=False):
+        """Return the Annotations whose segments overlap the positions from
+        start to end, end excluded.
+
+        Args:
+            source (str): The IRI of the text or file, a fragment is
+                ignored.
+            start (int): The first position.
+            end (int): The position after the last one.
+            data (bool, optional): Search the segments of the
+                DataPositionSelectors. Defaults to False.
+
+        Returns:
+            list: The Annotations, in the order they were indexed.
+        """
+        return self._search((_strip_fragment(source), data), start, end - 1)
+
+    def at(self, source, position, data=False):
+        """Return the Annotations whose segments contain a position.
+
+        Args:
+            source (str): The IRI of the text or file, a fragment is
+                ignored.
+            position (int): The position.
+            data (bool, optional): Search the segments of the
+                DataPositionSelectors. Defaults to False.
+
+        Returns:
+            list: The Annotations, in the order they were indexed.
+        """
+        return self._search((_strip_fragment(source), data), position,
+                            position)
+
+
+_CLOCK = r"\d+(?::\d+){0,2}(?:\.\d*)?"
+_T = re.compile(r"(?:^|[#&])t=(?:npt:)?(%s)?(?:,(%s))?(?:&|$)"
+                % (_CLOCK, _CLOCK))
+
+
+def _seconds(clock):
+    seconds = 0.0
+    for part in clock.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_time(value):
+    """Parse a media fragment t=start,end in Normal Play Time e.g. the
+    value of a FragmentSelector or the fragment of a target IRI.
+
+    Example:
+        >>> parse_time("http://example.org/video1#t=npt:1:05,1:10.5")
+        (65.0, 70.5)
+
+    Args:
+        value (str): The fragment or an IRI with the fragment.
+
+    Returns:
+        tuple: (start, end) in seconds or None if there is no valid t
+            fragment, a missing start is 0 and a missing end is infinite.
+    """
+    match = _T.search(value)
+    if match is None or match.group(1) is None and match.group(2) is None:
+        return None
+    start, end = match.groups()
+    start = _seconds(start) if start is not None else 0.0
+    end = _seconds(end) if end is not None else math.inf
+    if end < start:
+        return None
+    return start, end
+
+
+def _interval(start, end):
+    """The bounds in the trees of the times from start to end, end
+    excluded unless it is start."""
+    if end > start and end != math.inf:
+        end = math.nextafter(end, -math.inf)
+    return start, end
+
+
+def _time_regions(iri, regions):
+    times = parse_time(iri)
+    if times is not None:
+        regions.append(((_strip_fragment(iri), None), _interval(*times)))
+
+
+def _temporal_regions(source, selector, regions):
+    if isinstance(selector, (WADM.FragmentSelector,
+                             WADM.CompactFragmentSelector)):
+        if isinstance(selector.value, str):
+            times = parse_time(selector.value)
+            if times is not None:
+                regions.append(((source, None), _interval(*times)))
+    elif isinstance(selector, (WADM.PointSelector, WADM.CompactPointSelector)):
+        if selector.t is not None:
+            regions.append(((source, None), (selector.t, selector.t)))
+
+
+def _end(entry):
+    return entry[1]
+
+
+class _TimeTree(_IntervalTree):
+    """An interval tree with the entries sorted by end too, for the
+    cursors.
+
+    HELPER CLASS
+    """
+
+    def build(self):
+        _IntervalTree.build(self)
+        self.exits = sorted(self.entries, key=_end)
+        self.exit_times = [entry[1] for entry in self.exits]
+
+
+TemporalEvent = namedtuple("TemporalEvent", "time kind annotation")
+TemporalEvent.__doc__ = """An Annotation becoming active or inactive.
+
+Args:
+    time (float): The time of the event in seconds.
+    kind (str): "enter" or "exit".
+    annotation (Annotation): The Annotation.
+"""
+
+
+class TemporalIndex(_RegionIndex):
+    """Find the Annotations active at a time of an audio or video, e.g. at
+    each frame of a player.
+
+    The times are the t= media fragments (in Normal Play Time) of the target
+    IRIs and of the FragmentSelectors and the t of the PointSelectors of the
+    targets, they are parsed once and stored in an interval tree for each
+    target source, queries take O(log n + k). A t=start,end fragment is
+    active from start to end, end excluded, a point only at its time.
+
+    The index does not follow the setters: call `add` again after changing
+    the selectors of an indexed Annotation.
+
+    Example:
+        >>> index = TemporalIndex(page.items)
+        >>> index.at("http://example.org/video1", 12.5)
+        >>> cursor = index.cursor("http://example.org/video1")
+        >>> for event in cursor.advance(12.54):
+        ...     print(event.kind, event.annotation.id)
+
+    Args:
+        annotations (iterable, optional): The Annotations. Defaults to ().
+        node_size (int, optional): The number of entries scanned before the
+            trees are built again. Defaults to 16.
+    """
+    _tree = _TimeTree
+
+    def _regions(self, annotation):
+        regions = []
+        _target_regions(annotation.target, regions, _time_regions,
+                        _temporal_regions)
+        return regions
+
+    def at(self, source, time):
+        """Return the Annotations active at a time.
+
+        Args:
+            source (str): The IRI of the audio or video, a fragment is
+                ignored.
+            time (float): The time in seconds.
+
+        Returns:
+            list: The Annotations, in the order they were indexed.
+        """
+        return self._search((_strip_fragment(source), None), time, time)
+
+    def search(self, source, start, end):
+        """Return the Annotations active at some time from start to end, end
+        excluded.
+
+        Args:
+            source (str): The IRI of the audio or video, a fragment is
+                ignored.
+            start (float): The start of the window in seconds.
+            end (float): The end of the window in seconds.
+
+        Returns:
+            list: The Annotations, in the order they were indexed.
+        """
+        return self._search((_strip_fragment(source), None),
+                            *_interval(start, end))
+
+    def cursor(self, source, time=0.0):
+        """Return a cursor following the playback of an audio or video.
+
+        Args:
+            source (str): The IRI of the audio or video, a fragment is
+                ignored.
+            time (float, optional): The time of the cursor in seconds.
+                Defaults to 0.0.
+
+        Returns:
+            TemporalCursor: The cursor.
+        """
+        return TemporalCursor(self, source, time)
+
+
+class TemporalCursor(object):
+    """The Annotations active at the current time of a playback, see
+    TemporalIndex.cursor.
+
+    Args:
+        index (TemporalIndex): The index.
+        source (str): The IRI of the audio or video, a fragment is ignored.
+        time (float, optional): The time of the cursor in seconds. Defaults
+            to 0.0.
+    """
+
+    def __init__(self, index, source, time=0.0):
+        self.index = index
+        self.source = _strip_fragment(source)
+        self.time = time
+        # number of the record -> record
+        self._active = {}
+        for record in self._records(time, time):
+            self._active[record[1]] = record
+
+    def _tree(self):
+        tree = self.index._trees.get((self.source, None))
+        # the sweeps of advance need the entries sorted.
+        if tree is not None and (tree.pending or tree.stale()):
+            tree.pack()
+        return tree
+
+    def _records(self, lo, hi):
+        tree = self._tree()
+        found = []
+        if tree is not None:
+            tree.search(lo, hi, found)
+        return [record for record in found if record[0] is not None]
+
+    @property
+    def active(self):
+        """list: The Annotations active at the time of the cursor, in the
+        order they were indexed."""
+        return [self._active[n][0] for n in sorted(self._active)
+                if self._active[n][0] is not None]
+
+    def advance(self, time):
+        """Move the cursor to a time and return what changed.
+
+        Moving forward, the Annotations starting and ending in between
+        (e.g. the points passed between two frames) enter and exit too.
+        Moving backward the cursor jumps: the events have the new time.
+
+        Args:
+            time (float): The new time in seconds.
+
+        Returns:
+            list: The TemporalEvent, sorted by time, the exits of the
+            intervals before the enters at the same time.
+        """
+        previous = self.time
+        self.time = time
+        active = self._active
+        if time < previous:
+            records = {record[1]: record
+                       for record in self._records(time, time)}
+            events = [TemporalEvent(time, "exit", record[0])
+                      for n, record in sorted(active.items())
+                      if n not in records and record[0] is not None]
+            events.extend(TemporalEvent(time, "enter", record[0])
+                          for n, record in sorted(records.items())
+                          if n not in active)
+            self._active = records
+            return events
+        tree = self._tree()
+        if tree is None or time == previous:
+            return []
+        keyed = []
+        entries = tree.entries
+        # active at time: start <= time, not active at previous: start >
+        # previous.
+        for i in range(bisect_right(tree.starts, previous),
+                       bisect_right(tree.starts, time)):
+            start, end, record = entries[i]
+            if record[0] is not None:
+                keyed.append((start, 1, record[1], "enter", record))
+        # active at previous or after it: end >= previous, not active at
+        # time: end < time.
+        exits = tree.exits
+        for i in range(bisect_left(tree.exit_times, previous),
+                       bisect_left(tree.exit_times, time)):
+            start, end, record = exits[i]
+            if record[0] is None:
+                continue
+            if start == end:
+                # a point exits after it enters.
+                keyed.append((end, 2, record[1], "exit", record))
+            else:
+                keyed.append((math.nextafter(end, math.inf), 0, record[1],
+                              "exit", record))
+        keyed.sort(key=lambda event: event[:3])
+        events = []
+        for event_time, _, n, kind, record in keyed:
+            if kind == "enter":
+                active[n] = record
+            elif active.pop(n, None) is None:
+                # added to the index after it was active.
+                continue
+            events.append(TemporalEvent(event_time, kind, record[0]))
+        return events
@@ -0,0 +1,468 @@
+"""Streaming input and output of large sets of Annotations.
+
+The `json_save` method of the WADM objects builds the whole JSON string in
+memory before writing it. The writers in this module encode one Annotation
+at a time, so that memory does not grow with the number of Annotations.
+
+Example:
+    >>> from wadm import WADM
+    >>> from wadm.streaming import AnnotationCollectionWriter
+    >>> coll = WADM.AnnotationCollection()
+    >>> coll.set_id("http://example.org/collection1")
+    >>> with AnnotationCollectionWriter(coll,
+    ...         page_id="http://example.org/page{}",
+    ...         page_path="page{}.json",
+    ...         page_size=1000) as writer:
+    ...     writer.write_all(annotations)
+    >>> coll.json_save("collection1.json")
+
+The readers parse the files incrementally and yield one Annotation at a
+time, so that memory stays constant regardless of the size of the file.
+
+Example:
+    >>> from wadm.streaming import iter_annotations
+    >>> for anno in iter_annotations("page1.json"):
+    ...     print(anno.id)
+
+Annotations can also be stored one per line (JSON Lines) with `write_jsonl`
+and `read_jsonl`, compressed with gzip (.gz) or zstd (.zst) according to
+the extension of the file.
+"""
+from . import WADM
+from . import utilities
+from .bulk import FragmentCache
+import gzip
+import json
+import re
+
+
+class AnnotationPageWriter(object):
+    """Write an AnnotationPage to a file handle one Annotation at a time.
+
+    The envelope of the page (every attribute but the items) is written when
+    the writer is created, each Annotation is written as soon as it is passed
+    to `write` and the page is closed by `close`.
+
+    Args:
+        fileobj (file): A file opened in text mode.
+        page (AnnotationPage): The page used for the envelope, its items are
+            ignored.
+        context (str,list, optional): Add additional contexts to the JSON.
+            Defaults to None.
+        ensure_ascii (bool, optional): If True only ASCI character will be
+            used. Defaults to False.
+        cache (FragmentCache, optional): The encoded frozen objects, it can
+            be shared by many writers with the same ensure_ascii. If None a
+            new one is used. Defaults to None.
+    """
+
+    def __init__(self, fileobj, page, context=None, ensure_ascii=False,
+                 cache=None):
+        self.fileobj = fileobj
+        self.ensure_ascii = ensure_ascii
+        self.count = 0
+        if cache is None:
+            cache = FragmentCache(
+                ensure_ascii=ensure_ascii, separators=(", ", ": "))
+        self.cache = cache
+        envelope = page.to_json(context=context)
+        envelope.pop("items", None)
+        header = json.dumps(envelope, ensure_ascii=ensure_ascii)
+        # we reopen the envelope for appending the items.
+        fileobj.write(header[:-1])
+        fileobj.write(', "items": [')
+
+    def write(self, annotation):
+        """Encode an Annotation and write it to the items of the page.
+
+        Args:
+            annotation (Annotation): The Annotation.
+        """
+        self.write_serialized((self.cache.dumps(annotation),))
+
+    def write_serialized(self, texts):
+        """Write Annotations already encoded as JSON to the items of the
+        page, e.g. by bulk.AnnotationBatch.
+
+        Args:
+            texts (list): The JSON strings of the Annotations.
+        """
+        if not texts:
+            return
+        self.fileobj.write(",\n  " if self.count else "\n  ")
+        self.fileobj.write(",\n  ".join(texts))
+        self.count += len(texts)
+
+    def close(self, **trailer):
+        """Close the items list and the page.
+
+        Args:
+            **trailer: Attributes known only at the end of the page, e.g.
+                `next`. They are written after the items.
+        """
+        if trailer:
+            tail = json.dumps(trailer, ensure_ascii=self.ensure_ascii)
+            self.fileobj.write("\n], %s\n" % tail[1:])
+        else:
+            self.fileobj.write("\n]}\n")
+
+
+class AnnotationCollectionWriter(object):
+    """Write the Annotations of an AnnotationCollection to a sequence of
+    AnnotationPages, starting a new page every `page_size` Annotations.
+
+    Each page gets its id, partOf, startIndex, prev and next. When the writer
+    is closed the collection gets its total, first and last.
+
+    Args:
+        collection (AnnotationCollection): The collection, its id must be set.
+        page_id (str, callable): The id of the pages. Either a format string
+            e.g. "http://example.org/page{}" or a callable, both receive the
+            number of the page starting from 1.
+        page_path (str, callable): The filename of the pages, with the same
+            rules of page_id.
+        page_size (int, optional): The number of Annotations per page.
+            Defaults to 1000.
+        context (str,list, optional): Add additional contexts to the JSON.
+            Defaults to None.
+        ensure_ascii (bool, optional): If True only ASCI character will be
+            used. Defaults to False.
+    """
+
+    def __init__(self, collection, page_id, page_path, page_size=1000,
+                 context=None, ensure_ascii=False):
+        if page_size < 1:
+            raise ValueError("page_size must be a positive integer.")
+        if WADM.unused(collection.id):
+            raise ValueError("The id of the AnnotationCollection must be set.")
+        self.collection = collection
+        self.page_size = page_size
+        self.context = context
+        self.ensure_ascii = ensure_ascii
+        self.total = 0
+        self.pages = 0
+        self._page_id = page_id if callable(page_id) else page_id.format
+        self._page_path = page_path if callable(page_path) else page_path.format
+        self._file = None
+        self._writer = None
+        self._cache = FragmentCache(
+            ensure_ascii=ensure_ascii, separators=(", ", ": "))
+
+    def _open_page(self):
+        self.pages += 1
+        page = WADM.AnnotationPage()
+        page.set_id(self._page_id(self.pages))
+        page.set_partOf(self.collection.id)
+        page.set_startIndex(self.total)
+        if self.pages > 1:
+            page.set_prev(self._page_id(self.pages - 1))
+        self._file = open(self._page_path(self.pages), "w", encoding="utf-8")
+        self._writer = AnnotationPageWriter(
+            self._file, page, context=self.context,
+            ensure_ascii=self.ensure_ascii, cache=self._cache)
+
+    def _close_page(self, **trailer):
+        self._writer.close(**trailer)
+        self._file.close()
+        self._file = None
+        self._writer = None
+
+    def write(self, annotation):
+        """Write an Annotation to the current page.
+
+        Args:
+            annotation (Annotation): The Annotation.
+        """
+        if self._writer is None:
+            self._open_page()
+        elif self._writer.count == self.page_size:
+            # only now we know that the current page has a next one.
+            self._close_page(next=self._page_id(self.pages + 1))
+            self._open_page()
+        self._writer.write(annotation)
+        self.total += 1
+
+    def write_all(self, annotations):
+        """Write all the Annotations of an iterable.
+
+        Args:
+            annotations (iterable): An iterable of Annotations.
+        """
+        for annotation in annotations:
+            self.write(annotation)
+
+    def close(self):
+        """Close the last page and set total, first and last of the
+        collection.
+
+        Returns:
+            AnnotationCollection: The collection.
+        """
+        if self._writer is not None:
+            self._close_page()
+        self.collection.set_total(self.total)
+        if self.pages:
+            self.collection.set_first(self._page_id(1))
+            self.collection.set_last(self._page_id(self.pages))
+        return self.collection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+
+
+# Incremental JSON tokenizer used by the readers. It only finds where each
+# value ends, the values themselves are decoded with json.loads.
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_SCALAR = re.compile(r'[^ \t\n\r,\]}]*')
+
+
+def _value_end(buf, pos, eof):
+    """Return the end of the JSON value starting at pos or -1 if the buffer
+    does not contain all of it."""
+    char = buf[pos]
+    if char == '"':
+        m = _STRING.match(buf, pos)
+        return m.end() if m else -1
+    if char == '{' or char == '[':
+        depth = 0
+        i = pos
+        while True:
+            m = _STRUCTURAL.search(buf, i)
+            if m is None:
+                return -1
+            char = m.group()
+            if char == '"':
+                m = _STRING.match(buf, m.start())
+                if m is None:
+                    return -1
+                i = m.end()
+                continue
+            depth += 1 if char == '{' or char == '[' else -1
+            i = m.end()
+            if depth == 0:
+                return i
+    end = _SCALAR.match(buf, pos).end()
+    if end == len(buf) and not eof:
+        return -1
+    return end
+
+
+class _JSONTokenizer(object):
+    """HELPER CLASS
+
+    Note:
+        Reads a JSON file in chunks keeping in memory only the part of the
+        file that has not been consumed yet.
+    """
+
+    def __init__(self, fileobj, chunk_size):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.fileobj.read(self.chunk_size)
+        # we drop what has been already consumed.
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        if not data:
+            self.eof = True
+            return False
+        return True
+
+    def peek(self):
+        """Return the next character that is not whitespace or ''."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        """Consume the next character, that must be one of chars."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expecting one of %s at %r" % (
+                chars, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Consume the next value and return its JSON text."""
+        if not self.peek():
+            raise ValueError("Unexpected end of the JSON file.")
+        while True:
+            end = _value_end(self.buf, self.pos, self.eof)
+            if end != -1:
+                text = self.buf[self.pos:end]
+                self.pos = end
+                return text
+            if not self._fill():
+                raise ValueError("Unexpected end of the JSON file.")
+
+
+def _iter_items(tokens, header, nested):
+    """Yield the elements of the items of the JSON object at the position of
+    the tokenizer, storing its other members in header.
+
+    Args:
+        tokens (_JSONTokenizer): The tokenizer.
+        header (dict): The dict where the other members are stored.
+        nested (tuple): Members whose object value is parsed with the same
+            rules, e.g. the embedded first page of a collection.
+    """
+    tokens.expect("{")
+    if tokens.peek() == "}":
+        tokens.pos += 1
+        return
+    while True:
+        key = json.loads(tokens.value())
+        tokens.expect(":")
+        char = tokens.peek()
+        if key == "items" and char == "[":
+            tokens.pos += 1
+            if tokens.peek() == "]":
+                tokens.pos += 1
+            else:
+                while True:
+                    yield json.loads(tokens.value())
+                    if tokens.expect(",]") == "]":
+                        break
+        elif key in nested and char == "{":
+            header[key] = {}
+            yield from _iter_items(tokens, header[key], ())
+        else:
+            header[key] = json.loads(tokens.value())
+        if tokens.expect(",}") == "}":
+            return
+
+
+def iter_annotations(path, resolve=None, chunk_size=65536):
+    """Iterate over the Annotations of an AnnotationPage or of an
+    AnnotationCollection file.
+
+    The items are parsed incrementally and mapped to the WADM classes one at
+    a time. When resolve is given the next pages are followed.
+
+    Example:
+        >>> pages = {"http://example.org/page%i" % i: "page%i.json" % i
+        ...          for i in range(1, 100)}
+        >>> for anno in iter_annotations("collection1.json", pages.get):
+        ...     print(anno.id)
+
+    Args:
+        path (str, list): The path of the json file or a list of paths of
+            page files that will be read in order.
+        resolve (callable, optional): Receives the IRI of the next page (or
+            of the first page of a collection) and returns the path of its
+            file or None for stopping. Defaults to None.
+        chunk_size (int, optional): The number of characters read at once.
+            Defaults to 65536.
+
+    Yields:
+        Annotation: The Annotations of the items of the pages.
+    """
+    if isinstance(path, (list, tuple)):
+        for pagepath in path:
+            yield from iter_annotations(pagepath, chunk_size=chunk_size)
+        return
+    while path is not None:
+        header = {}
+        with open(path, encoding="utf-8") as f:
+            tokens = _JSONTokenizer(f, chunk_size)
+            for item in _iter_items(tokens, header, ("first",)):
+                yield utilities.map_to_class(item)
+        if header.get("type") == "AnnotationCollection":
+            first = header.get("first")
+            nextpage = first.get("next") if isinstance(first, dict) else first
+        else:
+            nextpage = header.get("next")
+        if resolve is None or nextpage is None:
+            return
+        path = resolve(nextpage)
+
+
+def _open_text(path, mode):
+    """Open a text file compressing it according to its extension."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        # pip install zstandard
+        import zstandard
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_jsonl(annotations, path, context=False, batch_size=1000,
+                ensure_ascii=False):
+    """Write Annotations to a JSON Lines file, one compact Annotation per
+    line.
+
+    Example:
+        >>> write_jsonl(annotations, "annotations.jsonl.gz")
+
+    Args:
+        annotations (iterable): An iterable of Annotations.
+        path (str): The path of the file, if it ends with .gz or .zst the
+            file is compressed.
+        context (bool,str,list, optional): If False the @context is
+            factored out of the lines, if True the CONTEXT is added to each
+            line, otherwise the given context is. Defaults to False.
+        batch_size (int, optional): The number of lines written at once.
+            Defaults to 1000.
+        ensure_ascii (bool, optional): If True only ASCI character will be
+            used. Defaults to False.
+
+    Returns:
+        int: The number of Annotations written.
+    """
+    if context is True:
+        context = None
+    cache = FragmentCache(ensure_ascii=ensure_ascii)
+    count = 0
+    batch = []
+    with _open_text(path, "w") as f:
+        for annotation in annotations:
+            batch.append(cache.dumps(annotation, context))
+            if len(batch) == batch_size:
+                batch.append("")
+                f.write("\n".join(batch))
+                count += len(batch) - 1
+                batch = []
+        if batch:
+            batch.append("")
+            f.write("\n".join(batch))
+            count += len(batch) - 1
+    return count
+
+
+def read_jsonl(path):
+    """Iterate over the Annotations of a JSON Lines file.
+
+    Args:
+        path (str): The path of the file, if it ends with .gz or .zst the
+            file is decompressed.
+
+    Yields:
+        Annotation: The Annotations, one for each line.
+    """
+    with _open_text(path, "r") as f:
+        for line in f:
+            if line.isspace():
+                continue
+            item = json.loads(line)
+            item.pop("@context", None)
+            yield utilities.map_to_class(item)
@@ -1,13 +1,16 @@
 from . import WADM
+import copy
 import json
 
 
 def modify_WADM_json(path):
     """Modify an Web Annotation Data Model json file.
-    This method parse only the frist level of the WADM object. All the nested
-    object are left as dict.
 
-    It is faster compared to read read_API3_json.
+    The file is read lazily (see read_WADM_json): only the first level of the
+    WADM object is mapped and the nested objects are mapped when they are
+    accessed. The ones that are never accessed are saved back as they were.
+
+    It is faster compared to read_WADM_json.
 
     Note:
         the method assumes the WADM object is complaint Web Annotation Data Model.
@@ -15,24 +18,264 @@ def modify_WADM_json(path):
     Args:
         path (str): The path of the json file.
     """
-    with open(path) as f:
-        t = json.load(f)
-    t.pop('@context')
-    entitydict = {'Annotation': WADM.Annotation(),
-                  'AnnotationCollection': WADM.AnnotationCollection(),
-                  'AnnotationPage':WADM.AnnotationPage()}
-    assert t['type'] in entitydict.keys(), "%s not a valid WADM object" % t['type']
-    newobj = entitydict[t['type']]
-    # TODO: find better solution .update will cause height and width to be set R.
-    newobj.__dict__ = t
+    return read_WADM_json(path, lazy=True)
+
+
+# The WADM classes by the value of their type.
+ENTITIES = {
+    'Annotation': WADM.Annotation,
+    'AnnotationCollection': WADM.AnnotationCollection,
+    'AnnotationPage': WADM.AnnotationPage,
+    'Choice': WADM.Choice,
+    'Composite': WADM.Composite,
+    'CssSelector': WADM.CssSelector,
+    'CssStylesheet': WADM.CssStylesheet,
+    'DataPositionSelector': WADM.DataPositionSelector,
+    'FragmentSelector': WADM.FragmentSelector,
+    'HttpRequestState': WADM.HttpRequestState,
+    'ImageApiSelector': WADM.ImageApiSelector,
+    'Independents': WADM.Independents,
+    'List': WADM.List,
+    'Organization': WADM.Organization,
+    'Person': WADM.Person,
+    'PointSelector': WADM.PointSelector,
+    'RangeSelector': WADM.RangeSelector,
+    'Software': WADM.Software,
+    'SpecificResource': WADM.SpecificResource,
+    'SvgSelector': WADM.SvgSelector,
+    'TextPositionSelector': WADM.TextPositionSelector,
+    'TextQuoteSelector': WADM.TextQuoteSelector,
+    'TextualBody': WADM.TextualBody,
+    'TimeState': WADM.TimeState,
+    'XPathSelector': WADM.XPathSelector,
+    }
+# the types of external web resources.
+ENTITIES.update((mtype, WADM._BodiesAndTargets) for mtype in WADM.TYPES)
+
+# For objects without a type, or with a type that is not a WADM class (e.g.
+# the schema.org types of an audience), the class is chosen by the property
+# holding them.
+PROPERTIES = {
+    'audience': WADM._IntendedAudience,
+    'body': WADM._BodiesAndTargets,
+    'creator': WADM._Agent,
+    'first': WADM.AnnotationPage,
+    'generator': WADM._Agent,
+    'last': WADM.AnnotationPage,
+    'partOf': WADM.AnnotationCollection,
+    'renderedVia': WADM.Software,
+    'source': WADM._BodiesAndTargets,
+    'stylesheet': WADM.CssStylesheet,
+    'target': WADM._BodiesAndTargets,
+    }
+
+_RESOURCES = ('body', 'target', 'items')
+_SETS = (WADM.Choice, WADM.List, WADM.Composite, WADM.Independents)
+
+# The attributes set by the __init__ of each class, see _new.
+_DEFAULTS = {}
+
+
+def _new(cls, data, newcls=None):
+    """Create an instance of cls with the attributes in data without calling
+    its __init__.
+
+    The attributes missing in data get the value set by the __init__ of the
+    class. These are taken from an instance built once per class, so that
+    the Required and Recommended objects are shared and not created again.
+    If newcls is given the instance is of newcls, a subclass of cls.
+    """
+    try:
+        defaults, mutables = _DEFAULTS[cls]
+    except KeyError:
+        defaults = cls().__dict__
+        mutables = tuple(k for k, v in defaults.items()
+                         if isinstance(v, (list, dict)))
+        _DEFAULTS[cls] = defaults, mutables
+    attrs = defaults.copy()
+    for name in mutables:
+        attrs[name] = copy.copy(attrs[name])
+    attrs.update(data)
+    if 'type' not in data:
+        attrs['type'] = None
+    newobj = (newcls or cls).__new__(newcls or cls)
+    try:
+        newobj.__dict__ = attrs
+    except AttributeError:
+        # the compact classes only have the __slots__ of their attributes.
+        # attributes they do not know are kept by the full class.
+        if not attrs.keys() <= cls._field_set:
+            full = cls._full_class
+            return _new(full, data, newcls and _lazy_class(full))
+        for name, value in attrs.items():
+            setattr(newobj, name, value)
     return newobj
 
 
-def read_API3_json_dict(jsondict, extensions=None, save_context=False):
+def _map_value(value, prop, parent, entities):
+    if value.__class__ is dict:
+        return _map_object(value, prop, parent, entities)
+    if value.__class__ is list:
+        return [_map_value(item, prop, parent, entities) for item in value]
+    return value
+
+
+def _class_of(obj, prop, parent, entities):
+    """Return the class of a dict read from JSON or None."""
+    mtype = obj.get('type')
+    cls = entities.get(mtype) if mtype.__class__ is str else None
+    if cls is None:
+        if prop in _RESOURCES and 'source' in obj:
+            cls = WADM.SpecificResource
+        elif prop == 'items':
+            if parent is WADM.AnnotationPage:
+                cls = WADM.Annotation
+            elif parent is not None and issubclass(parent, _SETS):
+                cls = WADM._BodiesAndTargets
+        else:
+            cls = PROPERTIES.get(prop)
+    return cls
+
+
+def _map_object(obj, prop, parent, entities):
+    cls = _class_of(obj, prop, parent, entities)
+    if cls is None:
+        return obj
+    data = {}
+    for key, value in obj.items():
+        if value.__class__ is dict or value.__class__ is list:
+            value = _map_value(value, key, cls, entities)
+        data[key] = value
+    return _new(cls, data)
+
+
+# Lazy mapping: the nested objects are kept in these containers, that are
+# serialized as they are, until they are accessed.
+class _UnmappedDict(dict):
+    """HELPER CLASS
+
+    Note:
+        A JSON object that has not been mapped to a WADM class yet.
+    """
+    __slots__ = ("entities",)
+
+
+class _UnmappedList(list):
+    """HELPER CLASS
+
+    Note:
+        A JSON array that has not been mapped to WADM classes yet.
+    """
+    __slots__ = ("entities",)
+
+
+class _LazyAttributes(object):
+    """HELPER CLASS
+
+    Note:
+        Mixin of the lazily read WADM classes. It maps the values that are
+        still unmapped when they are accessed for the first time.
+    """
+    __slots__ = ()
+
+    def __getattribute__(self, name):
+        value = object.__getattribute__(self, name)
+        vcls = value.__class__
+        if vcls is _UnmappedDict or vcls is _UnmappedList:
+            parent = type(self).__mro__[2]
+            if vcls is _UnmappedDict:
+                value = _map_object_lazily(value, name, parent, value.entities)
+            else:
+                value = [_map_object_lazily(item, name, parent, value.entities)
+                         if item.__class__ is dict else item
+                         for item in value]
+            object.__setattr__(self, name, value)
+        return value
+
+    def __reduce__(self):
+        # the lazy classes have the name of their base class, pickle could
+        # not find them by name.
+        return _unpickle_lazy, (type(self).__mro__[2], dict(self.__dict__))
+
+
+def _unpickle_lazy(cls, attrs):
+    lazycls = _lazy_class(cls)
+    obj = lazycls.__new__(lazycls)
+    for name, value in attrs.items():
+        setattr(obj, name, value)
+    return obj
+
+
+_LAZY_CLASSES = {}
+
+
+def _lazy_class(cls):
+    """Return the lazily read subclass of a WADM class."""
+    try:
+        return _LAZY_CLASSES[cls]
+    except KeyError:
+        lazycls = type(cls.__name__, (_LazyAttributes, cls), {
+            '__slots__': (),
+            '__module__': cls.__module__,
+            '__doc__': cls.__doc__})
+        _LAZY_CLASSES[cls] = lazycls
+        return lazycls
+
+
+def _map_object_lazily(obj, prop, parent, entities):
+    cls = _class_of(obj, prop, parent, entities)
+    if cls is None:
+        return dict(obj)
+    data = {}
+    for key, value in obj.items():
+        if value.__class__ is dict:
+            value = _UnmappedDict(value)
+            value.entities = entities
+        elif value.__class__ is list and any(
+                item.__class__ is dict for item in value):
+            value = _UnmappedList(value)
+            value.entities = entities
+        data[key] = value
+    return _new(cls, data, _lazy_class(cls))
+
+
+def map_to_class(obj, extensions=None, lazy=False, compact=False):
+    """Map a dict representing a WADM object, and all the objects nested in
+    it, to the WADM classes.
+
+    The class is chosen using the type of the object or, when the type is
+    missing, the property holding it. Nested objects that cannot be mapped are
+    left as dict.
+
+    Args:
+        obj (dict): a dict representing a WADM object.
+        extensions (dict, optional): Additional classes by type, they take
+            precedence over ENTITIES. Defaults to None.
+        lazy (bool, optional): If True the nested objects are mapped only
+            when they are accessed for the first time, until then they are
+            serialized as they were read. Defaults to False.
+        compact (bool, optional): If True the selectors and states are
+            mapped to WADM.COMPACT_CLASSES. Defaults to False.
+
+    Returns:
+        WADM object: The WADM object.
+    """
+    entities = ENTITIES
+    if extensions or compact:
+        entities = dict(ENTITIES)
+        if compact:
+            entities.update(WADM.COMPACT_CLASSES)
+        entities.update(extensions or ())
+    if lazy:
+        return _map_object_lazily(obj, None, None, entities)
+    return _map_object(obj, None, None, entities)
+
+
+def read_API3_json_dict(jsondict, extensions=None, save_context=False,
+                        lazy=False, compact=False):
     """Read an WADM json file complaint with Web Annotation Data Model.
 
-    This method parse the major WADM types and map them to the WADM
-    classes.
+    This method maps every WADM type to its class.
 
     Note:
         the method assumes the file is compliant with the Web Annotation Data
@@ -40,71 +283,56 @@ def read_API3_json_dict(jsondict, extensions=None, save_context=False):
 
     Args:
         jsondict (dict): a dict representing the JSON file.
-        extensions
+        extensions (dict, optional): Additional classes by type.
+            Defaults to None.
+        lazy (bool, optional): If True the nested objects are mapped when
+            they are accessed. Defaults to False.
+        compact (bool, optional): If True the selectors and states are
+            mapped to WADM.COMPACT_CLASSES. Defaults to False.
     """
 
-    jsondict.pop('@context')
-    entitydict = {
-     'Annotation': WADM.Annotation,
-     'AnnotationPage': WADM.AnnotationPage,
-     'FragmentSelector': WADM.FragmentSelector,
-     'ImageApiSelector': WADM.ImageApiSelector,
-     'PointSelector': WADM.PointSelector,
-     'SpecificResource': WADM.SpecificResource,
-     'SvgSelector': WADM.SvgSelector,
-     'TextPositionSelector':WADM.TextPositionSelector,
-     'XPathSelector':WADM.XPathSelector,
-     'CssSelector':WADM.CssSelector,
-     'Software':WADM.Software,
-     'Organization':WADM.Organization,
-     'Person':WADM.Person,
-     'RangeSelector':WADM.RangeSelector,
-     'TextQuoteSelector':WADM.TextQuoteSelector,
-
-        }
-    assert jsondict['type'] in entitydict.keys(), "%s not a valid IIIF object" % jsondict['type']
-
-    def map_to_class(obj, iscollection=False):
-        parent_is_collection = False
-        if obj['type'] == 'Collection':
-            parent_is_collection = True
-        if 'items' in obj.keys():
-            for n, item in enumerate(obj['items']):
-                obj['items'][n] = map_to_class(item, iscollection=parent_is_collection)
-        # we can map directly to each class using the object type except for
-        # manifest References which as the same type of Manifest
-        if iscollection and obj['type'] == "Manifest" and 'items' not in obj.items():
-            newobj = iiifpapi3.refManifest()
-        else:
-            newobj = entitydict[obj['type']]()
-        # TODO: find better solution .update will cause height and width to be set R.
-        # newobj.__dict__ = newobj works apparently with no problem
-        newobj.__dict__.update(obj)
-        # Specific cases
-        if obj['type'] == 'Canvas':
-            if newobj.duration is not None:
-                newobj.set_duration(newobj.duration)
-        return newobj
-    newobj = map_to_class(jsondict)
+    jsondict.pop('@context', None)
+    assert jsondict.get('type') in ENTITIES or \
+        (extensions and jsondict.get('type') in extensions), \
+        "%s not a valid WADM object" % jsondict.get('type')
+    newobj = map_to_class(jsondict, extensions=extensions, lazy=lazy,
+                          compact=compact)
     return newobj
 
 
-def read_WADM_json(path, extensions=None, save_context=False):
+def read_WADM_json(path, extensions=None, save_context=False, lazy=False,
+                   compact=False):
     """Read an WADM json file complaint with Web Annotation Data Model and map 
     the WADM types to classes.
 
     This method parse the major WADM types and map them to the WADM
     classes.
 
+    With lazy set to True only the first level is mapped, the nested objects
+    are kept as read until they are accessed and the ones never accessed are
+    serialized back verbatim. This is convenient when only few attributes
+    (e.g. id, modified and target) are modified.
+
+    Example:
+        >>> anno = read_WADM_json("anno1.json", lazy=True)
+        >>> anno.set_modified("2023-01-01T10:00:00Z")
+        >>> anno.json_save("anno1.json")
+
     Note:
         the method assumes the IIIF object is complaint to API 3.0.
 
     Args:
         path (str): path of the jsonfile
+        lazy (bool, optional): Map the nested objects on first access.
+            Defaults to False.
+        compact (bool, optional): Map the selectors and states to the
+            compact classes, see WADM.compact. Defaults to False.
     """
     with open(path) as f:
         jsondict = json.load(f)
-    return read_API3_json_dict(jsondict, extensions=extensions, save_context=save_context)
+    return read_API3_json_dict(jsondict, extensions=extensions,
+                               save_context=save_context, lazy=lazy,
+                               compact=compact)
 
 
 def read_WADM_json_file(path, extensions=None, save_context=False):
@@ -127,6 +355,9 @@ def read_WADM_json_file(path, extensions=None, save_context=False):
 def delete_object_byID(obj, id):
     """Deletes nested WADM objects using the ID.
 
+    Each call walks the whole object, for many deletions use
+    indexes.IdIndex.
+
     Args:
         obj (dict): a dict representing the WADM object.
         id (str): the ID of the object to be delete.
@@ -142,16 +373,17 @@ def delete_object_byID(obj, id):
                 return True
             delete_object_byID(value, id)
     if isinstance(obj, list):
-        for item in obj:
-            if delete_object_byID(item, id):
-                obj.remove(item)
-    else:
-        pass
+        kept = [item for item in obj if not delete_object_byID(item, id)]
+        if len(kept) != len(obj):
+            obj[:] = kept
 
 
 def remove_and_insert_new(obj, id, newobj):
     """Remove inplace from any WADM object (Annotation, AnnotationPage,  etc)
-    the object with the given id and insert the new object.
+    the object with the given id and insert the new object in its place.
+
+    Each call walks the whole object, for many replacements use
+    indexes.IdIndex.
 
     Args:
         obj (WADMobject): The object to modify.
@@ -172,12 +404,10 @@ def remove_and_insert_new(obj, id, newobj):
                     return True
                 remove_and_insert_new_rec(value, id, newobj)
         if isinstance(obj, list):
-            for item in obj:
+            for i, item in enumerate(obj):
                 if remove_and_insert_new_rec(item, id, newobj):
-                    obj.remove(item)
-                    obj.append(newobj)
-        else:
-            pass
+                    # the new object takes the place of the old one.
+                    obj[i] = newobj
     counter = 0
     remove_and_insert_new_rec(obj, id, newobj)
     return counter
\ No newline at end of file
@@ -0,0 +1,323 @@
+"""Validation of WADM objects once they are built.
+
+The setters check their values one at a time (see WADM.set_validation),
+here the values of a whole graph are collected and checked at once,
+grouped by kind: the IRIs, the languages, the datetimes... Each distinct
+value is checked only once, also across many Annotations.
+
+Example:
+    >>> from wadm import WADM, validation
+    >>> WADM.set_validation("deferred")
+    >>> anno = WADM.Annotation()
+    >>> anno.set_id("http://example.org/anno 1")
+    >>> validation.validate(anno)
+    [ValidationIssue(path='/id', rule='id', severity='error', message=...)]
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+from . import WADM
+from .utilities import _UnmappedDict, _UnmappedList
+
+ValidationIssue = namedtuple("ValidationIssue", "path rule severity message")
+ValidationIssue.__doc__ = """A value that is not valid.
+
+Args:
+    path (str): The JSON pointer of the value e.g. /target/selector/value.
+    rule (str): The rule that failed e.g. iri or language.
+    severity (str): "error" for MUST statements, "warning" for SHOULD ones.
+    message (str): The description of the problem.
+"""
+
+# The rule of the values of each attribute, see _collect.
+FIELD_RULES = {
+    "id": "id",
+    "source": "id",
+    "homepage": "iri",
+    "rights": "iri",
+    "via": "iri",
+    "body": "iri",
+    "target": "iri",
+    "audience": "iri",
+    "partOf": "iri",
+    "next": "iri",
+    "language": "language",
+    "processingLanguage": "language",
+    "created": "datetime",
+    "generated": "datetime",
+    "modified": "datetime",
+    "sourceDate": "datetime",
+    "sourceDateStart": "datetime",
+    "sourceDateEnd": "datetime",
+    "format": "format",
+    "textDirection": "textDirection",
+}
+
+AGENT_TYPES = ("Person", "Organization", "Software")
+
+
+# The rules of the attributes of each class, see _class_rules.
+_CLASS_RULES = {}
+
+
+def _class_rules(cls):
+    """Return the rules of the attributes of a class, FIELD_RULES, the rule
+    of the type if this is not fixed and the one of the id of the
+    AnnotationCollections."""
+    try:
+        return _CLASS_RULES[cls]
+    except KeyError:
+        pass
+    rules = dict(FIELD_RULES)
+    if issubclass(cls, WADM.AnnotationCollection):
+        # set_id only warns, AnnotationCollections should use HTTP(S) URIs.
+        rules["id"] = ("id", cls.__name__)
+    if issubclass(cls, WADM._Agent):
+        rules["type"] = ("agentType", cls.__name__)
+    elif issubclass(cls, WADM._IntendedAudience):
+        rules["type"] = ("audienceType", cls.__name__)
+    elif issubclass(cls, WADM._BodiesAndTargets):
+        rules["type"] = ("resourceType", cls.__name__)
+    _CLASS_RULES[cls] = rules
+    return rules
+
+
+def _collect_values(value, values):
+    """Add the (rule, value) pairs of a graph to the set values."""
+    rules = _class_rules(value.__class__)
+    for name, item in value.__dict__.items():
+        cls = item.__class__
+        if cls is _UnmappedDict or cls is _UnmappedList:
+            # maps the values of a lazily read object.
+            item = getattr(value, name)
+            cls = item.__class__
+        if cls is str:
+            rule = rules.get(name)
+            if rule is not None:
+                values.add((rule, item))
+        elif item is None or isinstance(item, WADM._Sentinel):
+            continue
+        elif cls is list or cls is tuple:
+            rule = rules.get(name)
+            for element in item:
+                if element.__class__ is str:
+                    if rule is not None:
+                        values.add((rule, element))
+                elif hasattr(element, "__dict__"):
+                    _collect_values(element, values)
+        elif hasattr(item, "__dict__"):
+            _collect_values(item, values)
+
+
+def _escape(name):
+    return name.replace("~", "~0").replace("/", "~1")
+
+
+def _collect_paths(value, path, values):
+    """Like _collect_values, values is a dict of lists of the paths."""
+    rules = _class_rules(value.__class__)
+    for name, item in value.__dict__.items():
+        if item.__class__ is _UnmappedDict or item.__class__ is _UnmappedList:
+            # maps the values of a lazily read object.
+            item = getattr(value, name)
+        if item is None or isinstance(item, WADM._Sentinel):
+            continue
+        rule = rules.get(name)
+        itempath = "%s/%s" % (path, _escape(name))
+        if isinstance(item, (list, tuple)):
+            for i, element in enumerate(item):
+                _collect_item(element, "%s/%i" % (itempath, i), rule, values)
+        else:
+            _collect_item(item, itempath, rule, values)
+
+
+def _collect_item(item, path, rule, values):
+    if isinstance(item, str):
+        if rule is not None:
+            values.setdefault((rule, item), []).append(path)
+    elif hasattr(item, "__dict__"):
+        _collect_paths(item, path, values)
+
+
+def _check(rule, value):
+    """Return the (severity, message) pairs of a value."""
+    if isinstance(rule, tuple):
+        rule, classname = rule
+        if rule == "id":
+            return [("warning", message)
+                    for severity, message in _check("id", value)]
+        if rule == "agentType" and value not in AGENT_TYPES:
+            return [("error", "Type must be Person, Organization or "
+                     "Software.")]
+        if rule == "audienceType" and not value.startswith("schema:"):
+            return [("error", "First part should start with schema: prefix")]
+        if rule == "resourceType" and value not in WADM.TYPES and \
+                value != classname:
+            return [("error", "%s is a non standard type add it to TYPES "
+                     "global variable" % value)]
+        return []
+    if rule == "id" or rule == "iri":
+        if rule == "id" and not value.startswith("http"):
+            return [("error", "ID must start with http or https")]
+        errors = WADM.uri_errors(value)
+        if errors:
+            return [("error", "Special characters must be encoded:\n%s"
+                     % "\n".join(map(str, errors)))]
+        return []
+    if rule == "language":
+        if not WADM.check_language(value):
+            return [("error", "Language must be a valid BCP47 language tag "
+                     "or none, it was: %s" % value)]
+        return []
+    if rule == "datetime":
+        if WADM._XSD_DATETIME.fullmatch(value) is None:
+            return [("error", "The value must be an XSD dateTime literal with "
+                     "a timezone. It was: %s" % value)]
+        if value[-1] != "Z":
+            return [("warning", "The value should be given in UTC with the Z "
+                     "was %s" % value)]
+        return []
+    if rule == "format":
+        error = WADM._format_error(value)
+        return [("error", error)] if error else []
+    if rule == "textDirection":
+        if value not in ("ltr", "rtl", "auto"):
+            return [("error", "textDirection must be: ltr, rtl or auto")]
+        return []
+    raise ValueError("Unknown rule %s." % rule)
+
+
+def _check_all(pairs):
+    return [_check(rule, value) for rule, value in pairs]
+
+
+def _results(pairs, workers, chunk):
+    """Check the (rule, value) pairs, return their problems in order."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(pairs) <= chunk:
+        return _check_all(pairs)
+    chunks = [pairs[i:i + chunk] for i in range(0, len(pairs), chunk)]
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        # the workers inherit the registered languages and media types.
+        context = multiprocessing.get_context("fork")
+    res = []
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        for problems in pool.map(_check_all, chunks):
+            res.extend(problems)
+    return res
+
+
+def _rule_name(rule):
+    return rule[0] if isinstance(rule, tuple) else rule
+
+
+def validate_many(objects, workers=1, chunk=10000):
+    """Check the values of many WADM objects.
+
+    The values of all the objects are collected first and each distinct
+    value is checked once, the checks are grouped by rule and can be run by
+    a pool of processes.
+
+    Args:
+        objects (iterable): The WADM objects, e.g. Annotations.
+        workers (int, optional): The number of processes, None for the
+            number of CPUs. Defaults to 1.
+        chunk (int, optional): The number of values checked by a worker at
+            once. Defaults to 10000.
+
+    Returns:
+        list: A list of ValidationIssue for each object, sorted by path.
+    """
+    objects = list(objects)
+    values = {}
+    for index, obj in enumerate(objects):
+        found = set()
+        _collect_values(obj, found)
+        for pair in found:
+            values.setdefault(pair, []).append(index)
+    # grouping the values by rule keeps the same checks together.
+    pairs = sorted(values, key=lambda pair: (_rule_name(pair[0]), pair[1]))
+    failed = {pair: problems for pair, problems
+              in zip(pairs, _results(pairs, workers, chunk)) if problems}
+    collected = [[] for _ in objects]
+    # only the objects with a problem are walked again for the paths.
+    indexes = sorted({index for pair in failed for index in values[pair]})
+    for index in indexes:
+        paths = {}
+        _collect_paths(objects[index], "", paths)
+        issues = collected[index]
+        for pair, problems in failed.items():
+            for path in paths.get(pair, ()):
+                issues.extend(
+                    ValidationIssue(path, _rule_name(pair[0]), severity,
+                                    message)
+                    for severity, message in problems)
+        issues.sort()
+    return collected
+
+
+def _missing(sentinel, path):
+    if isinstance(sentinel, WADM.Required):
+        return ValidationIssue(path, "required", "error", sentinel._message())
+    return ValidationIssue(path, "recommended", "warning", sentinel._message())
+
+
+def _iter_missing(value, path):
+    for name, item in value.__dict__.items():
+        cls = item.__class__
+        if cls is _UnmappedDict or cls is _UnmappedList:
+            # maps the values of a lazily read object.
+            item = getattr(value, name)
+            cls = item.__class__
+        if cls is str or item is None:
+            continue
+        if isinstance(item, WADM._Sentinel):
+            yield _missing(item, "%s/%s" % (path, _escape(name)))
+        elif cls is list or cls is tuple:
+            itempath = None
+            for i, element in enumerate(item):
+                if hasattr(element, "__dict__"):
+                    if itempath is None:
+                        itempath = "%s/%s" % (path, _escape(name))
+                    if isinstance(element, WADM._Sentinel):
+                        yield _missing(element, "%s/%i" % (itempath, i))
+                    else:
+                        yield from _iter_missing(element,
+                                                 "%s/%i" % (itempath, i))
+        elif hasattr(item, "__dict__"):
+            yield from _iter_missing(item, "%s/%s" % (path, _escape(name)))
+
+
+def iter_missing(obj):
+    """Yield the Required (MUST) and Recommended (SHOULD) attributes that
+    are not set, walking the object without serializing it.
+
+    Example:
+        >>> [i.path for i in validation.iter_missing(WADM.Annotation())]
+        ['/id', '/body', '/target']
+
+    Args:
+        obj (object): The WADM object, e.g. an Annotation.
+
+    Yields:
+        ValidationIssue: With rule "required" and severity "error" or rule
+        "recommended" and severity "warning", the message is the one of
+        the attribute.
+    """
+    return _iter_missing(obj, "")
+
+
+def validate(obj):
+    """Check the values of a WADM object and of the objects nested in it.
+
+    Args:
+        obj (object): The WADM object, e.g. an Annotation.
+
+    Returns:
+        list: The ValidationIssue found, sorted by path.
+    """
+    return validate_many([obj])[0]